@@ -129,6 +129,18 @@ bool WyomingClient::sendAudioResume() {
     return sendEvent("audio-resume", "{}");
 }
 
+bool WyomingClient::sendPlayCue(const std::string& name) {
+    // Custom play-cue event: {"type": "play-cue", "data": {"name": "chime"}}
+    std::string escaped;
+    for (char c : name) {
+        if (c == '"' || c == '\\') {
+            escaped += '\\';
+        }
+        escaped += c;
+    }
+    return sendEvent("play-cue", "{\"name\": \"" + escaped + "\"}");
+}
+
 bool parseWyomingUrl(const std::string& url, std::string& host, int& port) {
     // Parse URL like "http://localhost:10200/" or "tcp://127.0.0.1:10200"
     // Default port for Wyoming is 10200
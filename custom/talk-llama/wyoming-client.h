@@ -29,6 +29,10 @@ public:
     // Resumes paused TTS playback
     bool sendAudioResume();
 
+    // Send play-cue event (custom event)
+    // Plays a sound pre-loaded by Wyoming-Piper from --cue-dir (no synthesis)
+    bool sendPlayCue(const std::string& name);
+
     // Check if client is connected
     bool isConnected() const;
 
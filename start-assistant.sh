@@ -22,6 +22,7 @@ echo ""
 # Configuration
 PIPER_VOICE="en_US-lessac-medium"
 PIPER_DATA_DIR="./piper-data"  # Where Piper stores voice models
+PIPER_VOICE_THREADS=2  # Requests synthesized at once by the loaded voice
 WYOMING_PORT=10200
 WHISPER_MODEL="./whisper.cpp/models/ggml-base.en.bin"
 LLAMA_MODEL="./models/mistral-7b-instruct-v0.2.Q5_0.gguf"
@@ -121,7 +122,8 @@ if ! _wyoming_port_listening; then
 
     # Start Wyoming-Piper using the pipx entry point (works regardless of user/system Python)
     "$HOME/.local/bin/wyoming-piper-custom" \
-        --piper "$HOME/.local/bin/piper" \
+        --piper-worker python \
+        --voice-threads "$PIPER_VOICE_THREADS" \
         --voice "$PIPER_VOICE" \
         --data-dir "$PIPER_DATA_DIR" \
         --uri "tcp://0.0.0.0:$WYOMING_PORT" \
@@ -63,12 +63,14 @@ class AudioVerifier:
         """
         import wave
 
-        # Check current sample rate
+        # Check current format
         with wave.open(str(wav_file), 'rb') as wf:
             sample_rate = wf.getframerate()
+            channels = wf.getnchannels()
 
-        if sample_rate == 16000:
-            # Already 16kHz
+        if sample_rate == 16000 and channels == 1:
+            # Already 16kHz mono (e.g. Wyoming-Piper --test-sample-rate 16000
+            # --test-channels 1), no ffmpeg needed
             return wav_file
 
         # Resample to 16kHz using ffmpeg
@@ -21,6 +21,7 @@ except ImportError:
 
 from audio_generator import AudioGenerator
 from audio_verifier import AudioVerifier
+from wyoming_test_audio import fetch_test_audio
 
 logger = logging.getLogger(__name__)
 
@@ -594,68 +595,19 @@ class TestHarness:
                 error=f"{len(turn_results)} turn(s) failed: {'; '.join(turn_results)}"
             )
 
-    def _concatenate_wav_files(self, input_files: List[Path], output_file: Path) -> bool:
+    def _read_capture_index(self) -> Dict:
         """
-        Concatenate multiple WAV files into a single WAV file.
-
-        Args:
-            input_files: List of WAV files to concatenate (in order)
-            output_file: Path to output concatenated WAV file
+        Read the index of responses captured by Wyoming-Piper in test mode.
 
         Returns:
-            True if successful, False otherwise
+            Index with "latest" and "responses" keys, or an empty dict
         """
+        index_path = self.output_dir / "index.json"
         try:
-            import wave
-            import struct
-
-            if not input_files:
-                logger.error("No input files to concatenate")
-                return False
-
-            # Read parameters from first file
-            with wave.open(str(input_files[0]), 'rb') as first_wav:
-                params = first_wav.getparams()
-                nchannels = params.nchannels
-                sampwidth = params.sampwidth
-                framerate = params.framerate
-
-            # Concatenate all audio data
-            audio_data = []
-
-            for wav_file in input_files:
-                with wave.open(str(wav_file), 'rb') as wav:
-                    # Verify parameters match
-                    if (wav.getnchannels() != nchannels or
-                        wav.getsampwidth() != sampwidth or
-                        wav.getframerate() != framerate):
-                        logger.warning(f"WAV parameters mismatch in {wav_file.name}")
-                        logger.warning(f"  Expected: {nchannels}ch, {sampwidth}B, {framerate}Hz")
-                        logger.warning(f"  Got: {wav.getnchannels()}ch, {wav.getsampwidth()}B, {wav.getframerate()}Hz")
-                        # Continue anyway, may still work
-
-                    # Read audio frames
-                    frames = wav.readframes(wav.getnframes())
-                    audio_data.append(frames)
-
-            # Write concatenated output
-            with wave.open(str(output_file), 'wb') as out_wav:
-                out_wav.setnchannels(nchannels)
-                out_wav.setsampwidth(sampwidth)
-                out_wav.setframerate(framerate)
-
-                # Write all frames
-                for frames in audio_data:
-                    out_wav.writeframes(frames)
-
-            logger.debug(f"Concatenated {len(input_files)} files into {output_file.name}")
-            return True
-
-        except Exception as e:
-            logger.error(f"Failed to concatenate WAV files: {e}")
-            import traceback
-            logger.debug(traceback.format_exc())
-            return False
+            with open(index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
 
     async def _run_assistant(self, input_wav: Path, test_name: str) -> Optional[Path]:
         """
@@ -691,6 +643,9 @@ class TestHarness:
 
         logger.info(f"Running: {' '.join(cmd)}")
 
+        # Responses captured before this run must not be mistaken for its output
+        previous_response = self._read_capture_index().get("latest")
+
         try:
             timeout = self.config.get('execution', {}).get('timeout_per_test', 120)
             result = subprocess.run(
@@ -705,66 +660,15 @@ class TestHarness:
                 logger.debug(f"Assistant stderr:\n{result.stderr}")
 
             # Capture output audio from Wyoming-Piper (test mode)
-            # In test mode, Wyoming-Piper saves files as output_<timestamp>_<index>.wav
-            # The LLM response is split into chunks (sentences), creating multiple WAV files
-            # We need to concatenate all chunks to get the complete response
-
+            # The server returns the latest response (all of its sentence
+            # chunks) over the Wyoming connection once synthesis has finished
             output_wav = self.output_dir / f"{test_name}_output.wav"
-
-            # Find all output files from the most recent timestamp
-            import glob
-            import shutil
-            import re
-
-            output_files = sorted(self.output_dir.glob("output_*_*.wav"),
-                                key=lambda p: p.stat().st_mtime, reverse=True)
-
-            if not output_files:
-                logger.warning("Could not find any output audio files")
-                return None
-
-            # Extract timestamp from the most recent file
-            # File format: output_<timestamp>_<part_number>.wav
-            latest_file = output_files[0]
-            match = re.match(r'output_(\d+)_(\d+)\.wav', latest_file.name)
-            if not match:
-                logger.warning(f"Unexpected output file format: {latest_file.name}")
-                shutil.copy(str(latest_file), str(output_wav))
-                return output_wav
-
-            timestamp = match.group(1)
-
-            # Find all files with the same timestamp
-            chunk_pattern = f"output_{timestamp}_*.wav"
-            chunk_files = sorted(self.output_dir.glob(chunk_pattern))
-
-            if not chunk_files:
-                logger.warning(f"No chunk files found for timestamp {timestamp}")
+            latest_response = fetch_test_audio(output_wav, port=self.wyoming_port)
+            if latest_response is None or latest_response == previous_response:
+                logger.warning("Wyoming-Piper did not capture a new response")
                 return None
 
-            # Sort by part number (extract from filename)
-            def get_part_number(filepath):
-                m = re.match(r'output_\d+_(\d+)\.wav', filepath.name)
-                return int(m.group(1)) if m else 0
-
-            chunk_files = sorted(chunk_files, key=get_part_number)
-
-            logger.info(f"Found {len(chunk_files)} audio chunks for timestamp {timestamp}")
-            for chunk in chunk_files:
-                logger.debug(f"  - {chunk.name}")
-
-            if len(chunk_files) == 1:
-                # Only one chunk, just copy it
-                shutil.copy(str(chunk_files[0]), str(output_wav))
-                logger.info(f"Captured output audio: {output_wav} (single chunk)")
-            else:
-                # Multiple chunks - concatenate them
-                logger.info(f"Concatenating {len(chunk_files)} audio chunks...")
-                if self._concatenate_wav_files(chunk_files, output_wav):
-                    logger.info(f"Captured output audio: {output_wav} (concatenated from {len(chunk_files)} chunks)")
-                else:
-                    logger.error("Failed to concatenate audio chunks")
-                    return None
+            logger.info(f"Captured output audio: {output_wav} (response {latest_response})")
 
             return output_wav
 
@@ -8,17 +8,15 @@ the output using Whisper STT to ensure proper audio synthesis.
 """
 
 import asyncio
-import json
-import socket
 import subprocess
 import sys
-import time
 from pathlib import Path
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from audio_verifier import AudioVerifier
+from wyoming_test_audio import fetch_test_audio
 
 
 class WyomingPiperTester:
@@ -26,6 +24,7 @@ class WyomingPiperTester:
         self.port = port
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.request_counter = 0
 
         # Initialize audio verifier
         self.verifier = AudioVerifier(
@@ -34,42 +33,22 @@ class WyomingPiperTester:
         )
 
     def send_tts_request(self, text, voice="en_US-lessac-medium"):
-        """Send TTS request to Wyoming-Piper via Wyoming protocol."""
+        """
+        Synthesize text via Wyoming protocol and fetch the captured audio.
+
+        Returns the path of the output WAV file, or None on failure.
+        """
         print(f"Sending TTS request: '{text}'")
+        self.request_counter += 1
+        output_wav = self.output_dir / f"unit_{self.request_counter}_output.wav"
 
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            sock.connect(('localhost', self.port))
-
-            # Wyoming protocol message format
-            request = json.dumps({
-                'type': 'synthesize',
-                'data': {
-                    'text': text,
-                    'voice': {'name': voice}
-                }
-            }) + '\n'
-
-            sock.send(request.encode('utf-8'))
-            print(f"Request sent: {request.strip()}")
-
-            # Give time for processing
-            time.sleep(3)
-
-            sock.close()
-            return True
-
+            # The reply arrives as soon as synthesis finishes; no sleeping
+            response_id = fetch_test_audio(output_wav, port=self.port, text=text, voice=voice)
+            return output_wav if response_id is not None else None
         except Exception as e:
             print(f"Error sending request: {e}")
-            return False
-
-    def find_latest_output(self):
-        """Find the most recently created WAV file in output directory."""
-        wav_files = sorted(self.output_dir.glob("*.wav"), key=lambda p: p.stat().st_mtime)
-        if not wav_files:
             return None
-        return wav_files[-1]
 
     def verify_output(self, wav_file, expected_text):
         """Verify TTS output matches expected text using Whisper."""
@@ -133,27 +112,13 @@ class WyomingPiperTester:
         print(f"TEST: '{text}'")
         print("=" * 70)
 
-        # Clear old output file
-        latest = self.find_latest_output()
-        if latest:
-            print(f"Clearing old output: {latest}")
-
         # Send TTS request
-        if not self.send_tts_request(text):
-            print("✗ FAIL: Could not send TTS request")
+        new_file = self.send_tts_request(text)
+        if new_file is None:
+            print("✗ FAIL: No output audio received")
             return False
 
-        # Wait for output file
-        print("Waiting for audio output...")
-        for i in range(10):
-            time.sleep(1)
-            new_file = self.find_latest_output()
-            if new_file and (not latest or new_file != latest):
-                print(f"Found output file: {new_file}")
-                break
-        else:
-            print("✗ FAIL: No output file generated")
-            return False
+        print(f"Received output audio: {new_file}")
 
         # Verify output
         passed, transcription = self.verify_output(new_file, expected)
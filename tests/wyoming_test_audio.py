@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Fetch audio captured by Wyoming-Piper in test mode.
+
+Instead of polling the output directory, a client asks the server for the
+audio of a response with a get-test-audio event and receives it back as
+audio-start / audio-chunk / audio-stop events on the same connection.
+"""
+
+import json
+import logging
+import socket
+import wave
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _send_event(sock: socket.socket, event_type: str, data: Optional[Dict] = None):
+    """Send a Wyoming event without payload."""
+    sock.sendall((json.dumps({'type': event_type, 'data': data or {}}) + '\n').encode('utf-8'))
+
+
+def _read_event(reader: BinaryIO) -> Optional[Tuple[str, Dict, bytes]]:
+    """
+    Read one Wyoming event.
+
+    Returns:
+        (type, data, payload), or None if the connection was closed
+    """
+    line = reader.readline()
+    if not line:
+        return None
+
+    header = json.loads(line)
+    data = header.get('data') or {}
+    data_length = header.get('data_length') or 0
+    if data_length > 0:
+        data.update(json.loads(reader.read(data_length)))
+
+    payload_length = header.get('payload_length') or 0
+    payload = reader.read(payload_length) if payload_length > 0 else b''
+
+    return header['type'], data, payload
+
+
+def fetch_test_audio(output_path: Path,
+                     host: str = 'localhost',
+                     port: int = 10200,
+                     response_id: Optional[int] = None,
+                     text: Optional[str] = None,
+                     voice: Optional[str] = None,
+                     timeout: float = 60.0) -> Optional[int]:
+    """
+    Get the audio of a response captured by Wyoming-Piper and save it as WAV.
+
+    Args:
+        output_path: Where to write the WAV file
+        host: Wyoming-Piper host
+        port: Wyoming-Piper port
+        response_id: Response to fetch (default: the latest one)
+        text: If set, synthesize this text as a new response first
+        voice: Voice for synthesis
+        timeout: Socket timeout in seconds
+
+    Returns:
+        Id of the response that was saved, or None if the server had no audio
+    """
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        if text is not None:
+            # Events on one connection are handled in order, so the audio is
+            # complete by the time get-test-audio is handled
+            _send_event(sock, 'new-response')
+            synthesize_data: Dict = {'text': text}
+            if voice:
+                synthesize_data['voice'] = {'name': voice}
+            _send_event(sock, 'synthesize', synthesize_data)
+
+        request_data = {} if response_id is None else {'response_id': response_id}
+        _send_event(sock, 'get-test-audio', request_data)
+
+        reader = sock.makefile('rb')
+        wav_file: Optional[wave.Wave_write] = None
+        fetched_id: Optional[int] = None
+        try:
+            while True:
+                event = _read_event(reader)
+                if event is None:
+                    logger.warning("Connection closed before audio-stop")
+                    return None
+
+                event_type, data, payload = event
+                if event_type == 'error':
+                    logger.warning(f"Wyoming-Piper: {data.get('text')}")
+                    return None
+
+                if event_type == 'audio-start':
+                    wav_file = wave.open(str(output_path), 'wb')
+                    wav_file.setframerate(data['rate'])
+                    wav_file.setsampwidth(data['width'])
+                    wav_file.setnchannels(data['channels'])
+                    fetched_id = data.get('response_id')
+                elif event_type == 'audio-chunk' and wav_file is not None:
+                    wav_file.writeframes(payload)
+                elif event_type == 'audio-stop' and wav_file is not None:
+                    return fetched_id
+        finally:
+            if wav_file is not None:
+                wav_file.close()
+            reader.close()
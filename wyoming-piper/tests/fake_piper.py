@@ -0,0 +1,66 @@
+"""Stand-in for piper: one short WAV file (or output frame) per stdin line.
+
+With --output-frames it answers like the Python worker, fails requests
+whose text is "fail" and exits in the middle of a frame for "crash".
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import wave
+from pathlib import Path
+
+from wyoming_piper.worker import FRAME_ERROR, FRAME_HEADER, FRAME_OK, Frame, write_frame
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--output_dir")
+    parser.add_argument("--output-frames", action="store_true")
+    args, _ = parser.parse_known_args()
+
+    with open(args.config, "r", encoding="utf-8") as config_file:
+        rate = json.load(config_file).get("audio", {}).get("sample_rate", 16000)
+
+    # Seconds per request, to keep requests in flight
+    delay = float(os.environ.get("FAKE_PIPER_DELAY", "0"))
+
+    for line in sys.stdin:
+        text = line.strip()
+        if not text:
+            continue
+
+        time.sleep(delay)
+        if args.output_frames:
+            if text == "crash":
+                # Header and part of the payload only
+                header = FRAME_HEADER.pack(FRAME_OK, rate, 2, 1, 100)
+                sys.stdout.buffer.write(header + bytes(10))
+                sys.stdout.buffer.flush()
+                os._exit(1)
+
+            if text == "fail":
+                frame = Frame(FRAME_ERROR, 0, 0, 0, b"Synthesis failed: test")
+            else:
+                frame = Frame(FRAME_OK, rate, 2, 1, bytes(2 * len(text)))
+
+            write_frame(sys.stdout.buffer, frame)
+            continue
+
+        # One sample per character, so tests can tell requests apart
+        wav_path = Path(args.output_dir) / f"{time.monotonic_ns()}.wav"
+        with wave.open(str(wav_path), "wb") as wav_file:
+            wav_file.setframerate(rate)
+            wav_file.setsampwidth(2)
+            wav_file.setnchannels(1)
+            wav_file.writeframes(bytes(2 * len(text)))
+
+        print(f"Wrote {wav_path}", file=sys.stderr, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Stand-in for the piper package, so the Python worker runs without a model.
+
+Each request is one sample per character. With FAKE_PIPER_PARALLEL=N, a
+request waits until N requests are synthesized at the same time (and fails
+if they never are); shorter texts then take longer, so results finish out
+of order.
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+_PARALLEL = int(os.environ.get("FAKE_PIPER_PARALLEL", "1"))
+_BARRIER = threading.Barrier(_PARALLEL, timeout=5)
+
+
+@dataclass
+class SynthesisConfig:
+    speaker_id: Optional[int] = None
+    length_scale: Optional[float] = None
+    noise_scale: Optional[float] = None
+    noise_w_scale: Optional[float] = None
+
+
+@dataclass
+class PiperConfig:
+    sample_rate: int
+
+
+@dataclass
+class AudioChunk:
+    sample_rate: int
+    sample_width: int
+    sample_channels: int
+    audio_int16_bytes: bytes
+
+
+class PiperVoice:
+    def __init__(self, config: PiperConfig) -> None:
+        self.config = config
+
+    @staticmethod
+    def load(model_path: str, config_path: Optional[str] = None) -> "PiperVoice":
+        with open(config_path or f"{model_path}.json", "r", encoding="utf-8") as f:
+            rate = json.load(f).get("audio", {}).get("sample_rate", 16000)
+
+        return PiperVoice(PiperConfig(sample_rate=rate))
+
+    def phonemize(self, text: str) -> Any:
+        return [list(text)]
+
+    def synthesize(
+        self, text: str, syn_config: Optional[SynthesisConfig] = None
+    ) -> Iterable[AudioChunk]:
+        self.phonemize(text)
+        if _PARALLEL > 1:
+            _BARRIER.wait()
+            time.sleep(0.1 / len(text))
+
+        yield AudioChunk(self.config.sample_rate, 2, 1, bytes(2 * len(text)))
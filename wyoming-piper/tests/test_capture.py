@@ -0,0 +1,97 @@
+"""Tests for test mode response capture."""
+
+import json
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from wyoming_piper.capture import TestCapture
+from wyoming_piper.resample import AudioConverter
+
+from .test_playback import _tone
+
+_RATE = 16000
+
+
+def test_one_file_per_response(tmp_path: Path) -> None:
+    capture = TestCapture(tmp_path)
+    first, second, third = _tone(5, 440), _tone(7, 550), _tone(3, 660)
+
+    capture.add(1, first, _RATE, 2, 1, text="One.")
+    capture.add(1, second, _RATE, 2, 1, text="Two.")
+    wav_path = capture.add(2, third, _RATE, 2, 1, text="Three.")
+    capture.close()
+
+    # Chunks of a response are appended in order
+    with wave.open(str(tmp_path / "response_000001.wav"), "rb") as wav_file:
+        assert wav_file.getframerate() == _RATE
+        assert wav_file.readframes(wav_file.getnframes()) == first + second
+
+    with open(tmp_path / "response_000001.json", encoding="utf-8") as info_file:
+        info = json.load(info_file)
+
+    assert info["chunks"] == 2
+    assert info["samples"] == (len(first) + len(second)) // 2
+    assert info["texts"] == ["One.", "Two."]
+
+    with open(tmp_path / "index.json", encoding="utf-8") as index_file:
+        assert json.load(index_file) == {"latest": 2, "responses": [1, 2]}
+
+    assert wav_path == tmp_path / "response_000002.wav"
+    assert (tmp_path / "output.wav").resolve() == wav_path.resolve()
+
+    # Numbering continues after a restart
+    assert TestCapture(tmp_path).next_response_id == 3
+
+
+def test_file_is_valid_while_response_is_open(tmp_path: Path) -> None:
+    capture = TestCapture(tmp_path)
+    audio = _tone(5, 440)
+    capture.add(0, audio, _RATE, 2, 1)
+
+    with wave.open(str(tmp_path / "response_000000.wav"), "rb") as wav_file:
+        assert wav_file.readframes(wav_file.getnframes()) == audio
+
+    capture.close()
+
+
+def test_get_audio(tmp_path: Path) -> None:
+    capture = TestCapture(tmp_path)
+    assert capture.get_audio() is None
+
+    first, second = _tone(5, 440), _tone(7, 550)
+    capture.add(3, first, _RATE, 2, 1)
+    capture.add(4, second, _RATE, 2, 1)
+
+    # Latest response by default, readable while it is still open
+    latest = capture.get_audio()
+    assert latest is not None
+    assert (latest.response_id, latest.audio, latest.rate) == (4, second, _RATE)
+
+    earlier = capture.get_audio(3)
+    assert (earlier is not None) and (earlier.audio == first)
+    assert capture.get_audio(99) is None
+
+    capture.close()
+
+
+def test_convert_while_capturing(tmp_path: Path) -> None:
+    capture = TestCapture(tmp_path, rate=16000, channels=1)
+    sine = 10000 * np.sin(2 * np.pi * 440 * np.arange(2205) / 22050)
+    stereo = np.repeat(sine.astype(np.int16), 2)
+
+    # Convert chunk by chunk; seams must match converting in one go
+    for chunk in np.array_split(stereo.reshape(-1, 2), 7):
+        capture.add(0, chunk.tobytes(), 22050, 2, 2)
+
+    capture.close()
+
+    with wave.open(str(tmp_path / "response_000000.wav"), "rb") as wav_file:
+        assert (wav_file.getframerate(), wav_file.getnchannels()) == (16000, 1)
+        chunked = wav_file.readframes(wav_file.getnframes())
+
+    converter = AudioConverter(22050, 2, 16000, 1)
+    whole = converter.convert(stereo.tobytes()) + converter.flush()
+    assert chunked == whole
+    assert abs(len(whole) // 2 - (len(stereo) // 2) * 16000 // 22050) <= 1
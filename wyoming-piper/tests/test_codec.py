@@ -0,0 +1,89 @@
+"""Tests for compressed audio streaming."""
+
+import numpy as np
+import pytest
+
+from wyoming_piper.codec import (
+    CODEC_MULAW,
+    CODEC_OPUS,
+    CODEC_PCM,
+    StreamDecoder,
+    available_codecs,
+    create_encoder,
+    linear_to_mulaw,
+    mulaw_to_linear,
+    pack_packets,
+    select_codec,
+    unpack_packets,
+)
+from wyoming_piper.playback import audio_to_events
+
+
+def _tone(rate: int, seconds: float) -> bytes:
+    t = np.arange(int(rate * seconds)) / rate
+    return (np.sin(2 * np.pi * 440 * t) * 10000).astype(np.int16).tobytes()
+
+
+def test_select_codec() -> None:
+    assert select_codec(["flac", CODEC_MULAW, CODEC_PCM]) == CODEC_MULAW
+    assert select_codec(["flac"]) is None
+    assert CODEC_PCM in available_codecs()
+
+
+def test_mulaw_round_trip() -> None:
+    audio = _tone(22050, 0.1)
+    encoded = linear_to_mulaw(audio)
+    assert len(encoded) == len(audio) // 2
+
+    original = np.frombuffer(audio, dtype=np.int16).astype(np.float32)
+    decoded = np.frombuffer(mulaw_to_linear(encoded), dtype=np.int16)
+    error = np.abs(decoded - original)
+    assert error.max() <= (np.abs(original) * 0.07).max()
+
+
+def test_packets() -> None:
+    packets = [b"abc", b"", bytes(300)]
+    assert unpack_packets(pack_packets(packets)) == packets
+
+
+def test_encode_stream() -> None:
+    audio = _tone(22050, 0.5)
+    events = audio_to_events(audio, 22050, 2, 1, samples_per_chunk=1024)
+
+    encoder = create_encoder(CODEC_MULAW)
+    encoded = [e for event in events for e in encoder.encode_event(event)]
+    assert [e.type for e in encoded] == [e.type for e in events]
+    assert encoded[0].data["codec"] == CODEC_MULAW
+    assert (encoded[1].data["rate"], encoded[1].data["width"]) == (22050, 2)
+    assert len(encoded[1].payload or b"") == 1024
+
+    decoder = StreamDecoder()
+    decoded = b"".join(
+        decoder.decode_chunk(e).audio for e in encoded if e.type == "audio-chunk"
+    )
+    assert decoded == mulaw_to_linear(linear_to_mulaw(audio))
+
+    # pcm is passed through
+    assert create_encoder(CODEC_PCM).encode_event(events[1]) == [events[1]]
+
+
+def test_opus_stream() -> None:
+    pytest.importorskip("opuslib")
+
+    audio = _tone(22050, 0.5)
+    events = audio_to_events(audio, 22050, 2, 1, samples_per_chunk=1024)
+    encoder = create_encoder(CODEC_OPUS, {"frame_ms": 20})
+    encoded = [e for event in events for e in encoder.encode_event(event)]
+    assert encoded[0].data["rate"] == 24000
+
+    payload_bytes = sum(len(e.payload or b"") for e in encoded)
+    assert payload_bytes < len(audio) / 4
+
+    decoder = StreamDecoder()
+    decoded = b"".join(
+        decoder.decode_chunk(e).audio for e in encoded if e.type == "audio-chunk"
+    )
+
+    # Last frame is padded with silence
+    expected_samples = 0.5 * 24000
+    assert expected_samples <= len(decoded) // 2 < expected_samples + 480
@@ -0,0 +1,44 @@
+"""Tests for pre-loaded audio cues."""
+
+import asyncio
+import wave
+from pathlib import Path
+
+from wyoming_piper.cues import load_cues
+from wyoming_piper.playback import AudioPlayer
+
+from .test_playback import FakeSink, _tone
+
+_RATE = 16000
+
+
+def _write_wav(path: Path, audio: bytes, width: int = 2) -> None:
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setframerate(_RATE)
+        wav_file.setsampwidth(width)
+        wav_file.setnchannels(1)
+        wav_file.writeframes(audio)
+
+
+async def test_load_and_play_cue(tmp_path: Path) -> None:
+    chime = _tone(9, 800)
+    _write_wav(tmp_path / "chime.wav", chime)
+    _write_wav(tmp_path / "click_8bit.wav", bytes(100), width=1)
+
+    cues = load_cues(tmp_path)
+    assert list(cues) == ["chime"]
+    assert cues["chime"].audio == chime
+
+    FakeSink.instances = []
+    player = AudioPlayer(sink_factory=FakeSink)
+    await player.pause()
+
+    # Cues play even while speech is paused
+    cue = cues["chime"]
+    player.play_cue(cue.audio, cue.rate, cue.width, cue.channels)
+    await asyncio.sleep(0.05)
+
+    assert len(FakeSink.instances) == 1
+    assert FakeSink.instances[0].audio == chime
+    assert FakeSink.instances[0].closed
+    await player.close()
@@ -0,0 +1,80 @@
+"""Tests for serialized and filtered describe replies."""
+
+import io
+
+from wyoming.event import read_event
+from wyoming.info import Attribution, Info, TtsProgram, TtsVoice, TtsVoiceSpeaker
+
+from wyoming_piper.describe import DescribeFilter, InfoCache
+
+
+def _voice(name: str, language: str, speakers: int = 0) -> TtsVoice:
+    return TtsVoice(
+        name=name,
+        description=name,
+        attribution=Attribution(name="", url=""),
+        installed=True,
+        version=None,
+        languages=[language],
+        speakers=[TtsVoiceSpeaker(name=str(i)) for i in range(speakers)] or None,
+    )
+
+
+def _read_info(serialized: bytes) -> Info:
+    event = read_event(io.BytesIO(serialized))
+    assert event is not None
+    return Info.from_event(event)
+
+
+def test_describe_filter() -> None:
+    info = Info(
+        tts=[
+            TtsProgram(
+                name="piper",
+                description="piper",
+                attribution=Attribution(name="", url=""),
+                installed=True,
+                version=None,
+                voices=[
+                    _voice("de_DE-thorsten-medium", "de_DE"),
+                    _voice("en_GB-vctk-medium", "en_GB", speakers=100),
+                    _voice("en_US-lessac-medium", "en_US"),
+                ],
+            )
+        ]
+    )
+    cache = InfoCache(info, installed_voices=["en_US-lessac-medium"])
+
+    # Unfiltered reply is the full info
+    full = cache.get(DescribeFilter.from_data(None))
+    assert _read_info(full) == info
+    assert cache.get(DescribeFilter()) is full
+
+    english = _read_info(cache.get(DescribeFilter.from_data({"language": "en"})))
+    assert [v.name for v in english.tts[0].voices] == [
+        "en_GB-vctk-medium",
+        "en_US-lessac-medium",
+    ]
+    assert len(english.tts[0].voices[0].speakers or []) == 100
+
+    us_data = {"language": "en-US", "speakers": False}
+    us_english = cache.get(DescribeFilter.from_data(us_data))
+    assert [v.name for v in _read_info(us_english).tts[0].voices] == [
+        "en_US-lessac-medium"
+    ]
+
+    no_speakers = cache.get(DescribeFilter.from_data({"speakers": False}))
+    assert len(no_speakers) < len(full)
+    assert all(v.speakers is None for v in _read_info(no_speakers).tts[0].voices)
+
+    installed = DescribeFilter.from_data({"installed": True})
+    assert [v.name for v in _read_info(cache.get(installed)).tts[0].voices] == [
+        "en_US-lessac-medium"
+    ]
+
+    # Downloaded on demand
+    cache.mark_installed("de_DE-thorsten-medium")
+    assert [v.name for v in _read_info(cache.get(installed)).tts[0].voices] == [
+        "de_DE-thorsten-medium",
+        "en_US-lessac-medium",
+    ]
@@ -0,0 +1,222 @@
+"""Tests for the event handler with a stand-in piper."""
+
+import argparse
+import asyncio
+import io
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+from wyoming.event import Event, read_event
+from wyoming.info import Info
+from wyoming.tts import Synthesize
+
+from wyoming_piper import handler as handler_module
+from wyoming_piper.capture import TestCapture
+from wyoming_piper.describe import InfoCache
+from wyoming_piper.handler import PiperEventHandler
+from wyoming_piper.playback import AudioPlayer
+from wyoming_piper.process import PiperProcessManager
+from wyoming_piper.profiler import Profiler
+from wyoming_piper.stats import ServerStats
+
+from .test_process import create_manager
+
+
+class FakeWriter:
+    """Collects what a handler writes to its connection."""
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self.buffer.extend(data)
+
+    def writelines(self, lines: List[bytes]) -> None:
+        for line in lines:
+            self.write(line)
+
+    async def drain(self) -> None:
+        pass
+
+    def events(self) -> List[Event]:
+        reader = io.BytesIO(bytes(self.buffer))
+        events = []
+        while (event := read_event(reader)) is not None:
+            events.append(event)
+
+        return events
+
+
+@pytest.fixture
+def manager(tmp_path: Path) -> PiperProcessManager:
+    return create_manager(tmp_path)
+
+
+def _handler(
+    manager: PiperProcessManager,
+    test_capture: Optional[TestCapture],
+    profiler: Optional[Profiler] = None,
+) -> PiperEventHandler:
+    player = AudioPlayer()
+    cli_args = argparse.Namespace(auto_punctuation=".?!", samples_per_chunk=1024)
+    return PiperEventHandler(
+        InfoCache(Info(), []),
+        cli_args,
+        manager,
+        player,
+        {},
+        test_capture,
+        profiler,
+        ServerStats(manager, player),
+        None,
+        asyncio.StreamReader(),
+        FakeWriter(),
+    )
+
+
+async def test_get_test_audio_waits_for_synthesis(
+    manager: PiperProcessManager, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("FAKE_PIPER_DELAY", "0.3")
+    test_capture = TestCapture(tmp_path / "capture")
+    synthesizing = _handler(manager, test_capture)
+    getting = _handler(manager, test_capture)
+
+    text = "Captured"
+    synthesize_task = asyncio.create_task(
+        synthesizing.handle_event(Synthesize(text=text).event())
+    )
+    while synthesizing.state != "synthesizing":
+        await asyncio.sleep(0.01)
+
+    # Second connection, while the first request is in flight
+    await getting.handle_event(Event(type="get-test-audio"))
+    await synthesize_task
+
+    events = getting.writer.events()
+    assert [event.type for event in events][0] == "audio-start"
+    audio = b"".join(event.payload or b"" for event in events)
+    assert len(audio) == 2 * len(f"{text}.")
+
+    await manager.stop(timeout=5)
+    test_capture.close()
+
+
+async def test_response_id_taken_on_receipt(
+    manager: PiperProcessManager, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("FAKE_PIPER_DELAY", "0.3")
+    test_capture = TestCapture(tmp_path / "capture")
+    handler = _handler(manager, test_capture)
+
+    synthesize_task = asyncio.create_task(
+        handler.handle_event(Synthesize(text="First").event())
+    )
+    while handler.state != "synthesizing":
+        await asyncio.sleep(0.01)
+
+    # Next response starts while the first one's audio is synthesized
+    await handler.handle_event(Event(type="new-response"))
+    await synthesize_task
+
+    assert test_capture.response_ids == [0]
+    assert handler.player.response_id == 1
+
+    await manager.stop(timeout=5)
+    test_capture.close()
+
+
+async def test_client_reply_after_stop(
+    manager: PiperProcessManager, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    handler = _handler(manager, None)
+    monkeypatch.setattr(handler_module, "STOP_CMD", True)
+
+    # Nothing is streamed after a stop, but the request still ends
+    synthesize = Synthesize(text="Stopped").event()
+    synthesize.data["sinks"] = ["client"]
+    await handler.handle_event(synthesize)
+    assert [event.type for event in handler.writer.events()] == [
+        "audio-start",
+        "audio-stop",
+    ]
+
+    handler.writer.buffer.clear()
+    synthesize = Synthesize(text=" ").event()
+    synthesize.data["sinks"] = ["client"]
+    await handler.handle_event(synthesize)
+    assert [event.type for event in handler.writer.events()] == ["error"]
+
+    await manager.stop(timeout=5)
+
+
+async def test_profile_start_input(
+    manager: PiperProcessManager, tmp_path: Path
+) -> None:
+    profiler = Profiler(tmp_path)
+    handler = _handler(manager, None, profiler)
+
+    # Invalid input is logged, and the connection stays open
+    profile_start = Event(type="profile-start", data={"interval_ms": [5]})
+    assert await handler.handle_event(profile_start)
+    assert not profiler.is_running
+
+    profile_start = Event(type="profile-start", data={"interval_ms": "5"})
+    assert await handler.handle_event(profile_start)
+    assert profiler.is_running
+    assert profiler.stop() is not None
+
+
+async def test_ignored_params_warning(
+    manager: PiperProcessManager,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    monkeypatch.setattr(handler_module, "_IGNORED_PARAMS_VOICES", set())
+    handler = _handler(manager, None)
+
+    # The command line worker takes neither; warned once per voice
+    for _ in range(2):
+        synthesize = Synthesize(text="Slower").event()
+        synthesize.data.update({"length_scale": 1.5, "sinks": ["client"]})
+        await handler.handle_event(synthesize)
+
+    warnings = [r for r in caplog.records if "Ignoring speaker" in r.getMessage()]
+    assert len(warnings) == 1
+
+    await manager.stop(timeout=5)
+
+
+async def test_get_test_audio_response_id(
+    manager: PiperProcessManager, tmp_path: Path
+) -> None:
+    test_capture = TestCapture(tmp_path / "capture")
+    test_capture.add(1, bytes(8), 16000, 2, 1)
+    handler = _handler(manager, test_capture)
+
+    # Ids as strings are accepted; anything else is an error reply
+    assert await handler.handle_event(
+        Event(type="get-test-audio", data={"response_id": "1"})
+    )
+    assert await handler.handle_event(
+        Event(type="get-test-audio", data={"response_id": [1]})
+    )
+    events = handler.writer.events()
+    assert [event.type for event in events] == [
+        "audio-start",
+        "audio-chunk",
+        "audio-stop",
+        "error",
+    ]
+    assert events[0].data["response_id"] == 1
+
+    test_capture.close()
+
+
+async def test_play_cue_name(manager: PiperProcessManager) -> None:
+    handler = _handler(manager, None)
+
+    # Not a cue name: unknown cue, the connection stays open
+    for name in (["chime"], {"name": "chime"}, "missing"):
+        assert await handler.handle_event(Event(type="play-cue", data={"name": name}))
@@ -0,0 +1,82 @@
+"""Tests for the response history used by replay-last and continue."""
+
+import asyncio
+
+import numpy as np
+
+from wyoming_piper.history import ResponseHistory
+from wyoming_piper.playback import AudioPlayer, PlaybackSegment
+
+from .test_playback import FakeSink, _wait_for_empty
+
+_RATE = 16000
+
+
+def _segment(response_id: int, num_samples: int) -> PlaybackSegment:
+    return PlaybackSegment(
+        response_id=response_id,
+        audio=bytes(num_samples * 2),
+        rate=_RATE,
+        width=2,
+        channels=1,
+    )
+
+
+def test_history_is_bounded() -> None:
+    history = ResponseHistory(max_responses=2, max_bytes=10000)
+    for response_id in range(3):
+        history.add(_segment(response_id, 100))
+
+    assert list(history.responses) == [1, 2]
+
+    # Too large for the byte budget: older responses go first
+    history.add(_segment(3, 4950))
+    assert list(history.responses) == [3]
+
+    latest = history.get()
+    assert latest is not None
+    assert latest.response_id == 3
+
+
+def test_get_segments_from_position() -> None:
+    history = ResponseHistory(max_responses=1)
+    history.add(_segment(0, 100))
+    history.add(_segment(0, 100))
+
+    response = history.get(0)
+    assert response is not None
+    segments = response.get_segments(301)
+
+    # Frame aligned, continues into the second chunk
+    assert [len(s.audio) for s in segments] == [100]
+    assert response.heard == 301
+
+
+async def test_continue_after_stop() -> None:
+    FakeSink.instances = []
+    history = ResponseHistory(max_responses=3)
+    player = AudioPlayer(
+        samples_per_chunk=256, max_lead=0.1, sink_factory=FakeSink, history=history
+    )
+    player.start()
+
+    player.new_response()
+    audio = (np.arange(_RATE // 2) % 1000).astype(np.int16).tobytes()
+    player.enqueue(audio[: len(audio) // 2], _RATE, 2, 1)
+    player.enqueue(audio[len(audio) // 2 :], _RATE, 2, 1)
+    await asyncio.sleep(0.2)
+    await player.stop()
+
+    response = history.get_unfinished()
+    assert response is not None
+    heard = response.heard
+    assert 0 < heard < len(audio)
+
+    player.enqueue_segments(response.get_segments(heard))
+    await _wait_for_empty(player)
+    await asyncio.sleep(0.2)
+
+    assert audio[:heard] + FakeSink.instances[1].audio == audio
+    assert response.is_finished
+    assert history.get_unfinished() is None
+    await player.close()
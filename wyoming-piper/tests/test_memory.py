@@ -0,0 +1,50 @@
+"""Tests for memory accounting."""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from wyoming_piper.memory import HeapTracker, get_rss, get_worker_memory
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="RSS is read from /proc"
+)
+
+
+def test_worker_memory(tmp_path: Path) -> None:
+    model_path = tmp_path / "voice.onnx"
+    model_path.write_bytes(bytes(1234))
+
+    rss = get_rss()
+    assert (rss is not None) and (rss > 0)
+
+    workers = get_worker_memory(
+        {"voice": (os.getpid(), model_path), "missing": (999999999, None)}
+    )
+    assert workers["voice"]["model_bytes"] == 1234
+    assert workers["voice"]["rss_bytes"] is not None
+    assert workers["missing"] == {
+        "pid": 999999999,
+        "rss_bytes": None,
+        "model_bytes": None,
+    }
+
+
+def test_heap_growth() -> None:
+    tracker = HeapTracker(top=5)
+    try:
+        baseline = tracker.diff()
+        assert baseline["baseline"] and (baseline["growth"] == [])
+
+        grown = [bytes(1024) for _ in range(1000)]
+        result = tracker.diff()
+        assert not result["baseline"]
+        assert result["growth"][0]["location"].startswith(__file__)
+        assert result["growth"][0]["size_diff"] >= 1000 * 1024
+        del grown
+    finally:
+        tracker.stop()
+
+    assert not tracker.is_tracing
@@ -0,0 +1,33 @@
+"""Tests for the event loop lag monitor."""
+
+import asyncio
+import time
+
+from wyoming_piper.monitor import LoopLagMonitor
+
+
+def _block_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def _blocking_task() -> None:
+    _block_loop(0.3)
+
+
+async def test_stall_is_counted_and_attributed() -> None:
+    monitor = LoopLagMonitor(threshold=0.1, interval=0.02)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        assert monitor.stalls == 0
+
+        await asyncio.create_task(_blocking_task(), name="blocker")
+        await asyncio.sleep(0.1)
+
+        assert monitor.stalls == 1
+        assert monitor.max_lag >= 0.2
+        assert monitor.last_culprit is not None
+        assert "blocker" in monitor.last_culprit
+        assert "_block_loop" in monitor.last_culprit
+    finally:
+        monitor.stop()
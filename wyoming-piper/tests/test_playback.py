@@ -0,0 +1,210 @@
+"""Tests for buffer-based playback."""
+
+import asyncio
+from typing import List
+
+import numpy as np
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.event import Event
+
+from wyoming_piper.history import ResponseHistory
+from wyoming_piper.playback import (
+    AplaySink,
+    AudioPlayer,
+    PlaybackSubscriber,
+    audio_to_events,
+    crossfade,
+)
+
+_RATE = 16000
+
+
+class FakeSink(AplaySink):
+    """Collects written audio instead of playing it."""
+
+    instances: "List[FakeSink]" = []
+
+    def __init__(self, rate: int, width: int, channels: int) -> None:
+        super().__init__(rate, width, channels)
+        self.audio = bytes()
+        self.closed = False
+        FakeSink.instances.append(self)
+
+    async def open(self) -> None:
+        pass
+
+    def write(self, audio: bytes) -> None:
+        self.audio += audio
+
+    async def drain(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        self.closed = True
+
+    def kill(self) -> None:
+        self.closed = True
+
+
+def _tone(value: int, num_samples: int) -> bytes:
+    return np.full(num_samples, value, dtype=np.int16).tobytes()
+
+
+async def _wait_for_empty(player: AudioPlayer, timeout: float = 5.0) -> None:
+    async def _wait() -> None:
+        while player.queue:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(_wait(), timeout=timeout)
+
+
+def test_crossfade() -> None:
+    mixed = np.frombuffer(
+        crossfade(_tone(1000, 5), _tone(-1000, 5), channels=1), dtype=np.int16
+    )
+    assert mixed.tolist() == [1000, 500, 0, -500, -1000]
+
+
+def test_audio_to_events() -> None:
+    audio = _tone(5, 2500)
+    events = audio_to_events(audio, _RATE, 2, 1, samples_per_chunk=1024)
+
+    assert AudioStart.is_type(events[0].type)
+    assert AudioStop.is_type(events[-1].type)
+    chunks = [AudioChunk.from_event(e) for e in events[1:-1]]
+    assert [len(c.audio) for c in chunks] == [2048, 2048, 904]
+    assert b"".join(c.audio for c in chunks) == audio
+    assert chunks[1].timestamp == 64
+
+
+async def test_gapless_single_stream() -> None:
+    FakeSink.instances = []
+    player = AudioPlayer(samples_per_chunk=256, max_lead=10, sink_factory=FakeSink)
+    player.start()
+
+    player.enqueue(_tone(1, 1000), _RATE, 2, 1)
+    player.enqueue(_tone(2, 1000), _RATE, 2, 1)
+    await _wait_for_empty(player)
+
+    # Both chunks go to one output stream, unchanged
+    assert len(FakeSink.instances) == 1
+    assert FakeSink.instances[0].audio == _tone(1, 1000) + _tone(2, 1000)
+    await player.close()
+
+
+async def test_crossfade_within_response() -> None:
+    FakeSink.instances = []
+    player = AudioPlayer(
+        samples_per_chunk=256, crossfade_ms=10, max_lead=10, sink_factory=FakeSink
+    )
+    player.start()
+
+    player.enqueue(_tone(1000, 1000), _RATE, 2, 1)
+    player.enqueue(_tone(-1000, 1000), _RATE, 2, 1)
+    await _wait_for_empty(player)
+
+    # 10 ms at 16 kHz = 160 overlapping samples
+    audio = np.frombuffer(FakeSink.instances[0].audio, dtype=np.int16)
+    assert len(audio) == 2000 - 160
+    assert audio[839] == 1000
+    assert abs(audio[840 + 80]) < 20
+    assert audio[-1] == -1000
+    await player.close()
+
+
+async def test_stop_clears_queue() -> None:
+    FakeSink.instances = []
+    player = AudioPlayer(samples_per_chunk=256, max_lead=0, sink_factory=FakeSink)
+    player.start()
+
+    player.enqueue(_tone(1, _RATE), _RATE, 2, 1)
+    player.enqueue(_tone(2, _RATE), _RATE, 2, 1)
+    await asyncio.sleep(0.05)
+    await player.stop()
+
+    assert not player.queue
+    assert FakeSink.instances[0].closed
+    assert len(FakeSink.instances[0].audio) < (2 * _RATE * 2)
+    await player.close()
+
+
+async def test_pause_resume_exact_position() -> None:
+    FakeSink.instances = []
+    player = AudioPlayer(samples_per_chunk=256, max_lead=0.1, sink_factory=FakeSink)
+    player.start()
+
+    first = (np.arange(_RATE // 2) % 1000).astype(np.int16).tobytes()
+    second = _tone(7, _RATE // 4)
+    player.enqueue(first, _RATE, 2, 1)
+    await asyncio.sleep(0.2)
+    await player.pause()
+
+    # Output is released, nothing plays while paused, queued audio is kept
+    assert player.is_paused
+    assert FakeSink.instances[0].closed
+    rewound = player.queue[0]
+    assert not rewound.fade
+
+    player.enqueue(second, _RATE, 2, 1)
+    await asyncio.sleep(0.1)
+    assert len(FakeSink.instances) == 1
+
+    player.resume()
+    await _wait_for_empty(player)
+
+    # Heard audio + resumed audio is the original without gaps or repeats
+    heard = FakeSink.instances[0].audio[: -len(rewound.audio)]
+    assert heard + FakeSink.instances[1].audio == first + second
+    await player.close()
+
+
+async def test_playback_events_and_tap() -> None:
+    FakeSink.instances = []
+    player = AudioPlayer(samples_per_chunk=256, max_lead=0.1, sink_factory=FakeSink)
+    player.start()
+
+    events: List[Event] = []
+
+    async def write_event(event: Event) -> None:
+        events.append(event)
+
+    subscriber = PlaybackSubscriber(write_event=write_event, audio=True)
+    player.subscribe(subscriber)
+    audio = _tone(3, _RATE // 10)
+    player.enqueue(audio, _RATE, 2, 1)
+    await asyncio.sleep(0.3)
+
+    assert events[0].type == "speaking-started"
+    assert events[-1].type == "speaking-stopped"
+    assert events[-1].data["reason"] == "finished"
+    assert events[-1].data["timestamp"] >= events[0].data["timestamp"] + 0.09
+
+    tapped = [AudioChunk.from_event(e) for e in events if AudioChunk.is_type(e.type)]
+    assert b"".join(chunk.audio for chunk in tapped) == audio
+
+    player.unsubscribe(subscriber)
+    await player.close()
+    await asyncio.sleep(0)
+
+
+async def test_playback_rate() -> None:
+    FakeSink.instances = []
+    player = AudioPlayer(
+        samples_per_chunk=256,
+        max_lead=10,
+        sink_factory=FakeSink,
+        history=ResponseHistory(2),
+    )
+    assert player.set_playback_rate(5.0) == 2.0
+    player.start()
+
+    tone = (np.sin(np.arange(_RATE) * 0.1) * 5000).astype(np.int16).tobytes()
+    player.enqueue(tone, _RATE, 2, 1)
+    await _wait_for_empty(player)
+
+    # Half as long, and the whole response counts as heard
+    assert len(FakeSink.instances[0].audio) == len(tone) // 2
+    assert player.history is not None
+    response = player.history.get()
+    assert (response is not None) and response.is_finished
+    await player.close()
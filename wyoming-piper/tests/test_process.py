@@ -0,0 +1,307 @@
+"""Tests for the piper process manager with a stand-in piper."""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from asyncio.subprocess import PIPE
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from wyoming_piper.process import (
+    WORKER_CLI,
+    WORKER_PYTHON,
+    AudioData,
+    PiperProcess,
+    PiperProcessManager,
+    VoiceSettings,
+    stop_process,
+)
+
+_FAKE_PIPER = Path(__file__).parent / "fake_piper.py"
+_PIPER_STUB = Path(__file__).parent / "piper_stub"
+
+
+@pytest.fixture
+def manager(tmp_path: Path) -> PiperProcessManager:
+    return create_manager(tmp_path)
+
+
+def create_manager(tmp_path: Path) -> PiperProcessManager:
+    """Manager of a "test" voice run by the stand-in piper."""
+    model_path = _write_model(tmp_path / "test.onnx", 1024)
+    piper = tmp_path / "piper"
+    piper.write_text(f'#!/bin/sh\nexec {sys.executable} {_FAKE_PIPER} "$@"\n')
+    piper.chmod(0o755)
+
+    args = argparse.Namespace(
+        voice="test",
+        speaker=None,
+        noise_scale=None,
+        length_scale=None,
+        noise_w=None,
+        piper_worker=WORKER_CLI,
+        piper=str(piper),
+        max_piper_procs=1,
+        voice_threads=1,
+        max_tts_memory=0,
+        drain_timeout=5.0,
+        data_dir=[str(tmp_path)],
+        download_dir=str(tmp_path),
+    )
+    manager = PiperProcessManager(args, {})
+    manager.voice_settings["test"] = VoiceSettings(model=str(model_path))
+    return manager
+
+
+def _write_model(model_path: Path, size: int) -> Path:
+    model_path.write_bytes(bytes(size))
+    Path(f"{model_path}.json").write_text(
+        json.dumps({"audio": {"sample_rate": 16000}}), encoding="utf-8"
+    )
+    return model_path
+
+
+async def _synthesize(manager: PiperProcessManager, text: str) -> AudioData:
+    piper_proc = await manager.get_process()
+    return await piper_proc.submit(text)
+
+
+async def _removed(path: Path) -> None:
+    while path.exists():
+        await asyncio.sleep(0.01)
+
+
+async def test_reload_voice(manager: PiperProcessManager) -> None:
+    old_proc = await manager.get_process()
+    audio, rate, width, channels = await _synthesize(manager, "hello")
+    assert (len(audio), rate, width, channels) == (10, 16000, 2, 1)
+
+    # Replaced while a request is in flight
+    old_proc.begin_request()
+    new_proc = await manager.reload_voice(length_scale=0.8)
+    assert new_proc is not None
+    assert await manager.get_process() is new_proc
+    assert manager.voice_settings["test"].length_scale == 0.8
+
+    await asyncio.sleep(0.2)
+    assert old_proc.proc.returncode is None
+
+    old_proc.end_request()
+    assert old_proc.wav_dir is not None
+    await asyncio.wait_for(_removed(Path(old_proc.wav_dir.name)), timeout=5)
+    assert old_proc.proc.returncode is not None
+
+    # Not running: only the settings change
+    assert await manager.reload_voice("other", noise_scale=0.5) is None
+    assert manager.voice_settings["other"].noise_scale == 0.5
+
+    await manager.stop(timeout=5)
+    assert new_proc.proc.returncode is not None
+
+
+async def test_stop_waits_for_pending(manager: PiperProcessManager) -> None:
+    piper_proc = await manager.get_process()
+    finished = []
+
+    async def _request() -> None:
+        async with manager.pending_request():
+            await asyncio.sleep(0.2)
+            await _synthesize(manager, "pending")
+            finished.append(True)
+
+    request_task = asyncio.create_task(_request())
+    await asyncio.sleep(0.05)
+    await manager.stop(timeout=5)
+
+    assert finished
+    assert piper_proc.proc.returncode is not None
+    await request_task
+
+    with pytest.raises(RuntimeError):
+        await manager.get_process()
+
+
+async def test_pipelined_requests(manager: PiperProcessManager) -> None:
+    piper_proc = await manager.get_process()
+
+    # Queued without waiting; completed in order
+    texts = ["a" * (i + 1) for i in range(10)]
+    output_paths = [piper_proc.submit(text) for text in texts]
+    assert len(piper_proc.pending) == len(texts)
+
+    for text, output_path in zip(texts, output_paths):
+        audio, _rate, _width, _channels = await output_path
+        assert len(audio) == 2 * len(text)
+
+    assert not piper_proc.pending
+    assert piper_proc.wav_dir is not None
+    assert not list(Path(piper_proc.wav_dir.name).iterdir())
+
+    # Pending requests fail when the process exits
+    piper_proc.proc.send_signal(signal.SIGSTOP)
+    output_path = piper_proc.submit("lost")
+    piper_proc.proc.kill()
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(output_path, timeout=5)
+
+    await manager.stop(timeout=1)
+
+
+async def test_delivery_order(manager: PiperProcessManager) -> None:
+    delivered: List[int] = []
+
+    async def _deliver(index: int, delay: float) -> None:
+        previous, done = manager.delivery_order.take()
+        await asyncio.sleep(delay)
+        await previous.wait()
+        delivered.append(index)
+        done.set()
+
+    await asyncio.gather(*(_deliver(i, 0.05 * (3 - i)) for i in range(4)))
+    assert delivered == [0, 1, 2, 3]
+
+
+async def test_voice_threads(
+    manager: PiperProcessManager, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Python worker with the stand-in piper package, which fails requests
+    # unless two are synthesized at the same time
+    python_path = [str(_PIPER_STUB), str(Path(__file__).parent.parent)]
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(python_path))
+    monkeypatch.setenv("FAKE_PIPER_PARALLEL", "2")
+    manager.args.piper_worker = WORKER_PYTHON
+    manager.args.voice_threads = 2
+
+    # Later requests finish first; results still come in order
+    piper_proc = await manager.get_process()
+    texts = ["a" * (i + 1) for i in range(6)]
+    futures = [piper_proc.submit(text) for text in texts]
+    for text, future in zip(texts, futures):
+        audio, rate, _width, _channels = await asyncio.wait_for(future, timeout=10)
+        assert (len(audio), rate) == (2 * len(text), 16000)
+
+    await manager.stop(timeout=5)
+
+
+async def _start_frames_process(tmp_path: Path) -> PiperProcess:
+    config_path = tmp_path / "test.onnx.json"
+    config_path.write_text(json.dumps({"audio": {"sample_rate": 22050}}))
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable,
+        str(_FAKE_PIPER),
+        "--model",
+        "test.onnx",
+        "--config",
+        str(config_path),
+        "--output-frames",
+        stdin=PIPE,
+        stdout=PIPE,
+        stderr=PIPE,
+    )
+    piper_proc = PiperProcess(
+        name="test", proc=proc, config={}, wav_dir=None, output_frames=True
+    )
+    piper_proc.start_readers()
+    return piper_proc
+
+
+async def test_output_frames(tmp_path: Path) -> None:
+    piper_proc = await _start_frames_process(tmp_path)
+    texts = ["one", "two two", "fail", "three three three"]
+    futures = [piper_proc.submit(text) for text in texts]
+    for text, future in zip(texts, futures):
+        if text == "fail":
+            with pytest.raises(RuntimeError):
+                await future
+            continue
+
+        audio, rate, width, channels = await future
+        assert (len(audio), rate, width, channels) == (2 * len(text), 22050, 2, 1)
+
+    await stop_process(piper_proc)
+    assert piper_proc.proc.returncode is not None
+
+
+async def test_exit_in_frame(tmp_path: Path) -> None:
+    piper_proc = await _start_frames_process(tmp_path)
+
+    # Requests after the cut-off frame fail instead of waiting forever
+    futures = [piper_proc.submit(text) for text in ("one", "crash", "two")]
+    audio, _rate, _width, _channels = await futures[0]
+    assert len(audio) == 6
+    for future in futures[1:]:
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(future, timeout=5)
+
+    assert not piper_proc.pending
+    await stop_process(piper_proc)
+
+
+async def test_memory_budget(manager: PiperProcessManager, tmp_path: Path) -> None:
+    manager.args.max_piper_procs = 0
+    mib = 1024 * 1024
+    for name in ("a", "b", "c"):
+        model_path = _write_model(tmp_path / f"{name}.onnx", 4 * mib)
+        manager.voice_settings[name] = VoiceSettings(model=str(model_path))
+
+    proc_a = await manager.get_process("a")
+    proc_b = await manager.get_process("b")
+    assert set(manager.processes) == {"a", "b"}
+
+    # Room for the new worker and one more at most
+    largest = max(proc_a.get_memory(), proc_b.get_memory())
+    manager.args.max_tts_memory = (largest + 4 * mib) / mib + 1
+    proc_b.begin_request()
+    await manager.get_process("c")
+
+    # "a" is least recently used and idle; "b" is busy
+    assert set(manager.processes) == {"b", "c"}
+    assert manager.evictions == 1
+    await asyncio.wait_for(proc_a.proc.wait(), timeout=5)
+
+    # Nothing idle to stop: over budget until "b" is done
+    manager.args.max_tts_memory = 1
+    manager.processes["c"].begin_request()
+    await manager.get_process("a")
+    assert set(manager.processes) == {"a", "b", "c"}
+
+    proc_b.end_request()
+    manager.processes["c"].end_request()
+    await manager.stop(timeout=1)
+
+
+async def test_unload_idle_voices(manager: PiperProcessManager, tmp_path: Path) -> None:
+    manager.args.max_piper_procs = 0
+    for name in ("a", "b"):
+        model_path = _write_model(tmp_path / f"{name}.onnx", 1024)
+        manager.voice_settings[name] = VoiceSettings(model=str(model_path))
+
+    default_proc = await manager.get_process()
+    proc_a = await manager.get_process("a")
+    proc_b = await manager.get_process("b")
+    manager.unload_idle_voices(timeout=60)
+    assert set(manager.processes) == {"test", "a", "b"}
+
+    # Idle for an hour; "b" is still busy
+    an_hour_ago = time.monotonic_ns() - int(3600 * 1e9)
+    for piper_proc in (default_proc, proc_a, proc_b):
+        piper_proc.last_used = an_hour_ago
+
+    proc_b.begin_request()
+    manager.unload_idle_voices(timeout=60)
+    assert set(manager.processes) == {"test", "b"}
+    assert manager.idle_unloads == 1
+    await asyncio.wait_for(proc_a.proc.wait(), timeout=5)
+
+    # Idle from the end of its last request
+    proc_b.end_request()
+    manager.unload_idle_voices(timeout=60)
+    assert set(manager.processes) == {"test", "b"}
+
+    await manager.stop(timeout=1)
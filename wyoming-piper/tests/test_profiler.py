@@ -0,0 +1,57 @@
+"""Tests for on-demand profiling."""
+
+import pstats
+import time
+from pathlib import Path
+
+import pytest
+
+from wyoming_piper.profiler import Profiler
+
+
+def _busy_function(seconds: float) -> None:
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def test_sample_profile(tmp_path: Path) -> None:
+    profiler = Profiler(tmp_path, interval=0.001)
+    profiler.start("sample")
+    assert profiler.is_running
+    _busy_function(0.1)
+
+    result = profiler.stop()
+    assert (result is not None) and (not profiler.is_running)
+    profile_path = result.save()
+    assert profile_path.suffix == ".folded"
+
+    # Collapsed stacks: "outer;...;inner count"
+    lines = profile_path.read_text(encoding="utf-8").splitlines()
+    busy_samples = sum(
+        int(line.rsplit(" ", 1)[1])
+        for line in lines
+        if "test_sample_profile" in line and "_busy_function" in line
+    )
+    assert busy_samples > 10
+
+
+def test_cprofile_profile(tmp_path: Path) -> None:
+    profiler = Profiler(tmp_path)
+    profiler.start("cprofile")
+    _busy_function(0.01)
+
+    result = profiler.stop()
+    assert result is not None
+    stats = pstats.Stats(str(result.save()))
+    assert any(func[2] == "_busy_function" for func in stats.stats)  # type: ignore
+
+
+def test_invalid_use(tmp_path: Path) -> None:
+    profiler = Profiler(tmp_path)
+    assert profiler.stop() is None
+
+    with pytest.raises(ValueError):
+        profiler.start("perf")
+
+    assert not profiler.is_running
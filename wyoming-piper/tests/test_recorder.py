@@ -0,0 +1,37 @@
+"""Tests for traffic recording."""
+
+from pathlib import Path
+
+from wyoming_piper.recorder import CLOSE, EVENT, OPEN, TrafficRecorder, load_recording
+
+
+def test_record_and_load(tmp_path: Path) -> None:
+    recording_path = tmp_path / "traffic.jsonl"
+    recorder = TrafficRecorder(recording_path)
+    recorder.open_connection(1)
+    recorder.event(1, "synthesize", {"text": "Hello world."})
+    recorder.event(1, "audio-chunk", {"rate": 22050}, payload_length=4096)
+    recorder.open_connection(2)
+    recorder.event(2, "audio-stop", None)
+    recorder.close_connection(1)
+    recorder.close()
+
+    # Nothing is recorded after closing
+    recorder.event(2, "describe", None)
+
+    actions = load_recording(recording_path)
+    assert [(a.connection, a.action, a.type) for a in actions] == [
+        (1, OPEN, None),
+        (1, EVENT, "synthesize"),
+        (1, EVENT, "audio-chunk"),
+        (2, OPEN, None),
+        (2, EVENT, "audio-stop"),
+        (1, CLOSE, None),
+    ]
+    assert actions[1].data == {"text": "Hello world."}
+    assert actions[2].payload_length == 4096
+    assert actions[4].data == {}
+
+    times = [action.time for action in actions]
+    assert times == sorted(times)
+    assert 0 <= times[0] < 1
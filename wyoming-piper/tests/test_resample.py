@@ -0,0 +1,23 @@
+"""Tests for rate and channel conversion."""
+
+import numpy as np
+
+from wyoming_piper.resample import AudioConverter
+
+
+def test_resampling_is_band_limited() -> None:
+    def _resample(frequency: float) -> np.ndarray:
+        tone = 10000 * np.sin(2 * np.pi * frequency * np.arange(22050) / 22050)
+        converter = AudioConverter(22050, 1, 16000, 1)
+        audio = converter.convert(tone.astype(np.int16).tobytes())
+        audio += converter.flush()
+        return np.frombuffer(audio, dtype=np.int16)[1000:-1000].astype(np.float32)
+
+    # In band: same tone at the new rate
+    passed = _resample(1000)
+    expected = 10000 * np.sin(2 * np.pi * 1000 * (np.arange(16000) / 16000))
+    assert np.max(np.abs(passed - expected[1000:-1000])) < 10
+
+    # Above the new Nyquist frequency: removed instead of folded to 6 kHz
+    above = _resample(10000)
+    assert np.sqrt(np.mean(above**2)) < 10
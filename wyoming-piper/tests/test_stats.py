@@ -0,0 +1,65 @@
+"""Tests for the stats snapshot."""
+
+import argparse
+import json
+import tempfile
+import time
+from types import SimpleNamespace
+
+from wyoming_piper.history import ResponseHistory
+from wyoming_piper.playback import AudioPlayer
+from wyoming_piper.process import PiperProcess, PiperProcessManager
+from wyoming_piper.stats import LatencyWindow, ServerStats
+
+
+def test_latency_percentiles() -> None:
+    window = LatencyWindow(size=100)
+    assert window.percentiles() == {"count": 0, "window": 0}
+
+    for i in range(200):
+        window.add((i % 100 + 1) / 1000)
+
+    stats = window.percentiles()
+    assert stats["count"] == 200
+    assert stats["window"] == 100
+    assert 50 <= stats["p50_ms"] <= 51
+    assert 99 <= stats["p99_ms"] <= 100
+    assert stats["max_ms"] == 100
+
+
+def test_snapshot() -> None:
+    manager = PiperProcessManager(argparse.Namespace(voice="test"), {})
+    with tempfile.TemporaryDirectory() as wav_dir:
+        manager.processes["test"] = PiperProcess(
+            name="test",
+            proc=SimpleNamespace(pid=1234, returncode=None),  # type: ignore[arg-type]
+            config={},
+            wav_dir=wav_dir,  # type: ignore[arg-type]
+            last_used=time.monotonic_ns(),
+            in_flight=1,
+        )
+        manager.hits, manager.misses = 3, 1
+
+        player = AudioPlayer(history=ResponseHistory(2))
+        assert player.history is not None
+        player.history.get()
+
+        stats = ServerStats(manager, player)
+        connection_id = stats.add_connection(lambda: {"state": "waiting"})
+        stats.synthesize_latency.add(0.25)
+
+        snapshot = stats.snapshot(stop_requested=True)
+        json.dumps(snapshot)
+
+        assert snapshot["voices"]["test"]["pid"] == 1234
+        assert snapshot["voices"]["test"]["busy"]
+        assert snapshot["connections"] == {str(connection_id): {"state": "waiting"}}
+        assert snapshot["playback"]["stop_requested"]
+        assert snapshot["caches"]["voice_workers"]["hit_ratio"] == 0.75
+        assert snapshot["caches"]["history"]["misses"] == 1
+        assert snapshot["caches"]["history"]["hit_ratio"] == 0.0
+        assert snapshot["latency"]["synthesize"]["p50_ms"] == 250
+        assert "event_loop" not in snapshot
+
+        stats.remove_connection(connection_id)
+        assert stats.snapshot(stop_requested=False)["connections"] == {}
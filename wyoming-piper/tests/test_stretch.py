@@ -0,0 +1,41 @@
+"""Tests for time-stretching."""
+
+import numpy as np
+
+from wyoming_piper.stretch import time_stretch
+
+_RATE = 22050
+
+
+def _sine(frequency: float, seconds: float, channels: int = 1) -> np.ndarray:
+    t = np.arange(int(_RATE * seconds)) / _RATE
+    mono = (np.sin(2 * np.pi * frequency * t) * 8000).astype(np.int16)
+    return np.repeat(mono[:, np.newaxis], channels, axis=1)
+
+
+def _peak_frequency(samples: np.ndarray) -> float:
+    windowed = samples.astype(np.float64) * np.hanning(len(samples))
+    spectrum = np.abs(np.fft.rfft(windowed))
+    return float(np.argmax(spectrum) * _RATE / len(samples))
+
+
+def test_stretch_keeps_pitch() -> None:
+    tone = _sine(220, 2.0)
+    for rate in (0.5, 0.8, 1.5, 2.0):
+        stretched = np.frombuffer(
+            time_stretch(tone.tobytes(), rate, _RATE, channels=1), dtype=np.int16
+        )
+        assert len(stretched) == round(len(tone) / rate)
+        assert abs(_peak_frequency(stretched) - 220) < 2
+
+        # No clicks: steps are no larger than those of the sine itself
+        steps = np.abs(np.diff(stretched.astype(np.int32)))
+        assert steps.max() <= 8000 * 2 * np.pi * 220 / _RATE + 10
+
+
+def test_stretch_stereo_and_passthrough() -> None:
+    tone = _sine(440, 0.5, channels=2).tobytes()
+    assert time_stretch(tone, 1.0, _RATE, channels=2) == tone
+
+    stretched = time_stretch(tone, 1.25, _RATE, channels=2)
+    assert len(stretched) == round(len(tone) / 4 / 1.25) * 4
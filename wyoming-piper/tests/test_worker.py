@@ -0,0 +1,98 @@
+"""Tests for per-request parameters and threads of the Python worker."""
+
+import json
+import threading
+import time
+from typing import Callable, List
+
+import pytest
+
+from wyoming_piper.worker import (
+    SynthesisParams,
+    lock_phonemizer,
+    parse_request,
+    run_in_order,
+)
+
+_DEFAULTS = SynthesisParams(speaker_id=0, length_scale=1.0)
+
+
+def test_plain_text() -> None:
+    assert parse_request("Hello world.\n", _DEFAULTS) == ("Hello world.", _DEFAULTS)
+    assert parse_request("{not json}", _DEFAULTS) == ("{not json}", _DEFAULTS)
+
+
+def test_json_request() -> None:
+    params = SynthesisParams(speaker_id=3, noise_w=0.5)
+    line = json.dumps(params.to_request("Hi."))
+    assert json.loads(line) == {"text": "Hi.", "speaker_id": 3, "noise_w": 0.5}
+
+    text, parsed = parse_request(line, _DEFAULTS)
+    assert text == "Hi."
+
+    # Missing parameters keep the command line defaults
+    assert parsed == SynthesisParams(speaker_id=3, length_scale=1.0, noise_w=0.5)
+
+    # Wrong types fail the request (the worker reports it and carries on)
+    with pytest.raises(ValueError):
+        parse_request('{"text": "Hi.", "speaker_id": "x"}', _DEFAULTS)
+
+    with pytest.raises(TypeError):
+        parse_request('{"text": "Hi.", "length_scale": [1]}', _DEFAULTS)
+
+
+def test_run_in_order() -> None:
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def job(index: int) -> Callable[[], int]:
+        def run() -> int:
+            nonlocal active, max_active
+            with lock:
+                active += 1
+                max_active = max(max_active, active)
+
+            # Later jobs finish first
+            time.sleep(0.05 * (4 - index))
+            with lock:
+                active -= 1
+
+            return index
+
+        return run
+
+    results: List[int] = []
+    run_in_order((job(i) for i in range(4)), results.append, threads=4)
+    assert results == [0, 1, 2, 3]
+    assert max_active > 1
+
+    results.clear()
+    run_in_order((job(i) for i in range(4)), results.append)
+    assert results == [0, 1, 2, 3]
+
+
+def test_lock_phonemizer() -> None:
+    class Voice:
+        def __init__(self) -> None:
+            self.active = 0
+            self.max_active = 0
+
+        def phonemize(self, text: str) -> List[List[str]]:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            time.sleep(0.01)
+            self.active -= 1
+            return [list(text)]
+
+    voice = Voice()
+    lock_phonemizer(voice)
+    threads = [threading.Thread(target=voice.phonemize, args=("hi",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert voice.max_active == 1
+    assert voice.phonemize("hi") == [["h", "i"]]
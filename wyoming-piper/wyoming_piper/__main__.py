@@ -1,14 +1,17 @@
 #!/usr/bin/env python3
 import argparse
 import asyncio
+import importlib.util
 import json
 import logging
+import signal
+import time
 from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Set
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
 
 from wyoming.info import Attribution, Info, TtsProgram, TtsVoice, TtsVoiceSpeaker
-from wyoming.server import AsyncServer
+from wyoming.server import AsyncServer, AsyncStdioServer, HandlerFactory
 
 try:
     from . import __version__
@@ -16,9 +19,18 @@ except ImportError:
     # Fallback if __version__ is not available (editable install)
     __version__ = "2.2.2"
 
+from .capture import TestCapture
+from .cues import AudioCue, load_cues
+from .describe import InfoCache
 from .download import find_voice, get_voices
 from .handler import PiperEventHandler
-from .process import PiperProcessManager
+from .history import ResponseHistory
+from .monitor import LoopLagMonitor
+from .playback import AudioPlayer
+from .process import WORKER_CLI, WORKER_PYTHON, PiperProcessManager
+from .profiler import Profiler
+from .recorder import TrafficRecorder
+from .stats import ServerStats
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -28,8 +40,15 @@ async def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--piper",
-        required=True,
-        help="Path to piper executable",
+        help="Path to piper executable (needed for --piper-worker cli)",
+    )
+    parser.add_argument(
+        "--piper-worker",
+        choices=("auto", WORKER_CLI, WORKER_PYTHON),
+        default="auto",
+        help="cli: run --piper; python: run wyoming_piper.worker, which takes speaker "
+        "and scales per request (default: cli if --piper is given, else python if "
+        "piper-tts is importable)",
     )
     parser.add_argument(
         "--voice",
@@ -59,12 +78,71 @@ async def main() -> None:
         "--auto-punctuation", default=".?!", help="Automatically add punctuation"
     )
     parser.add_argument("--samples-per-chunk", type=int, default=1024)
+    parser.add_argument(
+        "--crossfade-ms",
+        type=float,
+        default=0.0,
+        help="Crossfade between consecutive chunks of a response (default: 0)",
+    )
+    parser.add_argument(
+        "--replay-responses",
+        type=int,
+        default=3,
+        help="Number of recent responses kept in memory for replay-last/continue (default: 3, 0 to disable)",
+    )
     parser.add_argument(
         "--max-piper-procs",
         type=int,
         default=1,
         help="Maximum number of piper process to run simultaneously (default: 1)",
     )
+    parser.add_argument(
+        "--voice-threads",
+        type=int,
+        default=1,
+        help="Requests each voice's worker synthesizes at the same time, sharing one loaded model (python worker only, default: 1)",
+    )
+    parser.add_argument(
+        "--max-tts-memory",
+        type=float,
+        default=0,
+        help="Memory budget for piper workers in MiB; least recently used idle workers are stopped to stay within it (default: 0, no budget)",
+    )
+    parser.add_argument(
+        "--voice-idle-timeout",
+        type=float,
+        default=0,
+        help="Stop the workers of voices other than --voice after this many idle seconds (default: 0, never)",
+    )
+    parser.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=10.0,
+        help="Seconds that requests in flight get to finish when a worker is replaced or on SIGTERM (default: 10)",
+    )
+    parser.add_argument(
+        "--cue-dir",
+        help="Directory of WAV files loaded at startup for play-cue events",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help="Enable profile-start/profile-stop events and SIGUSR1, writing profiles here",
+    )
+    parser.add_argument(
+        "--record-traffic",
+        help="Record incoming events to this JSON lines file (see script/replay)",
+    )
+    parser.add_argument(
+        "--uvloop",
+        action="store_true",
+        help="Use uvloop for the event loop if it is installed (pip install wyoming-piper-custom[uvloop])",
+    )
+    parser.add_argument(
+        "--loop-lag-threshold",
+        type=float,
+        default=100.0,
+        help="Log event loop stalls longer than this many milliseconds (default: 100, 0 to disable)",
+    )
     #
     parser.add_argument(
         "--update-voices",
@@ -83,6 +161,16 @@ async def main() -> None:
         default="./tests/audio/outputs",
         help="Directory to save test audio files (default: ./tests/audio/outputs)"
     )
+    parser.add_argument(
+        "--test-sample-rate",
+        type=int,
+        help="Resample test audio to this rate as it is saved (e.g. 16000 for Whisper)",
+    )
+    parser.add_argument(
+        "--test-channels",
+        type=int,
+        help="Mix test audio to this many channels as it is saved",
+    )
     parser.add_argument("--debug", action="store_true", help="Log DEBUG messages")
     parser.add_argument(
         "--log-format", default=logging.BASIC_FORMAT, help="Format for log messages"
@@ -95,6 +183,20 @@ async def main() -> None:
     )
     args = parser.parse_args()
 
+    if args.piper_worker == "auto":
+        # An explicit --piper keeps the command line it names
+        args.piper_worker = (
+            WORKER_CLI
+            if args.piper or (not importlib.util.find_spec("piper"))
+            else WORKER_PYTHON
+        )
+
+    if (args.piper_worker == WORKER_CLI) and (not args.piper):
+        parser.error("--piper is required for the piper command line worker")
+
+    if args.voice_threads < 1:
+        parser.error("--voice-threads must be at least 1")
+
     if not args.download_dir:
         # Default to first data directory
         args.download_dir = args.data_dir[0]
@@ -104,6 +206,15 @@ async def main() -> None:
     )
     _LOGGER.debug(args)
 
+    if (args.voice_threads > 1) and (args.piper_worker == WORKER_CLI):
+        _LOGGER.warning("--voice-threads needs the python worker, using 1 thread")
+
+    # Report anything that blocks the event loop (and with it, stop events)
+    loop_monitor: Optional[LoopLagMonitor] = None
+    if args.loop_lag_threshold > 0:
+        loop_monitor = LoopLagMonitor(threshold=args.loop_lag_threshold / 1000)
+        loop_monitor.start()
+
     # Load voice info
     voices_info = get_voices(args.download_dir, update_voices=args.update_voices)
 
@@ -141,6 +252,7 @@ async def main() -> None:
     ]
 
     custom_voice_names: Set[str] = set()
+    installed_voice_names: Set[str] = set()
     if args.voice not in voices_info:
         custom_voice_names.add(args.voice)
 
@@ -151,6 +263,7 @@ async def main() -> None:
 
         for onnx_path in data_dir.glob("*.onnx"):
             custom_voice_name = onnx_path.stem
+            installed_voice_names.add(custom_voice_name)
             if custom_voice_name not in voices_info:
                 custom_voice_names.add(custom_voice_name)
 
@@ -174,6 +287,7 @@ async def main() -> None:
                 if not lang_code:
                     lang_code = custom_voice_path.stem.split("_")[0]
 
+            installed_voice_names.add(custom_name)
             voices.append(
                 TtsVoice(
                     name=custom_name,
@@ -200,24 +314,152 @@ async def main() -> None:
         ],
     )
 
+    # Serialized once; describe events may filter the voices
+    info_cache = InfoCache(wyoming_info, installed_voice_names)
+
     process_manager = PiperProcessManager(args, voices_info)
 
     # Make sure default voice is loaded.
     # Other voices will be loaded on-demand.
     await process_manager.get_process()
+    if args.voice_idle_timeout > 0:
+        # ...and unloaded again when they are not used
+        process_manager.start_idle_unloading(args.voice_idle_timeout)
+
+    player = AudioPlayer(
+        samples_per_chunk=args.samples_per_chunk,
+        crossfade_ms=args.crossfade_ms,
+        history=(
+            ResponseHistory(args.replay_responses)
+            if args.replay_responses > 0
+            else None
+        ),
+    )
+    player.start()
+
+    # Load audio cues once; they are played from memory
+    cues: Dict[str, AudioCue] = {}
+    if args.cue_dir:
+        cues = load_cues(args.cue_dir)
+
+    # Test mode writes each response to its own WAV file instead of playing it
+    test_capture: Optional[TestCapture] = None
+    if args.test_mode:
+        test_capture = TestCapture(
+            args.test_output_dir,
+            rate=args.test_sample_rate,
+            channels=args.test_channels,
+        )
+
+        # Continue numbering so earlier captures are not overwritten
+        player.response_id = test_capture.next_response_id
+
+    # On-demand profiling, also toggled with SIGUSR1
+    profiler: Optional[Profiler] = None
+    if args.profile_dir:
+        profiler = Profiler(args.profile_dir)
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGUSR1, _toggle_profiler, profiler
+        )
+
+    # Live state for the stats event, shared by all connections
+    stats = ServerStats(process_manager, player, loop_monitor=loop_monitor)
+
+    # Recorded traffic can be replayed against another build with script/replay
+    recorder: Optional[TrafficRecorder] = None
+    if args.record_traffic:
+        recorder = TrafficRecorder(args.record_traffic)
 
     # Start server
     server = AsyncServer.from_uri(args.uri)
 
+    handler_factory = partial(
+        PiperEventHandler,
+        info_cache,
+        args,
+        process_manager,
+        player,
+        cues,
+        test_capture,
+        profiler,
+        stats,
+        recorder,
+    )
+
+    # Replace the workers of running voices, e.g. after a model file update
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGHUP, process_manager.start_reload_voices
+    )
+
     _LOGGER.info("Ready")
-    await server.run(
-        partial(
-            PiperEventHandler,
-            wyoming_info,
-            args,
-            process_manager,
+    try:
+        await _serve(
+            server,
+            handler_factory,
+            partial(_drain, process_manager, player, args.drain_timeout),
         )
-    )
+    finally:
+        if recorder is not None:
+            await asyncio.to_thread(recorder.close)
+
+
+async def _serve(
+    server: AsyncServer,
+    handler_factory: HandlerFactory,
+    drain: Callable[[], Awaitable[None]],
+) -> None:
+    """Run the server until it ends (stdio) or SIGTERM, then drain."""
+    if isinstance(server, AsyncStdioServer):
+        await server.run(handler_factory)
+        await drain()
+        return
+
+    # Serve until SIGTERM. This is handled here rather than in server.run(),
+    # whose stop signal does not end serve_forever() under uvloop.
+    await server.start(handler_factory)
+    stop_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop_requested.set)
+    try:
+        await stop_requested.wait()
+    finally:
+        # A second SIGTERM stops the server without draining
+        loop.remove_signal_handler(signal.SIGTERM)
+
+    # Connections stay open, so requests in flight can stream their audio
+    _LOGGER.info("Draining requests in flight")
+    await drain()
+
+    _LOGGER.debug("Stopping server")
+    await server.stop()
+
+
+async def _drain(
+    process_manager: PiperProcessManager, player: AudioPlayer, timeout: float
+) -> None:
+    """Finish requests in flight and queued playback within timeout seconds."""
+    deadline = time.monotonic() + timeout
+    await process_manager.stop(timeout)
+
+    while player.has_audio and (not player.is_paused):
+        if time.monotonic() >= deadline:
+            _LOGGER.warning("Dropping %s byte(s) of audio", player.queued_bytes)
+            break
+
+        await asyncio.sleep(0.05)
+
+    await player.close()
+
+
+def _toggle_profiler(profiler: Profiler) -> None:
+    """Start or stop the profiler (SIGUSR1)."""
+    if not profiler.is_running:
+        profiler.start()
+        return
+
+    result = profiler.stop()
+    if result is not None:
+        asyncio.get_running_loop().run_in_executor(None, result.save)
 
 
 # -----------------------------------------------------------------------------
@@ -235,7 +477,21 @@ def get_description(voice_info: Dict[str, Any]):
 # -----------------------------------------------------------------------------
 
 
-def run():
+def run() -> None:
+    # The event loop must be chosen before it exists, so --uvloop is parsed
+    # here as well as in main()
+    loop_parser = argparse.ArgumentParser(add_help=False)
+    loop_parser.add_argument("--uvloop", action="store_true")
+    loop_args, _ = loop_parser.parse_known_args()
+
+    if loop_args.uvloop:
+        try:
+            import uvloop  # pylint: disable=import-outside-toplevel
+
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            _LOGGER.warning("uvloop is not installed; using the default event loop")
+
     asyncio.run(main())
 
 
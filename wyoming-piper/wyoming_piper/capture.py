@@ -0,0 +1,230 @@
+"""Test mode capture of synthesized audio, one WAV file per response."""
+
+import json
+import logging
+import os
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+from .playback import PlaybackSegment
+from .resample import AudioConverter
+
+_LOGGER = logging.getLogger(__name__)
+
+INDEX_NAME = "index.json"
+LATEST_LINK_NAME = "output.wav"
+
+
+def response_wav_name(response_id: int) -> str:
+    """File name of a response's audio."""
+    return f"response_{response_id:06d}.wav"
+
+
+def response_json_name(response_id: int) -> str:
+    """File name of a response's metadata."""
+    return f"response_{response_id:06d}.json"
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    """Replace a JSON file atomically so readers never see a partial file."""
+    temp_path = path.with_suffix(".json.tmp")
+    with open(temp_path, "w", encoding="utf-8") as temp_file:
+        json.dump(data, temp_file, indent=2)
+
+    os.replace(temp_path, path)
+
+
+class TestCapture:
+    """Assembles the chunks of each response into one WAV file.
+
+    Files in the output directory:
+
+    - response_<id>.wav: audio of a response, appended chunk by chunk
+    - response_<id>.json: rate/width/channels, chunk count, samples and texts
+    - index.json: id of the latest response and all response ids
+    - output.wav: symlink to the latest response (for older tools)
+
+    Response ids continue from an existing index, so a restarted server never
+    overwrites earlier captures. If rate or channels are given, 16-bit audio is
+    converted as it is captured, so the files can be verified without another
+    resampling step.
+
+    Methods block on file I/O. The server calls them through the executor,
+    whose single thread keeps the event loop free and the chunks in order.
+    """
+
+    __test__ = False  # not a pytest test class
+
+    def __init__(
+        self,
+        output_dir: Union[str, Path],
+        rate: Optional[int] = None,
+        channels: Optional[int] = None,
+    ) -> None:
+        self.output_dir = Path(output_dir)
+        self.rate = rate
+        self.channels = channels
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="test_capture"
+        )
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        self.response_ids: List[int] = []
+        index_path = self.output_dir / INDEX_NAME
+        if index_path.exists():
+            try:
+                with open(index_path, "r", encoding="utf-8") as index_file:
+                    self.response_ids = list(json.load(index_file)["responses"])
+            except (OSError, ValueError, KeyError):
+                _LOGGER.exception("Ignoring unreadable test capture index")
+
+        self._response_id: Optional[int] = None
+        self._file: Optional[BinaryIO] = None
+        self._wav_file: Optional[wave.Wave_write] = None
+        self._converter: Optional[AudioConverter] = None
+        self._source_format = (0, 0, 0)
+        self._info: Dict[str, Any] = {}
+
+    @property
+    def next_response_id(self) -> int:
+        """First response id that has not been captured yet."""
+        return (max(self.response_ids) + 1) if self.response_ids else 0
+
+    def add(
+        self,
+        response_id: int,
+        audio: bytes,
+        rate: int,
+        width: int,
+        channels: int,
+        text: str = "",
+    ) -> Path:
+        """Append a chunk to its response's WAV file and return the file path."""
+        if response_id != self._response_id:
+            self._start_response(response_id, rate, width, channels)
+
+        wav_path = self.output_dir / response_wav_name(response_id)
+        if (rate, width, channels) != self._source_format:
+            _LOGGER.warning(
+                "Test mode: skipping chunk with different audio format in %s",
+                wav_path,
+            )
+            return wav_path
+
+        if self._converter is not None:
+            audio = self._converter.convert(audio)
+
+        self._write_frames(audio)
+        self._info["chunks"] += 1
+        self._info["texts"].append(text)
+        _write_json(self.output_dir / response_json_name(response_id), self._info)
+
+        _LOGGER.info("Test mode: saved chunk %s to %s", self._info["chunks"], wav_path)
+        return wav_path
+
+    def get_audio(self, response_id: Optional[int] = None) -> Optional[PlaybackSegment]:
+        """Read the captured audio of a response (default: the latest one)."""
+        if response_id is None:
+            if not self.response_ids:
+                return None
+
+            response_id = self.response_ids[-1]
+
+        wav_path = self.output_dir / response_wav_name(response_id)
+        if not wav_path.exists():
+            return None
+
+        # The open file is flushed after every chunk, so it can be read as is
+        with wave.open(str(wav_path), "rb") as wav_file:
+            return PlaybackSegment(
+                response_id=response_id,
+                audio=wav_file.readframes(wav_file.getnframes()),
+                rate=wav_file.getframerate(),
+                width=wav_file.getsampwidth(),
+                channels=wav_file.getnchannels(),
+            )
+
+    def close(self) -> None:
+        """Finish the current response file."""
+        if self._wav_file is not None:
+            if (self._converter is not None) and (self._response_id is not None):
+                # Frames the resampler held back
+                self._write_frames(self._converter.flush())
+                _write_json(
+                    self.output_dir / response_json_name(self._response_id),
+                    self._info,
+                )
+
+            self._wav_file.close()
+            self._wav_file = None
+
+        if self._file is not None:
+            # Not closed by the wave module, which did not open it
+            self._file.close()
+            self._file = None
+
+        self._response_id = None
+        self._converter = None
+
+    def _write_frames(self, audio: bytes) -> None:
+        # The WAV header is updated after every write, so the file is always valid
+        assert (self._wav_file is not None) and (self._file is not None)
+        self._wav_file.writeframes(audio)
+        self._file.flush()
+        self._info["samples"] += len(audio) // (
+            self._info["width"] * self._info["channels"]
+        )
+
+    def _start_response(
+        self, response_id: int, rate: int, width: int, channels: int
+    ) -> None:
+        self.close()
+
+        source_format = (rate, width, channels)
+        self._source_format = source_format
+        if width == 2:
+            converter = AudioConverter(rate, channels, self.rate, self.channels)
+            if not converter.is_passthrough:
+                self._converter = converter
+                rate, channels = converter.out_rate, converter.out_channels
+        elif self.rate or self.channels:
+            _LOGGER.warning("Test mode: only 16-bit audio is converted")
+
+        wav_name = response_wav_name(response_id)
+        self._file = open(  # pylint: disable=consider-using-with
+            self.output_dir / wav_name, "wb"
+        )
+        wav_file: wave.Wave_write = wave.open(self._file, "wb")
+        wav_file.setframerate(rate)
+        wav_file.setsampwidth(width)
+        wav_file.setnchannels(channels)
+
+        self._response_id = response_id
+        self._wav_file = wav_file
+        self._info = {
+            "response_id": response_id,
+            "wav": wav_name,
+            "rate": rate,
+            "width": width,
+            "channels": channels,
+            "source_rate": source_format[0],
+            "source_channels": source_format[2],
+            "chunks": 0,
+            "samples": 0,
+            "texts": [],
+        }
+
+        if response_id not in self.response_ids:
+            self.response_ids.append(response_id)
+
+        _write_json(
+            self.output_dir / INDEX_NAME,
+            {"latest": response_id, "responses": self.response_ids},
+        )
+
+        latest_link = self.output_dir / LATEST_LINK_NAME
+        if latest_link.exists() or latest_link.is_symlink():
+            latest_link.unlink()
+        latest_link.symlink_to(wav_name)
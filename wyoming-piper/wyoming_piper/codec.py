@@ -0,0 +1,354 @@
+"""Compressed payloads for streamed audio, negotiated per connection.
+
+A client sends set-audio-codec with the codecs it can decode, in order of
+preference. Audio streamed to that connection then keeps the usual
+AudioStart/AudioChunk/AudioStop events, whose rate/width/channels describe
+the decoded PCM, with the payload encoded as named by "codec":
+
+- pcm: raw 16-bit PCM (no change)
+- mulaw: G.711 mu-law, one byte per sample (half the size of PCM)
+- opus: Opus packets, each prefixed with its length as a 2-byte big-endian
+  integer. Needs opuslib and libopus (pip install wyoming-piper-custom[opus])
+
+StreamDecoder turns the events back into PCM on the client.
+"""
+
+import logging
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from wyoming.audio import AudioChunk, AudioStart
+from wyoming.event import Event
+
+from .resample import AudioConverter
+
+_LOGGER = logging.getLogger(__name__)
+
+try:
+    import opuslib  # type: ignore[import]
+except ImportError:
+    opuslib = None
+
+CODEC_PCM = "pcm"
+CODEC_MULAW = "mulaw"
+CODEC_OPUS = "opus"
+
+# Rates supported by the Opus encoder
+_OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+_OPUS_FRAME_MS = (10, 20, 40, 60)
+
+# G.711 mu-law on 14-bit samples
+_MULAW_BIAS = 0x21
+_MULAW_CLIP = 8159
+
+_PACKET_LENGTH = struct.Struct(">H")
+
+
+def available_codecs() -> List[str]:
+    """Codecs this server can encode, best compression first."""
+    codecs = [CODEC_MULAW, CODEC_PCM]
+    if opuslib is not None:
+        codecs.insert(0, CODEC_OPUS)
+
+    return codecs
+
+
+def select_codec(requested: List[str]) -> Optional[str]:
+    """First requested codec that is available."""
+    available = available_codecs()
+    for codec in requested:
+        if codec in available:
+            return codec
+
+    return None
+
+
+def linear_to_mulaw(audio: bytes) -> bytes:
+    """Encode 16-bit PCM as G.711 mu-law (same output as audioop.lin2ulaw)."""
+    samples = np.frombuffer(audio, dtype=np.int16).astype(np.int32) >> 2
+    negative = samples < 0
+    magnitude = np.minimum(np.abs(samples), _MULAW_CLIP) + _MULAW_BIAS
+    segment = np.floor(np.log2(magnitude)).astype(np.int32) - 5
+    mulaw = np.where(
+        segment < 8,
+        (np.minimum(segment, 7) << 4)
+        | ((magnitude >> (np.minimum(segment, 7) + 1)) & 0x0F),
+        0x7F,
+    )
+    mulaw ^= np.where(negative, 0x7F, 0xFF)
+
+    return mulaw.astype(np.uint8).tobytes()
+
+
+def mulaw_to_linear(data: bytes) -> bytes:
+    """Decode G.711 mu-law to 16-bit PCM."""
+    mulaw = ~np.frombuffer(data, dtype=np.uint8).astype(np.int32) & 0xFF
+    exponent = (mulaw >> 4) & 0x07
+    mantissa = mulaw & 0x0F
+    bias = _MULAW_BIAS << 2
+    magnitude = (((mantissa << 3) + bias) << exponent) - bias
+    samples = np.where(mulaw & 0x80, -magnitude, magnitude)
+
+    return samples.astype(np.int16).tobytes()
+
+
+def pack_packets(packets: List[bytes]) -> bytes:
+    """Join packets into one payload, each prefixed with its length."""
+    return b"".join(_PACKET_LENGTH.pack(len(packet)) + packet for packet in packets)
+
+
+def unpack_packets(payload: bytes) -> List[bytes]:
+    """Split a payload from pack_packets."""
+    packets: List[bytes] = []
+    offset = 0
+    while offset < len(payload):
+        (length,) = _PACKET_LENGTH.unpack_from(payload, offset)
+        offset += _PACKET_LENGTH.size
+        packets.append(payload[offset : offset + length])
+        offset += length
+
+    return packets
+
+
+# -----------------------------------------------------------------------------
+
+
+class StreamEncoder:
+    """Encoder for the audio streamed to one connection (pcm: unchanged).
+
+    Events of one stream must be passed in order, since encoders keep state
+    between chunks.
+    """
+
+    codec = CODEC_PCM
+
+    def __init__(self) -> None:
+        self.rate = 0
+        self.width = 0
+        self.channels = 0
+
+    def encode_event(self, event: Event) -> List[Event]:
+        """Encode an audio event; other events are passed through."""
+        if self.codec == CODEC_PCM:
+            return [event]
+
+        if AudioStart.is_type(event.type):
+            start = AudioStart.from_event(event)
+            self.rate, self.width, self.channels = self.start(
+                start.rate, start.width, start.channels
+            )
+            return [self._with_codec(event)]
+
+        if AudioChunk.is_type(event.type):
+            chunk = AudioChunk.from_event(event)
+            return self._chunk_events(self.encode(chunk.audio), chunk.timestamp)
+
+        if event.type == "audio-stop":
+            return self._chunk_events(self.flush(), None) + [event]
+
+        return [event]
+
+    def start(self, rate: int, width: int, channels: int) -> Tuple[int, int, int]:
+        """Start a stream; returns the format that clients decode to."""
+        return rate, width, channels
+
+    def encode(self, audio: bytes) -> bytes:
+        """Encode the next chunk (may hold back audio until a frame is full)."""
+        return audio
+
+    def flush(self) -> bytes:
+        """Encode audio held back at the end of a stream."""
+        return b""
+
+    def _chunk_events(self, payload: bytes, timestamp: Optional[int]) -> List[Event]:
+        if not payload:
+            return []
+
+        event = AudioChunk(
+            rate=self.rate,
+            width=self.width,
+            channels=self.channels,
+            audio=payload,
+            timestamp=timestamp,
+        ).event()
+        return [self._with_codec(event)]
+
+    def _with_codec(self, event: Event) -> Event:
+        data = dict(event.data or {})
+        data.update({"rate": self.rate, "width": self.width, "channels": self.channels})
+        if self.codec != CODEC_PCM:
+            data["codec"] = self.codec
+
+        return Event(type=event.type, data=data, payload=event.payload)
+
+
+class MulawEncoder(StreamEncoder):
+    """G.711 mu-law; stateless and no added latency."""
+
+    codec = CODEC_MULAW
+
+    def start(self, rate: int, width: int, channels: int) -> Tuple[int, int, int]:
+        if width != 2:
+            raise ValueError(f"mu-law needs 16-bit audio, got width {width}")
+
+        return rate, width, channels
+
+    def encode(self, audio: bytes) -> bytes:
+        return linear_to_mulaw(audio)
+
+
+class OpusEncoder(StreamEncoder):
+    """Opus in fixed frames, so at most one frame of audio is held back.
+
+    Audio is resampled to the nearest Opus rate at or above the input rate
+    (22050 Hz voices are sent at 24000 Hz) and mixed down to at most 2
+    channels. The Opus encoder is kept for the connection and only recreated
+    when the stream format changes.
+    """
+
+    codec = CODEC_OPUS
+
+    def __init__(self, frame_ms: int = 20, bitrate: Optional[int] = None) -> None:
+        super().__init__()
+        if opuslib is None:
+            raise ValueError("Opus needs opuslib (pip install opuslib)")
+
+        if frame_ms not in _OPUS_FRAME_MS:
+            raise ValueError(f"Opus frame_ms must be one of {_OPUS_FRAME_MS}")
+
+        self.frame_ms = frame_ms
+        self.bitrate = bitrate
+        self._encoder: Optional[Any] = None
+        self._converter: Optional[AudioConverter] = None
+        self._format = (0, 0)
+        self._buffer = bytearray()
+        self._frame_samples = 0
+
+    def start(self, rate: int, width: int, channels: int) -> Tuple[int, int, int]:
+        if width != 2:
+            raise ValueError(f"Opus needs 16-bit audio, got width {width}")
+
+        out_rate = next((r for r in _OPUS_RATES if r >= rate), _OPUS_RATES[-1])
+        out_channels = min(channels, 2)
+        if (self._encoder is None) or ((out_rate, out_channels) != self._format):
+            self._encoder = opuslib.Encoder(
+                out_rate, out_channels, opuslib.APPLICATION_VOIP
+            )
+            if self.bitrate:
+                self._encoder.bitrate = self.bitrate
+
+        self._format = (out_rate, out_channels)
+        self._converter = AudioConverter(rate, channels, out_rate, out_channels)
+        self._frame_samples = (out_rate * self.frame_ms) // 1000
+        self._buffer.clear()
+
+        return out_rate, 2, out_channels
+
+    def encode(self, audio: bytes) -> bytes:
+        assert self._converter is not None
+        self._buffer.extend(self._converter.convert(audio))
+        return pack_packets(self._encode_frames())
+
+    def flush(self) -> bytes:
+        if self._converter is not None:
+            # Frames the resampler held back
+            self._buffer.extend(self._converter.flush())
+
+        if not self._buffer:
+            return b""
+
+        # Pad the last frame with silence
+        frame_bytes = self._frame_samples * self._format[1] * 2
+        self._buffer.extend(bytes(frame_bytes - len(self._buffer)))
+        return pack_packets(self._encode_frames())
+
+    def _encode_frames(self) -> List[bytes]:
+        assert self._encoder is not None
+        frame_bytes = self._frame_samples * self._format[1] * 2
+        packets: List[bytes] = []
+        while len(self._buffer) >= frame_bytes:
+            packets.append(
+                self._encoder.encode(
+                    bytes(self._buffer[:frame_bytes]), self._frame_samples
+                )
+            )
+            del self._buffer[:frame_bytes]
+
+        return packets
+
+
+def create_encoder(
+    codec: str, options: Optional[Dict[str, Any]] = None
+) -> StreamEncoder:
+    """New encoder for a connection."""
+    options = options or {}
+    if codec == CODEC_OPUS:
+        return OpusEncoder(
+            frame_ms=int(options.get("frame_ms", 20)), bitrate=options.get("bitrate")
+        )
+
+    if codec == CODEC_MULAW:
+        return MulawEncoder()
+
+    if codec == CODEC_PCM:
+        return StreamEncoder()
+
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+# -----------------------------------------------------------------------------
+
+
+class StreamDecoder:
+    """Client helper: turns audio events of a negotiated stream back into PCM.
+
+    Example:
+
+        decoder = StreamDecoder()
+        while True:
+            event = await async_read_event(reader)
+            if AudioChunk.is_type(event.type):
+                chunk = decoder.decode_chunk(event)  # 16-bit PCM
+    """
+
+    def __init__(self) -> None:
+        self._opus: Optional[Any] = None
+        self._opus_format = (0, 0)
+
+    def decode_chunk(self, event: Event) -> AudioChunk:
+        """Decode an audio-chunk event."""
+        chunk = AudioChunk.from_event(event)
+        codec = (event.data or {}).get("codec", CODEC_PCM)
+        if codec == CODEC_PCM:
+            return chunk
+
+        if codec == CODEC_MULAW:
+            audio = mulaw_to_linear(chunk.audio)
+        elif codec == CODEC_OPUS:
+            audio = self._decode_opus(chunk)
+        else:
+            raise ValueError(f"Unknown codec: {codec}")
+
+        return AudioChunk(
+            rate=chunk.rate,
+            width=chunk.width,
+            channels=chunk.channels,
+            audio=audio,
+            timestamp=chunk.timestamp,
+        )
+
+    def _decode_opus(self, chunk: AudioChunk) -> bytes:
+        if opuslib is None:
+            raise ValueError("Opus needs opuslib (pip install opuslib)")
+
+        if (self._opus is None) or (self._opus_format != (chunk.rate, chunk.channels)):
+            self._opus = opuslib.Decoder(chunk.rate, chunk.channels)
+            self._opus_format = (chunk.rate, chunk.channels)
+
+        # Largest Opus frame is 120 ms
+        max_samples = (chunk.rate * 120) // 1000
+        return b"".join(
+            self._opus.decode(packet, max_samples)
+            for packet in unpack_packets(chunk.audio)
+        )
@@ -0,0 +1,49 @@
+"""Pre-loaded non-speech audio cues (earcons)."""
+
+import logging
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Union
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class AudioCue:
+    """Raw audio of a short sound held in memory."""
+
+    name: str
+    audio: bytes
+    rate: int
+    width: int
+    channels: int
+
+
+def load_cues(cue_dir: Union[str, Path]) -> Dict[str, AudioCue]:
+    """Load every WAV file in a directory as a cue named after the file."""
+    cue_dir = Path(cue_dir)
+    cues: Dict[str, AudioCue] = {}
+    if not cue_dir.is_dir():
+        _LOGGER.warning("Cue directory does not exist: %s", cue_dir)
+        return cues
+
+    for wav_path in sorted(cue_dir.glob("*.wav")):
+        try:
+            with wave.open(str(wav_path), "rb") as wav_file:
+                if wav_file.getsampwidth() != 2:
+                    _LOGGER.warning("Skipping cue %s: only 16-bit audio", wav_path)
+                    continue
+
+                cues[wav_path.stem] = AudioCue(
+                    name=wav_path.stem,
+                    audio=wav_file.readframes(wav_file.getnframes()),
+                    rate=wav_file.getframerate(),
+                    width=wav_file.getsampwidth(),
+                    channels=wav_file.getnchannels(),
+                )
+        except (OSError, wave.Error):
+            _LOGGER.exception("Failed to load cue: %s", wav_path)
+
+    _LOGGER.debug("Loaded %s cue(s) from %s", len(cues), cue_dir)
+    return cues
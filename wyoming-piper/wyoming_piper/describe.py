@@ -0,0 +1,131 @@
+"""Describe replies, serialized once instead of on every request.
+
+The info event lists every voice in voices.json with its speakers, which is
+hundreds of kilobytes. A describe event may narrow it down with optional
+data (all keys can be combined):
+
+    {"installed": true, "language": "en", "speakers": false}
+
+- installed: only voices whose model is on this machine
+- language: only voices for a language ("en" also matches "en_US")
+- speakers: false leaves out the speaker list of each voice
+"""
+
+import io
+import logging
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from wyoming.event import Event, write_event
+from wyoming.info import Info, TtsVoice
+
+_LOGGER = logging.getLogger(__name__)
+
+# Distinct filters kept serialized (language comes from clients)
+_MAX_CACHED = 64
+
+
+@dataclass(frozen=True)
+class DescribeFilter:
+    """Which voices a describe reply lists."""
+
+    installed: bool = False
+    language: Optional[str] = None
+    speakers: bool = True
+
+    @staticmethod
+    def from_data(data: Optional[Dict[str, Any]]) -> "DescribeFilter":
+        """Filter from the data of a describe event."""
+        data = data or {}
+        language = data.get("language")
+        return DescribeFilter(
+            installed=bool(data.get("installed", False)),
+            language=str(language).replace("-", "_").lower() if language else None,
+            speakers=bool(data.get("speakers", True)),
+        )
+
+    def matches(self, voice: TtsVoice, installed_voices: Set[str]) -> bool:
+        """True if the voice is listed."""
+        if self.installed and (voice.name not in installed_voices):
+            return False
+
+        if self.language is None:
+            return True
+
+        return any(
+            (language == self.language) or language.startswith(f"{self.language}_")
+            for language in (
+                voice_language.replace("-", "_").lower()
+                for voice_language in voice.languages
+            )
+        )
+
+
+def serialize_event(event: Event) -> bytes:
+    """Event as it is written to a connection."""
+    buffer = io.BytesIO()
+    write_event(event, buffer)
+    return buffer.getvalue()
+
+
+def filter_info(
+    info: Info, describe_filter: DescribeFilter, installed_voices: Set[str]
+) -> Info:
+    """Copy of info with only the voices that match the filter."""
+    if describe_filter == DescribeFilter():
+        return info
+
+    tts_programs = []
+    for tts_program in info.tts:
+        voices = [
+            voice
+            for voice in tts_program.voices
+            if describe_filter.matches(voice, installed_voices)
+        ]
+        if not describe_filter.speakers:
+            voices = [replace(voice, speakers=None) for voice in voices]
+
+        tts_programs.append(replace(tts_program, voices=voices))
+
+    return replace(info, tts=tts_programs)
+
+
+class InfoCache:
+    """Serialized info event for each describe filter that was asked for."""
+
+    def __init__(self, info: Info, installed_voices: Iterable[str]) -> None:
+        self.info = info
+        self.installed_voices = set(installed_voices)
+        self._serialized: Dict[DescribeFilter, bytes] = {}
+
+        # Plain describe, serialized at startup
+        self.get(DescribeFilter())
+
+    def get(self, describe_filter: DescribeFilter) -> bytes:
+        """Serialized info event for a filter."""
+        serialized = self._serialized.get(describe_filter)
+        if serialized is None:
+            if len(self._serialized) >= _MAX_CACHED:
+                self._drop(lambda cached: cached != DescribeFilter())
+
+            serialized = serialize_event(
+                filter_info(self.info, describe_filter, self.installed_voices).event()
+            )
+            self._serialized[describe_filter] = serialized
+            _LOGGER.debug(
+                "Serialized info for %s: %s byte(s)", describe_filter, len(serialized)
+            )
+
+        return serialized
+
+    def mark_installed(self, voice_name: str) -> None:
+        """Record a voice that was downloaded after startup."""
+        if voice_name in self.installed_voices:
+            return
+
+        self.installed_voices.add(voice_name)
+        self._drop(lambda cached: cached.installed)
+
+    def _drop(self, predicate: Callable[[DescribeFilter], bool]) -> None:
+        for cached in [cached for cached in self._serialized if predicate(cached)]:
+            del self._serialized[cached]
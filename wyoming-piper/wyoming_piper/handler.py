@@ -3,22 +3,29 @@ import argparse
 import json
 import logging
 import math
-import os
-import shutil
-import signal
-import wave
 import time
-from pathlib import Path
-from typing import Any, Dict, Optional
+from dataclasses import asdict
+from functools import partial
+from typing import Any, Dict, List, Optional, Set, Union
 
 from wyoming.audio import AudioChunk, AudioStart, AudioStop
 from wyoming.error import Error
 from wyoming.event import Event
-from wyoming.info import Describe, Info
+from wyoming.info import Describe
 from wyoming.server import AsyncEventHandler
 from wyoming.tts import Synthesize
 
-from .process import PiperProcessManager
+from .capture import TestCapture
+from .codec import StreamEncoder, available_codecs, create_encoder, select_codec
+from .cues import AudioCue
+from .describe import DescribeFilter, InfoCache
+from .memory import HEAP_TRACKER, get_rss, get_worker_memory
+from .playback import AudioPlayer, PlaybackSubscriber, RemoteSink, audio_to_events
+from .process import PiperProcess, PiperProcessManager
+from .profiler import Profiler
+from .recorder import TrafficRecorder
+from .stats import ServerStats
+from .worker import SynthesisParams
 
 # To add direct call of aplay
 import wyoming
@@ -28,31 +35,77 @@ _LOGGER = logging.getLogger(__name__)
 
 # Variable to flag if the stop command word has been received
 STOP_CMD = False
-# List to track all active aplay processes
-ACTIVE_APLAY_PROCESSES = []
+
+# Sinks with a special meaning in the "sinks" list of a synthesize event.
+# Any other name refers to a client that sent register-sink.
+LOCAL_SINK = "local"  # play on this machine (or capture in test mode)
+CLIENT_SINK = "client"  # stream audio events back to the requesting client
+
+# Per-request scales of a synthesize event (Python worker only)
+_SYNTHESIS_PARAMS = ("length_scale", "noise_scale", "noise_w")
+
+# Voices whose command line worker ignored request parameters (warned once)
+_IGNORED_PARAMS_VOICES: Set[str] = set()
+
 
 class PiperEventHandler(AsyncEventHandler):
     def __init__(
         self,
-        wyoming_info: Info,
+        info_cache: InfoCache,
         cli_args: argparse.Namespace,
         process_manager: PiperProcessManager,
+        player: AudioPlayer,
+        cues: Dict[str, AudioCue],
+        test_capture: Optional[TestCapture],
+        profiler: Optional[Profiler],
+        stats: ServerStats,
+        recorder: Optional[TrafficRecorder],
         *args,
         **kwargs,
     ) -> None:
         super().__init__(*args, **kwargs)
 
         self.cli_args = cli_args
-        self.wyoming_info_event = wyoming_info.event()
+        self.info_cache = info_cache
         self.process_manager = process_manager
-        self.test_output_counter = 0  # Counter for test output files
+        self.player = player
+        self.cues = cues
+        self.playback_subscriber: Optional[PlaybackSubscriber] = None
+        self.remote_sink: Optional[RemoteSink] = None
+        self.codec: Optional[str] = None
+        self.codec_options: Dict[str, Any] = {}
+        self.client_encoder: Optional[StreamEncoder] = None
+        self.test_capture = test_capture
+        self.profiler = profiler
+
+        self.stats = stats
+        self.connection_id = stats.add_connection(self._get_connection_stats)
+        self.state = "idle"
+        """idle, waiting (for the piper processes) or synthesizing"""
+        self.num_events = 0
+
+        self.recorder = recorder
+        if self.recorder is not None:
+            self.recorder.open_connection(self.connection_id)
 
     async def handle_event(self, event: Event) -> bool:
-        global STOP_CMD, ACTIVE_APLAY_PROCESSES
+        global STOP_CMD
+
+        self.num_events += 1
+        if self.recorder is not None:
+            self.recorder.event(
+                self.connection_id,
+                event.type,
+                event.data,
+                payload_length=len(event.payload or b""),
+            )
 
         # Handle service discovery
         if Describe.is_type(event.type):
-            await self.write_event(self.wyoming_info_event)
+            # Serialized once per filter and written as is
+            assert self.writer is not None
+            self.writer.write(self.info_cache.get(DescribeFilter.from_data(event.data)))
+            await self.writer.drain()
             _LOGGER.debug("Sent info")
             return True
 
@@ -61,22 +114,17 @@ class PiperEventHandler(AsyncEventHandler):
         if event.type == "new-response":
             _LOGGER.debug("Received new-response event - resetting STOP_CMD")
             STOP_CMD = False
+            self.player.new_response()
             return True
 
         # Handle AudioStop event (standard Wyoming protocol)
         if AudioStop.is_type(event.type):
-            _LOGGER.debug("Received AudioStop event - killing all active aplay processes")
+            _LOGGER.debug("Received AudioStop event - stopping playback")
             STOP_CMD = True
 
-            # Kill all currently playing audio immediately
-            for aplay_proc in ACTIVE_APLAY_PROCESSES[:]:
-                try:
-                    if aplay_proc.proc.returncode is None:
-                        _LOGGER.debug(f"Killing aplay process {aplay_proc.proc.pid}")
-                        aplay_proc.proc.kill()  # Use kill() instead of terminate() for immediate stop
-                        ACTIVE_APLAY_PROCESSES.remove(aplay_proc)
-                except Exception as e:
-                    _LOGGER.warning(f"Error killing aplay: {e}")
+            # Drop queued audio and silence the output immediately
+            await self.player.stop()
+            self.player.stop_remote_sinks()
 
             # Acknowledge the stop
             await self.write_event(AudioStop().event())
@@ -84,32 +132,150 @@ class PiperEventHandler(AsyncEventHandler):
 
         # Handle custom audio-pause event
         if event.type == "audio-pause":
-            _LOGGER.debug("Received audio-pause event - pausing all active aplay processes")
-
-            for aplay_proc in ACTIVE_APLAY_PROCESSES[:]:
-                try:
-                    if aplay_proc.proc.returncode is None and not aplay_proc.paused:
-                        _LOGGER.debug(f"Pausing aplay process {aplay_proc.proc.pid}")
-                        aplay_proc.proc.send_signal(signal.SIGSTOP)
-                        aplay_proc.paused = True
-                except Exception as e:
-                    _LOGGER.warning(f"Error pausing aplay: {e}")
-
+            _LOGGER.debug("Received audio-pause event - pausing playback")
+            await self.player.pause()
             return True
 
         # Handle custom audio-resume event
         if event.type == "audio-resume":
-            _LOGGER.debug("Received audio-resume event - resuming all paused aplay processes")
+            _LOGGER.debug("Received audio-resume event - resuming playback")
+            self.player.resume()
+            return True
+
+        # Handle custom set-playback-rate event: speed up or slow down queued
+        # and future local audio without re-synthesis (same pitch).
+        if event.type == "set-playback-rate":
+            try:
+                rate = float((event.data or {}).get("rate", 1.0))
+            except (TypeError, ValueError):
+                _LOGGER.warning("Invalid playback rate: %s", event.data)
+                return True
+
+            self.player.set_playback_rate(rate)
+            return True
+
+        # Replace a voice's worker (new model or parameters) without a gap
+        if event.type == "reload-voice":
+            await self._reload_voice(event.data or {})
+            return True
+
+        # Handle custom subscribe-playback event: receive speaking-started and
+        # speaking-stopped events (and optionally the played audio) on this
+        # connection until it is closed.
+        if event.type == "subscribe-playback":
+            if self.playback_subscriber is None:
+                self.playback_subscriber = PlaybackSubscriber(
+                    write_event=self.write_event,
+                    audio=bool((event.data or {}).get("audio", False)),
+                )
+                self.player.subscribe(self.playback_subscriber)
+                _LOGGER.debug("Client subscribed to playback events")
+
+            return True
+
+        # Handle custom play-cue event: play a pre-loaded sound (chime, click,
+        # error tone) immediately, with no synthesis.
+        if event.type == "play-cue":
+            cue_name = (event.data or {}).get("name")
+            cue = self.cues.get(cue_name) if isinstance(cue_name, str) else None
+            if cue is None:
+                _LOGGER.warning("Unknown cue: %s", cue_name)
+            elif self.test_capture is not None:
+                _LOGGER.debug("Test mode: not playing cue %s", cue_name)
+            else:
+                self.player.play_cue(cue.audio, cue.rate, cue.width, cue.channels)
+
+            return True
+
+        # Handle custom replay-last event: play a recent response again from
+        # memory, without LLM generation or synthesis.
+        if event.type == "replay-last":
+            await self._replay((event.data or {}).get("response_id"), resume=False)
+            return True
+
+        # Handle custom continue event: resume a stopped response from the
+        # sample where it was stopped.
+        if event.type == "continue":
+            await self._replay((event.data or {}).get("response_id"), resume=True)
+            return True
+
+        # Handle custom register-sink event: this connection (e.g. a satellite)
+        # receives AudioStart/AudioChunk/AudioStop for synthesize events that
+        # list its name in "sinks".
+        if event.type == "register-sink":
+            sink_name = (event.data or {}).get("name")
+            if not sink_name or sink_name in (LOCAL_SINK, CLIENT_SINK):
+                _LOGGER.warning("Invalid sink name: %s", sink_name)
+                return True
+
+            if self.remote_sink is not None:
+                self.player.unregister_sink(self.remote_sink)
+
+            self.remote_sink = RemoteSink(
+                write_event=self.write_event,
+                name=sink_name,
+                encoder=self._create_encoder(),
+            )
+            self.player.register_sink(self.remote_sink)
+            _LOGGER.debug("Registered sink: %s", sink_name)
+            return True
 
-            for aplay_proc in ACTIVE_APLAY_PROCESSES[:]:
-                try:
-                    if aplay_proc.proc.returncode is None and hasattr(aplay_proc, 'paused') and aplay_proc.paused:
-                        _LOGGER.debug(f"Resuming aplay process {aplay_proc.proc.pid}")
-                        aplay_proc.proc.send_signal(signal.SIGCONT)
-                        aplay_proc.paused = False
-                except Exception as e:
-                    _LOGGER.warning(f"Error resuming aplay: {e}")
+        # Handle custom set-audio-codec event: audio streamed to this
+        # connection (client and registered sink) is compressed with the first
+        # listed codec the server supports.
+        if event.type == "set-audio-codec":
+            await self._set_audio_codec(event.data or {})
+            return True
 
+        # Handle custom get-test-audio event (test mode): send the captured
+        # audio of a response back as AudioStart/AudioChunk/AudioStop.
+        if event.type == "get-test-audio":
+            await self._send_test_audio((event.data or {}).get("response_id"))
+            return True
+
+        # Handle custom profile-start/profile-stop events: profile the running
+        # server without restarting it (and reloading voices).
+        if event.type == "profile-start":
+            if self.profiler is None:
+                _LOGGER.warning("Profiling is disabled (start with --profile-dir)")
+                return True
+
+            data = event.data or {}
+            interval_ms = data.get("interval_ms")
+            try:
+                self.profiler.start(
+                    mode=data.get("mode", "sample"),
+                    interval=(float(interval_ms) / 1000) if interval_ms else None,
+                )
+            except (TypeError, ValueError) as err:
+                _LOGGER.warning("Invalid profile-start request: %s", err)
+
+            return True
+
+        if event.type == "profile-stop":
+            result = self.profiler.stop() if self.profiler is not None else None
+            if result is not None:
+                profile_path = await asyncio.to_thread(result.save)
+                await self.write_event(
+                    Event(type="profile-saved", data={"path": str(profile_path)})
+                )
+
+            return True
+
+        # Handle custom memory-stats debug event: reply with the memory used by
+        # the server, each piper worker and each cache. With "heap": true,
+        # Python heap growth since the previous heap request is included
+        # ("heap": "stop" ends tracing).
+        if event.type == "memory-stats":
+            await self._send_memory_stats((event.data or {}).get("heap", False))
+            return True
+
+        # Handle custom stats event: reply with a snapshot of loaded voices,
+        # worker and connection state, cache hit ratios and recent latencies.
+        if event.type == "stats":
+            await self.write_event(
+                Event(type="stats", data=self.stats.snapshot(STOP_CMD))
+            )
             return True
 
         # Handle TTS synthesis
@@ -117,26 +283,260 @@ class PiperEventHandler(AsyncEventHandler):
             _LOGGER.warning("Unexpected event: %s", event)
             return True
 
+        if self.process_manager.is_stopping:
+            await self.write_event(
+                Error(text="Server is shutting down", code="shutting-down").event()
+            )
+            return True
+
         # Process synthesize event normally (removed hardcoded stop detection)
+        self.state = "waiting"
         try:
-            return await self._handle_event(event)
+            async with self.process_manager.pending_request():
+                return await self._handle_event(event)
         except Exception as err:
             await self.write_event(
                 Error(text=str(err), code=err.__class__.__name__).event()
             )
             raise err
+        finally:
+            self.state = "idle"
+
+    async def disconnect(self) -> None:
+        self.stats.remove_connection(self.connection_id)
+        if self.recorder is not None:
+            self.recorder.close_connection(self.connection_id)
+
+        if self.playback_subscriber is not None:
+            self.player.unsubscribe(self.playback_subscriber)
+            self.playback_subscriber = None
+
+        if self.remote_sink is not None:
+            self.player.unregister_sink(self.remote_sink)
+            self.remote_sink = None
+
+    async def _send_test_audio(self, response_id: Any) -> None:
+        if self.test_capture is None:
+            await self.write_event(
+                Error(text="Test mode is not enabled", code="test-mode").event()
+            )
+            return
+
+        if response_id is not None:
+            try:
+                response_id = int(response_id)
+            except (TypeError, ValueError):
+                await self.write_event(
+                    Error(
+                        text=f"Invalid response_id: {response_id!r}",
+                        code="invalid-request",
+                    ).event()
+                )
+                return
+
+        # Wait until the requests sent before this one (on any connection)
+        # are captured, so the audio of the response is complete
+        async with self.process_manager.processes_lock:
+            previous_delivered, delivered = self.process_manager.delivery_order.take()
+
+        try:
+            await previous_delivered.wait()
+            segment = await asyncio.get_running_loop().run_in_executor(
+                self.test_capture.executor, self.test_capture.get_audio, response_id
+            )
+        finally:
+            delivered.set()
+
+        if segment is None:
+            await self.write_event(
+                Error(
+                    text=f"No captured audio (response_id={response_id})",
+                    code="not-found",
+                ).event()
+            )
+            return
+
+        _LOGGER.debug("Sending captured audio of response %s", segment.response_id)
+        audio_events = audio_to_events(
+            segment.audio,
+            segment.rate,
+            segment.width,
+            segment.channels,
+            self.cli_args.samples_per_chunk,
+        )
+
+        # Tell the client which response it got (the latest, if not given)
+        audio_events[0].data["response_id"] = segment.response_id
+        for audio_event in audio_events:
+            await self.write_event(audio_event)
+
+    async def _reload_voice(self, data: Dict[str, Any]) -> None:
+        try:
+            changes: Dict[str, Any] = {}
+            for key in ("model", "speaker"):
+                if data.get(key) is not None:
+                    changes[key] = str(data[key])
+
+            for key in ("noise_scale", "length_scale", "noise_w"):
+                if data.get(key) is not None:
+                    changes[key] = float(data[key])
+
+            piper_proc = await self.process_manager.reload_voice(
+                data.get("voice"), **changes
+            )
+        except Exception as err:
+            _LOGGER.exception("Failed to reload voice: %s", data)
+            await self.write_event(Error(text=str(err), code="reload-failed").event())
+            return
+
+        voice_name = self.process_manager.resolve_voice_name(data.get("voice"))
+        await self.write_event(
+            Event(
+                type="voice-reloaded",
+                data={
+                    "voice": voice_name,
+                    "pid": piper_proc.proc.pid if piper_proc is not None else None,
+                    "settings": asdict(self.process_manager.voice_settings[voice_name]),
+                },
+            )
+        )
+
+    async def _set_audio_codec(self, data: Dict[str, Any]) -> None:
+        codec = select_codec(data.get("codecs") or [])
+        if codec is None:
+            await self.write_event(
+                Error(
+                    text=f"No supported codec (available: {available_codecs()})",
+                    code="unsupported-codec",
+                ).event()
+            )
+            return
+
+        options = {key: value for key, value in data.items() if key != "codecs"}
+        try:
+            client_encoder = create_encoder(codec, options)
+        except (ValueError, TypeError) as err:
+            await self.write_event(
+                Error(text=str(err), code="unsupported-codec").event()
+            )
+            return
+
+        self.codec = codec
+        self.codec_options = options
+        self.client_encoder = client_encoder
+        if self.remote_sink is not None:
+            self.remote_sink.encoder = self._create_encoder()
+
+        _LOGGER.debug("Streaming audio as %s (%s)", codec, options)
+        await self.write_event(Event(type="audio-codec", data={"codec": codec}))
+
+    def _create_encoder(self) -> Optional[StreamEncoder]:
+        # Client and sink streams can interleave, so each gets its own encoder
+        if self.codec is None:
+            return None
+
+        return create_encoder(self.codec, self.codec_options)
+
+    def _encode_for_client(self, audio_events: List[Event]) -> List[Event]:
+        if self.client_encoder is None:
+            return audio_events
+
+        return [
+            encoded_event
+            for audio_event in audio_events
+            for encoded_event in self.client_encoder.encode_event(audio_event)
+        ]
+
+    def _get_connection_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "events": self.num_events,
+            "subscriber_queue": (
+                self.playback_subscriber.queue.qsize()
+                if self.playback_subscriber is not None
+                else None
+            ),
+            "sink": self.remote_sink.name if self.remote_sink is not None else None,
+            "codec": self.codec,
+            "sink_queue": (
+                self.remote_sink.queue.qsize() if self.remote_sink is not None else None
+            ),
+        }
+
+    async def _send_memory_stats(self, heap: Union[bool, str]) -> None:
+        # Sizes of in-memory data are read on the event loop...
+        history = self.player.history
+        caches = {
+            "history_bytes": history.num_bytes if history is not None else 0,
+            "history_responses": len(history.responses) if history is not None else 0,
+            "playback_queue_bytes": self.player.queued_bytes,
+            "cue_bytes": sum(len(cue.audio) for cue in self.cues.values()),
+        }
+        workers = {
+            voice_name: (piper_proc.proc.pid, piper_proc.model_path)
+            for voice_name, piper_proc in self.process_manager.processes.items()
+            if piper_proc.proc.returncode is None
+        }
+
+        # ...while /proc reads and heap snapshots run in a thread
+        def _collect() -> Dict[str, Any]:
+            stats: Dict[str, Any] = {
+                "server_rss_bytes": get_rss(),
+                "workers": get_worker_memory(workers),
+                "caches": caches,
+            }
+            if heap == "stop":
+                HEAP_TRACKER.stop()
+            elif heap:
+                stats["heap"] = HEAP_TRACKER.diff()
+
+            return stats
+
+        stats = await asyncio.to_thread(_collect)
+        await self.write_event(Event(type="memory-stats", data=stats))
+
+    async def _replay(self, response_id: Optional[int], resume: bool) -> None:
+        history = self.player.history
+        if history is None:
+            _LOGGER.warning("Response history is disabled")
+            return
+
+        # Stop current audio first so its played position is up to date
+        await self.player.stop()
+
+        if resume:
+            response = history.get_unfinished(response_id)
+        else:
+            response = history.get(response_id)
+
+        if response is None:
+            _LOGGER.warning("No response to replay (id=%s)", response_id)
+            return
+
+        start = response.heard if resume else 0
+        _LOGGER.debug("Replaying response %s from byte %s", response.response_id, start)
+        self.player.enqueue_segments(response.get_segments(start))
 
     async def _handle_event(self, event: Event) -> bool:
-        global STOP_CMD, ACTIVE_APLAY_PROCESSES
+        global STOP_CMD
         # STOP_CMD is intentionally NOT reset here.
         # It is only reset when talk-llama sends an explicit "new-response" event
         # at the start of each generation, before any TTS chunks are dispatched.
         # This ensures that stop commands silence ALL queued chunks, not just
         # the one currently playing.
 
+        start_time = time.monotonic()
         synthesize = Synthesize.from_event(event)
+
+        # The audio belongs to the response this request was sent in, even if
+        # a new-response arrives while it is synthesized
+        response_id = self.player.response_id
         _LOGGER.debug(synthesize)
 
+        # Optional list of output sinks. The audio is synthesized once and the
+        # same buffer is sent to every sink.
+        sinks = (event.data or {}).get("sinks") or [LOCAL_SINK]
+
         raw_text = synthesize.text
 
         # Join multiple lines
@@ -153,7 +553,21 @@ class PiperEventHandler(AsyncEventHandler):
             if not has_punctuation:
                 text = text + self.cli_args.auto_punctuation[0]
 
+        if not text.strip():
+            _LOGGER.debug("Nothing to synthesize")
+            if CLIENT_SINK in sinks:
+                # The client waits for a reply
+                await self.write_event(
+                    Error(text="Nothing to synthesize", code="empty-text").event()
+                )
+
+            return True
+
+        # Only sending a request is serialized. Piper works through the lines
+        # queued on its stdin while further requests are sent.
         async with self.process_manager.processes_lock:
+            self.stats.lock_wait.add(time.monotonic() - start_time)
+            self.state = "synthesizing"
             _LOGGER.debug("synthesize: raw_text=%s, text='%s'", raw_text, text)
             voice_name: Optional[str] = None
             voice_speaker: Optional[str] = None
@@ -162,88 +576,145 @@ class PiperEventHandler(AsyncEventHandler):
                 voice_speaker = synthesize.voice.speaker
 
             piper_proc = await self.process_manager.get_process(voice_name=voice_name)
-
-            assert piper_proc.proc.stdin is not None
-            assert piper_proc.proc.stderr is not None
-
-            # Send plain text to stdin (piper-tts 1.4.1 doesn't support --json-input)
-            # Speaker is passed as command-line arg in process.py
-            _LOGGER.debug("Sending text to Piper: %s", text)
-            piper_proc.proc.stdin.write((text + "\n").encode("utf-8"))
-            await piper_proc.proc.stdin.drain()
-
-            # Piper outputs multiple log lines to stderr, ending with "Wrote /path/to/file.wav"
-            # Read lines until we find the one with the file path
-            output_path = None
-            max_lines = 20  # Safety limit to prevent infinite loop
-            for _ in range(max_lines):
-                output_line = (await piper_proc.proc.stderr.readline()).decode().strip()
-                _LOGGER.debug("Piper output: %s", output_line)
-
-                # Extract path from "INFO:__main__:Wrote /path/to/file.wav" or "Wrote /path/to/file.wav"
-                if "Wrote " in output_line:
-                    output_path = output_line.split("Wrote ", 1)[1]
-                    break
-
-            if not output_path:
-                raise RuntimeError("Failed to get output file path from Piper")
-
-            _LOGGER.debug("Audio file path: %s", output_path)
-
-        # Check if test mode is enabled
-        test_mode = hasattr(self.cli_args, 'test_mode') and self.cli_args.test_mode
-        test_output_dir = getattr(self.cli_args, 'test_output_dir', None)
-
-        if test_mode and test_output_dir:
-            # Test mode: copy file to test output directory instead of playing
-            test_output_dir_path = Path(test_output_dir)
-            test_output_dir_path.mkdir(parents=True, exist_ok=True)
-
-            # Generate output filename with timestamp and counter
-            timestamp = int(time.time())
-            self.test_output_counter += 1
-            test_output_path = test_output_dir_path / f"output_{timestamp}_{self.test_output_counter}.wav"
-
-            shutil.copy(output_path, test_output_path)
-            _LOGGER.info(f"Test mode: saved audio to {test_output_path}")
-
-            # Also create a symlink to the latest output for easy access
-            latest_link = test_output_dir_path / "output.wav"
-            if latest_link.exists() or latest_link.is_symlink():
-                latest_link.unlink()
-            latest_link.symlink_to(test_output_path.name)
-
-        else:
-            # Normal mode: run aplay
-            # Check if stop was requested before starting playback
-            if STOP_CMD:
-                _LOGGER.debug("Skipping aplay - stop command received")
-            else:
-                async with self.process_manager.processes_lock:
-                    # Re-check STOP_CMD inside the lock.
-                    # A chunk may have passed the check above while STOP_CMD was
-                    # still False, then waited for the lock while the previous chunk
-                    # was killed. Without this re-check it would start playing anyway.
-                    if STOP_CMD:
-                        _LOGGER.debug("Skipping aplay - stop command received (inside lock)")
-                        return True
-                    _LOGGER.debug("Running aplay on " + output_path)
-                    aplay_proc = await self.process_manager.get_aplay_process(output_path)
-
-                    # Track this process so stop command can kill it
-                    # Initialize paused state for pause/resume functionality
-                    aplay_proc.paused = False
-                    ACTIVE_APLAY_PROCESSES.append(aplay_proc)
-
-                    try:
-                        await aplay_proc.proc.wait()
-                    finally:
-                        # Remove from active list when done
-                        if aplay_proc in ACTIVE_APLAY_PROCESSES:
-                            ACTIVE_APLAY_PROCESSES.remove(aplay_proc)
-
+            self.info_cache.mark_installed(piper_proc.name)
+
+            # The piper command line (piper-tts 1.4.1) only takes plain
+            # text; its speaker and scales are fixed when it starts in
+            # process.py. The Python worker takes them with each request.
+            request_line = text
+            if piper_proc.accepts_json:
+                params = self._synthesis_params(
+                    piper_proc, voice_speaker, event.data or {}
+                )
+                request_line = json.dumps(params.to_request(text))
+            elif (piper_proc.name not in _IGNORED_PARAMS_VOICES) and (
+                (voice_speaker is not None)
+                or any(key in (event.data or {}) for key in _SYNTHESIS_PARAMS)
+            ):
+                _IGNORED_PARAMS_VOICES.add(piper_proc.name)
+                _LOGGER.warning(
+                    "Ignoring speaker and scales of requests for %s: the piper "
+                    "command line only takes them at startup (use --piper-worker "
+                    "python)",
+                    piper_proc.name,
+                )
+
+            _LOGGER.debug("Sending request to Piper: %s", request_line)
+            piper_proc.begin_request()
+            try:
+                audio_future = piper_proc.submit(request_line)
+            except BaseException:
+                piper_proc.end_request()
+                raise
+
+            previous_delivered, delivered = self.process_manager.delivery_order.take()
+
+        audio_events: List[Event] = []
+        try:
+            try:
+                assert piper_proc.proc.stdin is not None
+                await piper_proc.proc.stdin.drain()
+                # In memory from the worker (WAV files are read in a thread)
+                audio, rate, width, channels = await audio_future
+            finally:
+                piper_proc.end_request()
+
+            # Audio is played in the order the requests were sent
+            await previous_delivered.wait()
+            if LOCAL_SINK in sinks:
+                await self._play_local(response_id, text, audio, rate, width, channels)
+
+            remote_sinks = [sink for sink in sinks if sink != LOCAL_SINK]
+            if remote_sinks and STOP_CMD:
+                _LOGGER.debug("Skipping streaming - stop command received")
+            elif remote_sinks:
+                audio_events = audio_to_events(
+                    audio, rate, width, channels, self.cli_args.samples_per_chunk
+                )
+                for sink_name in remote_sinks:
+                    if sink_name == CLIENT_SINK:
+                        continue
+
+                    remote_sink = self.player.remote_sinks.get(sink_name)
+                    if remote_sink is None:
+                        _LOGGER.warning("Unknown sink: %s", sink_name)
+                        continue
+
+                    for audio_event in audio_events:
+                        remote_sink.put(audio_event)
+        finally:
+            delivered.set()
+
+        if CLIENT_SINK in sinks:
+            if not audio_events:
+                # Stopped: an empty stream still ends the client's request
+                audio_events = audio_to_events(
+                    b"", rate, width, channels, self.cli_args.samples_per_chunk
+                )
+
+            # Only this connection waits for its own stream
+            for audio_event in self._encode_for_client(audio_events):
+                await self.write_event(audio_event)
+
+        self.stats.synthesize_latency.add(time.monotonic() - start_time)
         _LOGGER.debug("Completed request")
 
-        os.unlink(output_path)
-
         return True
+
+    def _synthesis_params(
+        self,
+        piper_proc: PiperProcess,
+        speaker: Optional[str],
+        data: Dict[str, Any],
+    ) -> SynthesisParams:
+        """Speaker and scales of a synthesize event (None: worker default)."""
+        speaker_id: Optional[int] = None
+        if (speaker is not None) and piper_proc.is_multispeaker:
+            speaker_id = piper_proc.get_speaker_id(speaker)
+            if speaker_id is None:
+                _LOGGER.warning("Unknown speaker for %s: %s", piper_proc.name, speaker)
+
+        scales = {
+            key: float(data[key])
+            for key in _SYNTHESIS_PARAMS
+            if data.get(key) is not None
+        }
+        return SynthesisParams(speaker_id=speaker_id, **scales)
+
+    async def _play_local(
+        self,
+        response_id: int,
+        text: str,
+        audio: bytes,
+        rate: int,
+        width: int,
+        channels: int,
+    ) -> None:
+        if self.test_capture is not None:
+            # Test mode: append to the response's WAV file instead of playing.
+            # The capture's single worker thread keeps chunks in order.
+            await asyncio.get_running_loop().run_in_executor(
+                self.test_capture.executor,
+                partial(
+                    self.test_capture.add,
+                    response_id,
+                    audio,
+                    rate,
+                    width,
+                    channels,
+                    text=text,
+                ),
+            )
+        elif STOP_CMD:
+            _LOGGER.debug("Skipping playback - stop command received")
+        else:
+            # Normal mode: queue audio on the shared output stream.
+            # Chunks of the same response are played back-to-back without
+            # reopening the audio device.
+            self.player.enqueue(
+                audio,
+                rate=rate,
+                width=width,
+                channels=channels,
+                response_id=response_id,
+            )
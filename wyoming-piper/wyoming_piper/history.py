@@ -0,0 +1,152 @@
+"""In-memory store of recently synthesized responses."""
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .playback import PlaybackSegment
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class ResponseAudio:
+    """Synthesized audio of one response, chunk by chunk."""
+
+    response_id: int
+    segments: List[PlaybackSegment] = field(default_factory=list)
+    heard: int = 0
+    """Bytes of the response that have been played."""
+
+    @property
+    def num_bytes(self) -> int:
+        """Total size of the response audio."""
+        return sum(len(segment.audio) for segment in self.segments)
+
+    @property
+    def is_finished(self) -> bool:
+        """True if the whole response has been played."""
+        return self.heard >= self.num_bytes
+
+    def get_segments(self, start: int = 0) -> List[PlaybackSegment]:
+        """Copy of the response audio from a byte position onwards.
+
+        The played position is moved to the start, since the copy is about to
+        be played.
+        """
+        self.heard = start
+        segments: List[PlaybackSegment] = []
+        for segment in self.segments:
+            if start >= len(segment.audio):
+                start -= len(segment.audio)
+                continue
+
+            # Align to a whole frame
+            start -= start % segment.bytes_per_frame
+            segments.append(
+                PlaybackSegment(
+                    response_id=self.response_id,
+                    audio=segment.audio[start:],
+                    rate=segment.rate,
+                    width=segment.width,
+                    channels=segment.channels,
+                )
+            )
+            start = 0
+
+        return segments
+
+
+class ResponseHistory:
+    """Keeps the audio of the last N responses for replay and continue."""
+
+    def __init__(self, max_responses: int, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_responses = max_responses
+        self.max_bytes = max_bytes
+        self.responses: "OrderedDict[int, ResponseAudio]" = OrderedDict()
+
+        # Lookups for replay and continue
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def num_bytes(self) -> int:
+        """Total size of all stored audio."""
+        return sum(response.num_bytes for response in self.responses.values())
+
+    def add(self, segment: PlaybackSegment) -> None:
+        """Store a copy of newly synthesized audio."""
+        response = self.responses.get(segment.response_id)
+        if response is None:
+            response = ResponseAudio(response_id=segment.response_id)
+            self.responses[segment.response_id] = response
+
+        response.segments.append(
+            PlaybackSegment(
+                response_id=segment.response_id,
+                audio=segment.audio,
+                rate=segment.rate,
+                width=segment.width,
+                channels=segment.channels,
+            )
+        )
+
+        # Evict oldest responses, but never the one being added to
+        while (len(self.responses) > self.max_responses) or (
+            (len(self.responses) > 1) and (self.num_bytes > self.max_bytes)
+        ):
+            old_id, _old_response = self.responses.popitem(last=False)
+            _LOGGER.debug("Dropped response %s from history", old_id)
+
+        if self.num_bytes > self.max_bytes:
+            _LOGGER.debug("Response %s is too large to keep", segment.response_id)
+            response.segments.pop()
+
+    def mark_heard(self, response_id: int, num_bytes: int) -> None:
+        """Move the played position of a response (negative to rewind)."""
+        response = self.responses.get(response_id)
+        if response is not None:
+            response.heard = max(0, response.heard + num_bytes)
+
+    def get(self, response_id: Optional[int] = None) -> Optional[ResponseAudio]:
+        """Get a response by id, or the most recent one."""
+        return self._count(self._get(response_id))
+
+    def get_unfinished(
+        self, response_id: Optional[int] = None
+    ) -> Optional[ResponseAudio]:
+        """Get a response that was stopped before its end (default: most recent)."""
+        return self._count(self._get_unfinished(response_id))
+
+    def _count(self, response: Optional[ResponseAudio]) -> Optional[ResponseAudio]:
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return response
+
+    def _get(self, response_id: Optional[int]) -> Optional[ResponseAudio]:
+        if response_id is not None:
+            return self.responses.get(response_id)
+
+        for response in reversed(self.responses.values()):
+            if response.segments:
+                return response
+
+        return None
+
+    def _get_unfinished(self, response_id: Optional[int]) -> Optional[ResponseAudio]:
+        if response_id is not None:
+            response = self.responses.get(response_id)
+            if (response is not None) and (not response.is_finished):
+                return response
+
+            return None
+
+        for response in reversed(self.responses.values()):
+            if response.segments and (not response.is_finished):
+                return response
+
+        return None
@@ -0,0 +1,116 @@
+"""Memory accounting for the server, its piper workers and its caches."""
+
+import logging
+import os
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def get_rss(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of a process in bytes (Linux only, None if unknown)."""
+    status_path = f"/proc/{pid or 'self'}/status"
+    try:
+        with open(status_path, "r", encoding="utf-8") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    # VmRSS:    123456 kB
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    return None
+
+
+def get_file_size(path: Optional[Union[str, Path]]) -> Optional[int]:
+    """Size of a file in bytes, or None if it does not exist."""
+    if path is None:
+        return None
+
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def get_worker_memory(
+    workers: Dict[str, Tuple[int, Optional[Path]]],
+) -> Dict[str, Dict[str, Optional[int]]]:
+    """RSS and model file size of piper workers, given their pid and model path.
+
+    The model size approximates what a worker holds in memory for its voice;
+    the RSS also includes the Python runtime and onnxruntime of the worker.
+    """
+    return {
+        voice_name: {
+            "pid": pid,
+            "rss_bytes": get_rss(pid),
+            "model_bytes": get_file_size(model_path),
+        }
+        for voice_name, (pid, model_path) in workers.items()
+    }
+
+
+class HeapTracker:
+    """Reports Python heap growth between two requests with tracemalloc.
+
+    Tracing starts with the first request, which only records a baseline.
+    Every later request reports the allocation sites that grew the most since
+    the request before it.
+    """
+
+    def __init__(self, top: int = 10, frames: int = 1) -> None:
+        self.top = top
+        self.frames = frames
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def is_tracing(self) -> bool:
+        """True if tracemalloc is running."""
+        return tracemalloc.is_tracing()
+
+    def diff(self) -> Dict[str, Any]:
+        """Take a snapshot and compare it with the previous one (blocking)."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            _LOGGER.debug("Started tracemalloc")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        traced_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        result: Dict[str, Any] = {
+            "traced_bytes": traced_bytes,
+            "peak_bytes": peak_bytes,
+            "baseline": self._snapshot is None,
+        }
+
+        growth: List[Dict[str, Any]] = []
+        if self._snapshot is not None:
+            for stat in snapshot.compare_to(self._snapshot, "lineno")[: self.top]:
+                frame = stat.traceback[0]
+                growth.append(
+                    {
+                        "location": f"{frame.filename}:{frame.lineno}",
+                        "size_diff": stat.size_diff,
+                        "count_diff": stat.count_diff,
+                        "size": stat.size,
+                    }
+                )
+
+        result["growth"] = growth
+        self._snapshot = snapshot
+        return result
+
+    def stop(self) -> None:
+        """Stop tracing and forget the baseline."""
+        self._snapshot = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            _LOGGER.debug("Stopped tracemalloc")
+
+
+# tracemalloc is global to the process, so one tracker is shared by all clients
+HEAP_TRACKER = HeapTracker()
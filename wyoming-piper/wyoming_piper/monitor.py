@@ -0,0 +1,105 @@
+"""Detection of event loop stalls."""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Logs and counts stalls of the asyncio event loop.
+
+    A heartbeat task measures how late the loop wakes it up. A watchdog thread
+    notices a missing heartbeat while the loop is still blocked, and records
+    the task and the code location that is holding the loop, so the stall can
+    be attributed once it is over.
+    """
+
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05) -> None:
+        self.threshold = threshold
+        """Lag in seconds above which a stall is reported."""
+
+        self.interval = interval
+        self.stalls = 0
+        self.max_lag = 0.0
+        self.last_culprit: Optional[str] = None
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._culprit: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start monitoring the running loop."""
+        if self._task is not None:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = self._loop.create_task(self._heartbeat(), name="loop-lag-monitor")
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-lag-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop monitoring."""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - self._last_beat - self.interval
+            if lag <= self.threshold:
+                continue
+
+            self.stalls += 1
+            self.max_lag = max(self.max_lag, lag)
+            culprit = self._culprit or "unknown"
+            self._culprit = None
+            self.last_culprit = culprit
+            _LOGGER.warning(
+                "Event loop stalled for %.0f ms (stall #%s) in %s",
+                lag * 1000,
+                self.stalls,
+                culprit,
+            )
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            blocked = time.monotonic() - self._last_beat - self.interval
+            if (blocked > self.threshold) and (self._culprit is None):
+                self._culprit = self._describe_running()
+
+    def _describe_running(self) -> str:
+        """Describe the task and code location currently holding the loop."""
+        parts = []
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        if task is not None:
+            coro = task.get_coro()
+            coro_name = getattr(coro, "__qualname__", repr(coro))
+            parts.append(f"task {task.get_name()} ({coro_name})")
+
+        frame = sys._current_frames().get(  # pylint: disable=protected-access
+            self._loop_thread_id or 0
+        )
+        if frame is not None:
+            code = frame.f_code
+            parts.append(f"at {code.co_filename}:{frame.f_lineno} in {code.co_name}")
+
+        return " ".join(parts) or "unknown"
@@ -0,0 +1,753 @@
+"""Buffer-based audio playback through a long-lived output stream."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+import numpy as np
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.event import Event
+
+from .stretch import clamp_rate, time_stretch
+
+if TYPE_CHECKING:
+    from .codec import StreamEncoder
+    from .history import ResponseHistory
+
+_LOGGER = logging.getLogger(__name__)
+
+# A sink that doesn't accept audio for this long is considered stalled (e.g.
+# PipeWire hang) and is killed.
+_WRITE_TIMEOUT = 30.0
+
+# aplay only starts playing once its buffer is full, so the buffer must be
+# smaller than the player's max_lead or playback never starts.
+_APLAY_BUFFER_TIME_US = 100000
+
+# Events waiting for a slow subscriber before new ones are dropped
+_MAX_SUBSCRIBER_EVENTS = 256
+
+
+@dataclass
+class PlaybackSegment:
+    """Synthesized audio for one chunk (sentence) of a response."""
+
+    response_id: int
+    audio: bytes
+    rate: int
+    width: int
+    channels: int
+    offset: int = 0
+    """Bytes already handed to the output sink."""
+
+    fade: bool = True
+    """False if the audio was already crossfaded (e.g. rewound on pause)."""
+
+    speed: float = 1.0
+    """Playback rate the audio was time-stretched to (1.0: as synthesized)."""
+
+    @property
+    def bytes_per_frame(self) -> int:
+        """Bytes per sample across all channels."""
+        return self.width * self.channels
+
+    def to_source_bytes(self, num_bytes: int) -> int:
+        """Size in the synthesized audio of part of this segment's audio."""
+        if self.speed == 1.0:
+            return num_bytes
+
+        num_frames = int(round((num_bytes // self.bytes_per_frame) * self.speed))
+        return num_frames * self.bytes_per_frame
+
+    def same_format(self, other: "PlaybackSegment") -> bool:
+        """True if both segments can share an output stream."""
+        return (self.rate, self.width, self.channels) == (
+            other.rate,
+            other.width,
+            other.channels,
+        )
+
+
+def crossfade(tail: bytes, head: bytes, channels: int) -> bytes:
+    """Linearly crossfade the end of one 16-bit buffer into the start of the next.
+
+    Both buffers must have the same length. The result replaces both of them.
+    """
+    tail_array = np.frombuffer(tail, dtype=np.int16).astype(np.float32)
+    head_array = np.frombuffer(head, dtype=np.int16).astype(np.float32)
+    num_frames = len(tail_array) // channels
+
+    fade_out = np.repeat(np.linspace(1.0, 0.0, num=num_frames), channels)
+    mixed = (tail_array * fade_out) + (head_array * (1.0 - fade_out))
+
+    return np.clip(np.rint(mixed), -32768, 32767).astype(np.int16).tobytes()
+
+
+def audio_to_events(
+    audio: bytes, rate: int, width: int, channels: int, samples_per_chunk: int
+) -> List[Event]:
+    """Split audio into AudioStart, AudioChunk(s) and AudioStop events."""
+    events = [AudioStart(rate=rate, width=width, channels=channels).event()]
+    bytes_per_chunk = samples_per_chunk * width * channels
+    timestamp = 0
+    for offset in range(0, len(audio), bytes_per_chunk):
+        chunk_audio = audio[offset : offset + bytes_per_chunk]
+        events.append(
+            AudioChunk(
+                rate=rate,
+                width=width,
+                channels=channels,
+                audio=chunk_audio,
+                timestamp=timestamp,
+            ).event()
+        )
+        timestamp += (len(chunk_audio) * 1000) // (rate * width * channels)
+
+    events.append(AudioStop(timestamp=timestamp).event())
+    return events
+
+
+@dataclass
+class EventForwarder:
+    """Forwards events to a client connection without blocking the sender."""
+
+    write_event: Callable[[Event], Awaitable[None]]
+    max_events: int = 0
+    """Events held for a slow client before new ones are dropped (0 = no limit)."""
+
+    queue: "asyncio.Queue[Event]" = field(init=False)
+    task: "Optional[asyncio.Task[None]]" = field(default=None, init=False)
+
+    def __post_init__(self) -> None:
+        self.queue = asyncio.Queue(maxsize=self.max_events)
+
+    def start(self) -> None:
+        """Start forwarding queued events."""
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        """Stop forwarding events."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def clear(self) -> None:
+        """Drop events that have not been sent yet."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def put(self, event: Event) -> None:
+        """Queue an event without waiting for the client."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            _LOGGER.warning("Client is too slow; dropping %s", event.type)
+
+    async def run(self) -> None:
+        """Forward queued events to the client."""
+        while True:
+            event = await self.queue.get()
+            await self.write_event(event)
+
+
+@dataclass
+class PlaybackSubscriber(EventForwarder):
+    """Client connection that receives playback-state events."""
+
+    max_events: int = _MAX_SUBSCRIBER_EVENTS
+    audio: bool = False
+    """Also receive the PCM handed to the output device."""
+
+
+@dataclass
+class RemoteSink(EventForwarder):
+    """Client connection (e.g. a satellite) that plays audio streamed to it."""
+
+    name: str = ""
+    encoder: "Optional[StreamEncoder]" = None
+    """Compresses streamed audio in the codec negotiated by the client."""
+
+    def put(self, event: Event) -> None:
+        if self.encoder is None:
+            super().put(event)
+            return
+
+        for encoded_event in self.encoder.encode_event(event):
+            super().put(encoded_event)
+
+
+# -----------------------------------------------------------------------------
+
+
+class AplaySink:
+    """Raw PCM stream into a single aplay process."""
+
+    def __init__(self, rate: int, width: int, channels: int) -> None:
+        self.rate = rate
+        self.width = width
+        self.channels = channels
+        self.proc: "Optional[asyncio.subprocess.Process]" = None
+
+    async def open(self) -> None:
+        """Start aplay reading raw audio from stdin."""
+        self.proc = await asyncio.create_subprocess_exec(
+            "aplay",
+            "-q",
+            f"--buffer-time={_APLAY_BUFFER_TIME_US}",
+            "-t",
+            "raw",
+            "-f",
+            f"S{self.width * 8}_LE",
+            "-r",
+            str(self.rate),
+            "-c",
+            str(self.channels),
+            "-",
+            stdin=asyncio.subprocess.PIPE,
+        )
+        _LOGGER.debug("Started aplay process %s", self.proc.pid)
+
+    def write(self, audio: bytes) -> None:
+        """Buffer audio for the pipe."""
+        assert self.proc is not None
+        assert self.proc.stdin is not None
+        self.proc.stdin.write(audio)
+
+    async def drain(self) -> None:
+        """Wait until the pipe has accepted all buffered audio."""
+        assert self.proc is not None
+        assert self.proc.stdin is not None
+        await self.proc.stdin.drain()
+
+    async def close(self) -> None:
+        """Let aplay play what it has buffered, then exit."""
+        if (self.proc is None) or (self.proc.returncode is not None):
+            return
+
+        assert self.proc.stdin is not None
+        try:
+            self.proc.stdin.close()
+            await asyncio.wait_for(self.proc.wait(), timeout=_WRITE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.kill()
+
+    def kill(self) -> None:
+        """Stop playback immediately."""
+        if (self.proc is not None) and (self.proc.returncode is None):
+            _LOGGER.debug("Killing aplay process %s", self.proc.pid)
+            self.proc.kill()
+
+
+# -----------------------------------------------------------------------------
+
+
+class AudioPlayer:
+    """Plays queued segments back-to-back on one output stream.
+
+    Consecutive segments are written to the same sink, so there is no device
+    reopen between sentences. Segments of the same response can optionally be
+    crossfaded into each other.
+
+    Writing is paced to stay at most max_lead seconds ahead of real time, which
+    lets pause() work out exactly which samples have not been heard yet.
+
+    Subscribers receive speaking-started/speaking-stopped events with wall clock
+    timestamps and, optionally, every block of audio written to the output.
+    """
+
+    def __init__(
+        self,
+        samples_per_chunk: int = 1024,
+        crossfade_ms: float = 0.0,
+        idle_timeout: float = 1.0,
+        max_lead: float = 0.2,
+        sink_factory: Callable[[int, int, int], AplaySink] = AplaySink,
+        history: "Optional[ResponseHistory]" = None,
+    ) -> None:
+        self.samples_per_chunk = samples_per_chunk
+        self.crossfade_ms = crossfade_ms
+        self.idle_timeout = idle_timeout
+        self.max_lead = max_lead
+        self.sink_factory = sink_factory
+        self.history = history
+        self.response_id = 0
+        self.playback_rate = 1.0
+        self.is_paused = False
+        self.is_speaking = False
+        self.subscribers: List[PlaybackSubscriber] = []
+        self.remote_sinks: Dict[str, RemoteSink] = {}
+
+        self._queue: Deque[PlaybackSegment] = deque()
+        self._audio_ready = asyncio.Event()
+        self._sink: Optional[AplaySink] = None
+        self._stream_end = 0.0
+        self._task: "Optional[asyncio.Task[None]]" = None
+        self._cue_tasks: "Set[asyncio.Task[None]]" = set()
+
+        # Blocks written to the sink that may not have been heard yet
+        self._recent: Deque[PlaybackSegment] = deque()
+        self._recent_bytes = 0
+
+    @property
+    def queue(self) -> List[PlaybackSegment]:
+        """Segments waiting to be played (first one may be partially played)."""
+        return list(self._queue)
+
+    @property
+    def queued_bytes(self) -> int:
+        """Size of the audio waiting to be played."""
+        return sum(len(segment.audio) - segment.offset for segment in self._queue)
+
+    @property
+    def has_audio(self) -> bool:
+        """True while audio is queued or has not been heard yet."""
+        return bool(self._queue) or self.is_speaking
+
+    def subscribe(self, subscriber: PlaybackSubscriber) -> None:
+        """Send playback-state events to a client."""
+        subscriber.start()
+        self.subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber: PlaybackSubscriber) -> None:
+        """Stop sending playback-state events to a client."""
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+        subscriber.stop()
+
+    def register_sink(self, sink: RemoteSink) -> None:
+        """Make a client connection available as a named output sink."""
+        old_sink = self.remote_sinks.get(sink.name)
+        if old_sink is not None:
+            old_sink.stop()
+
+        sink.start()
+        self.remote_sinks[sink.name] = sink
+
+    def unregister_sink(self, sink: RemoteSink) -> None:
+        """Remove a named output sink."""
+        if self.remote_sinks.get(sink.name) is sink:
+            self.remote_sinks.pop(sink.name)
+
+        sink.stop()
+
+    def stop_remote_sinks(self) -> None:
+        """Drop audio that has not been sent to remote sinks yet."""
+        for sink in self.remote_sinks.values():
+            sink.clear()
+            sink.put(AudioStop().event())
+
+    def start(self) -> None:
+        """Start the playback task."""
+        if (self._task is None) and (not self.is_paused):
+            self._task = asyncio.create_task(self._run())
+
+    def new_response(self) -> int:
+        """Begin a new response; segments are only crossfaded within one."""
+        self.response_id += 1
+        return self.response_id
+
+    def enqueue(
+        self,
+        audio: bytes,
+        rate: int,
+        width: int,
+        channels: int,
+        response_id: Optional[int] = None,
+    ) -> None:
+        """Queue audio for playback as part of a response (default: current)."""
+        segment = PlaybackSegment(
+            response_id=self.response_id if response_id is None else response_id,
+            audio=audio,
+            rate=rate,
+            width=width,
+            channels=channels,
+        )
+        if self.history is not None:
+            self.history.add(segment)
+
+        self._queue.append(segment)
+        self._audio_ready.set()
+
+    def enqueue_segments(self, segments: List[PlaybackSegment]) -> None:
+        """Queue previously synthesized audio (e.g. from history) for playback."""
+        self._queue.extend(segments)
+        self._audio_ready.set()
+
+    async def stop(self) -> None:
+        """Drop all queued audio and silence the output immediately."""
+        self.is_paused = False
+        await self._cancel_task()
+
+        # Keep the played position of the response accurate for "continue"
+        self._rewind()
+        await self.close()
+        self.start()
+
+    async def close(self) -> None:
+        """Stop the playback task and release the output."""
+        self._queue.clear()
+        await self._cancel_task()
+        self._close_sink_now()
+        self._set_speaking(False, reason="stopped")
+
+    async def pause(self) -> None:
+        """Hold playback and all queued audio at the current sample.
+
+        The output is closed so the audio device is released. Audio that was
+        written to the sink but not yet heard is put back at the front of the
+        queue.
+        """
+        if self.is_paused:
+            return
+
+        self.is_paused = True
+        await self._cancel_task()
+        self._rewind()
+        self._close_sink_now()
+        self._set_speaking(False, reason="paused")
+        _LOGGER.debug("Paused with %s segment(s) queued", len(self._queue))
+
+    def set_playback_rate(self, rate: float) -> float:
+        """Speed up or slow down queued and future audio at the same pitch.
+
+        Audio is time-stretched just before it is written, so the new rate is
+        heard within max_lead seconds, including in the sentence being played.
+        """
+        self.playback_rate = clamp_rate(rate)
+        _LOGGER.debug("Playback rate: %s", self.playback_rate)
+        return self.playback_rate
+
+    def resume(self) -> None:
+        """Continue playback from where it was paused."""
+        if not self.is_paused:
+            return
+
+        self.is_paused = False
+        self.start()
+
+    def play_cue(self, audio: bytes, rate: int, width: int, channels: int) -> None:
+        """Play a short sound right away on its own output stream.
+
+        Cues don't wait for queued speech and are played even while paused.
+        """
+        segment = PlaybackSegment(
+            response_id=self.response_id,
+            audio=audio,
+            rate=rate,
+            width=width,
+            channels=channels,
+        )
+        task = asyncio.create_task(self._play_cue(segment))
+        self._cue_tasks.add(task)
+        task.add_done_callback(self._cue_tasks.discard)
+
+    # -------------------------------------------------------------------------
+
+    async def _play_cue(self, segment: PlaybackSegment) -> None:
+        sink = self.sink_factory(segment.rate, segment.width, segment.channels)
+        try:
+            await sink.open()
+            sink.write(segment.audio)
+            self._tap(segment, segment.audio, time.monotonic())
+            await asyncio.wait_for(sink.drain(), timeout=_WRITE_TIMEOUT)
+            await sink.close()
+        except Exception:
+            _LOGGER.exception("Unexpected error playing cue")
+            sink.kill()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._queue:
+                await self._wait_for_audio()
+                continue
+
+            segment = self._queue[0]
+            try:
+                await self._play_segment(segment)
+            except (asyncio.TimeoutError, BrokenPipeError, ConnectionResetError):
+                _LOGGER.warning("Audio output stalled or closed; dropping segment")
+                self._close_sink_now()
+                self._set_speaking(False, reason="error")
+                if self._queue and (self._queue[0] is segment):
+                    self._queue.popleft()
+            except Exception:
+                _LOGGER.exception("Unexpected error during playback")
+                if self._queue and (self._queue[0] is segment):
+                    self._queue.popleft()
+
+    async def _wait_for_audio(self) -> None:
+        """Wait for new audio, closing an idle sink in the meantime."""
+        self._audio_ready.clear()
+        if self._sink is None:
+            await self._audio_ready.wait()
+            return
+
+        if self.is_speaking:
+            # Report the end of speech once the last sample has played
+            remaining = max(0.0, self._stream_end - time.monotonic())
+            try:
+                await asyncio.wait_for(self._audio_ready.wait(), timeout=remaining)
+                return
+            except asyncio.TimeoutError:
+                self._set_speaking(False, reason="finished", end=self._stream_end)
+
+        try:
+            await asyncio.wait_for(self._audio_ready.wait(), timeout=self.idle_timeout)
+        except asyncio.TimeoutError:
+            _LOGGER.debug("Closing idle audio output")
+            sink, self._sink = self._sink, None
+            await sink.close()
+
+    async def _play_segment(self, segment: PlaybackSegment) -> None:
+        await self._ensure_sink(segment)
+        await self._stretch(segment)
+
+        fade_bytes = self._crossfade_bytes(segment)
+        if (len(segment.audio) - segment.offset) < (2 * fade_bytes):
+            fade_bytes = 0
+
+        # Hold back the tail so it can be mixed into the next segment
+        end = len(segment.audio) - fade_bytes
+        block_bytes = self.samples_per_chunk * segment.bytes_per_frame
+        while segment.offset < end:
+            await self._pace()
+            if self._needs_stretch(segment):
+                # Rate changed mid-segment: stretch the rest of it
+                await self._stretch(segment)
+                if (len(segment.audio) - segment.offset) < fade_bytes:
+                    fade_bytes = 0
+
+                end = len(segment.audio) - fade_bytes
+                continue
+
+            block = segment.audio[
+                segment.offset : min(end, segment.offset + block_bytes)
+            ]
+            await self._write(segment, block)
+
+        if segment.offset < len(segment.audio):
+            next_segment = self._queue[1] if len(self._queue) > 1 else None
+            if (
+                (next_segment is not None)
+                and next_segment.fade
+                and (next_segment.response_id == segment.response_id)
+                and next_segment.same_format(segment)
+                and ((len(next_segment.audio) - next_segment.offset) >= fade_bytes)
+            ):
+                head_end = next_segment.offset + fade_bytes
+                head = next_segment.audio[next_segment.offset : head_end]
+                next_segment.audio = (
+                    next_segment.audio[: next_segment.offset]
+                    + crossfade(segment.audio[end:], head, segment.channels)
+                    + next_segment.audio[head_end:]
+                )
+                self._mark_heard(segment, len(segment.audio) - segment.offset)
+                segment.offset = len(segment.audio)
+            else:
+                await self._pace()
+                await self._write(segment, segment.audio[segment.offset :])
+
+        self._queue.popleft()
+
+    async def _stretch(self, segment: PlaybackSegment) -> None:
+        """Time-stretch the unplayed part of a segment to the playback rate."""
+        if not self._needs_stretch(segment):
+            return
+
+        speed = self.playback_rate
+        # Stretching a sentence takes tens of milliseconds
+        stretched = await asyncio.to_thread(
+            time_stretch,
+            segment.audio[segment.offset :],
+            speed / segment.speed,
+            segment.rate,
+            segment.channels,
+        )
+        segment.audio = segment.audio[: segment.offset] + stretched
+        segment.speed = speed
+
+    def _needs_stretch(self, segment: PlaybackSegment) -> bool:
+        return (segment.speed != self.playback_rate) and (segment.width == 2)
+
+    def _crossfade_bytes(self, segment: PlaybackSegment) -> int:
+        if (self.crossfade_ms <= 0) or (segment.width != 2) or (not segment.fade):
+            return 0
+
+        num_frames = int(segment.rate * (self.crossfade_ms / 1000))
+        return num_frames * segment.bytes_per_frame
+
+    async def _ensure_sink(self, segment: PlaybackSegment) -> None:
+        """Open an output stream for the segment's format if needed."""
+        sink = self._sink
+        if (sink is not None) and (
+            (sink.rate, sink.width, sink.channels)
+            == (segment.rate, segment.width, segment.channels)
+        ):
+            return
+
+        if sink is not None:
+            self._sink = None
+            await sink.close()
+
+        sink = self.sink_factory(segment.rate, segment.width, segment.channels)
+        await sink.open()
+        self._sink = sink
+        self._stream_end = time.monotonic()
+        self._recent.clear()
+        self._recent_bytes = 0
+
+    async def _pace(self) -> None:
+        """Wait until the sink is at most max_lead seconds ahead of playback."""
+        lead = self._stream_end - time.monotonic()
+        if lead > self.max_lead:
+            await asyncio.sleep(lead - self.max_lead)
+
+    async def _write(self, segment: PlaybackSegment, audio: bytes) -> None:
+        """Write part of a segment to the sink.
+
+        Bookkeeping happens before the drain, so a cancelled drain never loses
+        or repeats audio.
+        """
+        assert self._sink is not None
+        self._sink.write(audio)
+        segment.offset += len(audio)
+        self._mark_heard(segment, len(audio))
+
+        now = time.monotonic()
+        play_start = max(self._stream_end, now)
+        num_frames = len(audio) // segment.bytes_per_frame
+        self._stream_end = play_start + (num_frames / segment.rate)
+
+        self._set_speaking(True, response_id=segment.response_id)
+        self._tap(segment, audio, play_start)
+
+        # Remember enough audio to cover everything that can still be unheard
+        self._recent.append(
+            PlaybackSegment(
+                response_id=segment.response_id,
+                audio=audio,
+                rate=segment.rate,
+                width=segment.width,
+                channels=segment.channels,
+                fade=False,
+                speed=segment.speed,
+            )
+        )
+        self._recent_bytes += len(audio)
+        max_recent_bytes = (
+            int(self.max_lead * segment.rate) + (2 * self.samples_per_chunk)
+        ) * segment.bytes_per_frame
+        while (self._recent_bytes - len(self._recent[0].audio)) >= max_recent_bytes:
+            self._recent_bytes -= len(self._recent.popleft().audio)
+
+        await asyncio.wait_for(self._sink.drain(), timeout=_WRITE_TIMEOUT)
+
+    def _rewind(self) -> None:
+        """Put audio that was written but not yet heard back on the queue."""
+        if (self._sink is None) or (not self._recent):
+            return
+
+        last = self._recent[-1]
+        unplayed_frames = int(max(0.0, self._stream_end - time.monotonic()) * last.rate)
+        unplayed_bytes = min(unplayed_frames * last.bytes_per_frame, self._recent_bytes)
+        if unplayed_bytes <= 0:
+            return
+
+        audio = b"".join(block.audio for block in self._recent)
+        if self.history is not None:
+            self.history.mark_heard(
+                last.response_id, -last.to_source_bytes(unplayed_bytes)
+            )
+
+        self._queue.appendleft(
+            PlaybackSegment(
+                response_id=last.response_id,
+                audio=audio[-unplayed_bytes:],
+                rate=last.rate,
+                width=last.width,
+                channels=last.channels,
+                fade=False,
+                speed=last.speed,
+            )
+        )
+        self._recent.clear()
+        self._recent_bytes = 0
+
+    def _mark_heard(self, segment: PlaybackSegment, num_bytes: int) -> None:
+        # History keeps the synthesized audio, so positions are in its bytes
+        if self.history is not None:
+            self.history.mark_heard(
+                segment.response_id, segment.to_source_bytes(num_bytes)
+            )
+
+    def _set_speaking(
+        self,
+        speaking: bool,
+        response_id: Optional[int] = None,
+        reason: Optional[str] = None,
+        end: Optional[float] = None,
+    ) -> None:
+        """Track speaking state and notify subscribers when it changes."""
+        if speaking == self.is_speaking:
+            return
+
+        self.is_speaking = speaking
+        data: Dict[str, object] = {"timestamp": _to_wall_clock(end)}
+        if speaking:
+            data["response_id"] = response_id
+            event = Event(type="speaking-started", data=data)
+        else:
+            data["reason"] = reason
+            event = Event(type="speaking-stopped", data=data)
+
+        _LOGGER.debug("%s: %s", event.type, data)
+        for subscriber in self.subscribers:
+            subscriber.put(event)
+
+    def _tap(self, segment: PlaybackSegment, audio: bytes, play_start: float) -> None:
+        """Send audio handed to the output device to subscribers that want it."""
+        chunk_event: Optional[Event] = None
+        for subscriber in self.subscribers:
+            if not subscriber.audio:
+                continue
+
+            if chunk_event is None:
+                chunk_event = AudioChunk(
+                    rate=segment.rate,
+                    width=segment.width,
+                    channels=segment.channels,
+                    audio=audio,
+                    timestamp=int(_to_wall_clock(play_start) * 1000),
+                ).event()
+
+            subscriber.put(chunk_event)
+
+    async def _cancel_task(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+
+    def _close_sink_now(self) -> None:
+        if self._sink is not None:
+            self._sink.kill()
+            self._sink = None
+
+
+def _to_wall_clock(monotonic: Optional[float] = None) -> float:
+    """Convert a time.monotonic() value (default: now) to seconds since epoch."""
+    if monotonic is None:
+        return time.time()
+
+    return time.time() + (monotonic - time.monotonic())
@@ -3,21 +3,58 @@ import argparse
 import asyncio
 import json
 import logging
+import os
+import sys
 import tempfile
 import time
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+import wave
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
 
 from .download import ensure_voice_exists, find_voice
+from .memory import get_file_size, get_rss
+from .worker import ERROR_PREFIX, FRAME_OK, read_frame
 
 _LOGGER = logging.getLogger(__name__)
 
+# Kinds of piper worker processes
+WORKER_CLI = "cli"  # piper command line: plain text, parameters fixed at start
+WORKER_PYTHON = "python"  # wyoming_piper.worker: parameters with each request
+
+# Synthesized by a replacement worker before it takes requests
+WARM_UP_TEXT = "Ready."
+WARM_UP_TIMEOUT = 120.0
+
+# Seconds a worker gets to exit after its stdin is closed
+_EXIT_TIMEOUT = 5.0
+
+# tmpfs for the WAV files of the piper command line
+_SHM_DIR = "/dev/shm"
+
+# Audio, sample rate, width and channels of a request
+AudioData = Tuple[bytes, int, int, int]
+
+
+def _set_event() -> asyncio.Event:
+    event = asyncio.Event()
+    event.set()
+    return event
+
 
 @dataclass
-class AplayProcess:
-    """Info for a running Aplay process."""
-    proc: "asyncio.subprocess.Process"
-    last_used: int = 0
+class VoiceSettings:
+    """Settings of a voice's worker that can be changed while serving."""
+
+    model: Optional[str] = None
+    """Path to an .onnx model (config next to it as .onnx.json)."""
+    speaker: Optional[str] = None
+    noise_scale: Optional[float] = None
+    length_scale: Optional[float] = None
+    noise_w: Optional[float] = None
+
 
 @dataclass
 class PiperProcess:
@@ -26,8 +63,172 @@ class PiperProcess:
     name: str
     proc: "asyncio.subprocess.Process"
     config: Dict[str, Any]
-    wav_dir: tempfile.TemporaryDirectory
+    wav_dir: Optional[tempfile.TemporaryDirectory]
+    """WAV files of the piper command line (None with output frames)."""
     last_used: int = 0
+    model_path: Optional[Path] = None
+    num_requests: int = 0
+    accepts_json: bool = False
+    """True for the Python worker, which takes parameters with each request."""
+    output_frames: bool = False
+    """True if audio comes in frames on stdout instead of WAV files."""
+    in_flight: int = 0
+    """Requests sent to the process that are not done yet."""
+    drained: asyncio.Event = field(default_factory=_set_event)
+    """Set while no request is in flight."""
+    pending: "Deque[asyncio.Future[AudioData]]" = field(default_factory=deque)
+    """Audio of submitted lines, completed in order by the readers."""
+    readers: "Set[asyncio.Task[None]]" = field(default_factory=set, repr=False)
+
+    @property
+    def busy(self) -> bool:
+        """True while synthesizing."""
+        return self.in_flight > 0
+
+    def begin_request(self) -> None:
+        """Count a request sent to the process."""
+        self.in_flight += 1
+        self.num_requests += 1
+        self.drained.clear()
+
+    def end_request(self) -> None:
+        """Count a request as done."""
+        self.in_flight = max(0, self.in_flight - 1)
+        self.last_used = time.monotonic_ns()
+        if self.in_flight == 0:
+            self.drained.set()
+
+    def start_readers(self) -> None:
+        """Read stdout and stderr in the background for the life of the process.
+
+        Piper completes the lines on its stdin in order, so each frame on
+        stdout (or "Wrote" line on stderr) belongs to the oldest pending
+        request. Both pipes are always read, so a full pipe can never block
+        piper.
+        """
+        self._add_reader(self._read_stderr())
+        self._add_reader(self._read_stdout())
+
+    def submit(self, request_line: str) -> "asyncio.Future[AudioData]":
+        """Queue a request line; the future gets its audio.
+
+        Lines are written without waiting, so several requests can be queued
+        in one process. The caller drains stdin.
+        """
+        assert self.proc.stdin is not None
+        if self.proc.returncode is not None:
+            raise RuntimeError(f"Piper process for {self.name} has exited")
+
+        audio: "asyncio.Future[AudioData]" = asyncio.get_running_loop().create_future()
+        self.pending.append(audio)
+        self.proc.stdin.write((request_line + "\n").encode("utf-8"))
+        return audio
+
+    async def _read_stderr(self) -> None:
+        assert self.proc.stderr is not None
+        try:
+            while True:
+                output_line = (await self.proc.stderr.readline()).decode().strip()
+                if not output_line and self.proc.stderr.at_eof():
+                    break
+
+                _LOGGER.debug("Piper output: %s", output_line)
+                if self.output_frames:
+                    # Results (errors included) only come in frames
+                    continue
+
+                if output_line.startswith(ERROR_PREFIX):
+                    self._complete(error=RuntimeError(output_line))
+                elif "Wrote " in output_line:
+                    # Extract path from "INFO:__main__:Wrote /path/to/file.wav" or "Wrote /path/to/file.wav"
+                    self._complete_wav(output_line.split("Wrote ", 1)[1])
+        finally:
+            if not self.output_frames:
+                self._fail_pending()
+
+    async def _read_stdout(self) -> None:
+        assert self.proc.stdout is not None
+        if not self.output_frames:
+            while await self.proc.stdout.read(4096):
+                pass
+
+            return
+
+        try:
+            while True:
+                frame = await read_frame(self.proc.stdout)
+                if frame is None:
+                    break
+
+                if frame.status != FRAME_OK:
+                    self._complete(error=RuntimeError(frame.payload.decode("utf-8")))
+                else:
+                    self._complete(
+                        audio=(frame.payload, frame.rate, frame.width, frame.channels)
+                    )
+        finally:
+            # Whatever ended reading, nothing else completes these requests
+            self._fail_pending()
+
+    def _complete_wav(self, output_path: str) -> None:
+        if not self.pending:
+            _LOGGER.warning("Unexpected output from piper for %s", self.name)
+            return
+
+        # Read in a thread; the next line can complete meanwhile
+        self._add_reader(self._load_wav(self.pending.popleft(), output_path))
+
+    async def _load_wav(
+        self, future: "asyncio.Future[AudioData]", output_path: str
+    ) -> None:
+        try:
+            audio = await asyncio.to_thread(read_and_remove_wav, output_path)
+        except Exception as err:
+            if not future.done():
+                future.set_exception(err)
+
+            return
+
+        if not future.done():
+            future.set_result(audio)
+
+    def _complete(
+        self,
+        audio: Optional[AudioData] = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        if not self.pending:
+            _LOGGER.warning("Unexpected output from piper for %s", self.name)
+            return
+
+        future = self.pending.popleft()
+        if future.done():
+            # Request was cancelled
+            return
+
+        if error is not None:
+            future.set_exception(error)
+        else:
+            assert audio is not None
+            future.set_result(audio)
+
+    def _fail_pending(self) -> None:
+        # Process exited
+        while self.pending:
+            self._complete(error=RuntimeError(f"Piper process for {self.name} exited"))
+
+    def _add_reader(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self.readers.add(task)
+        task.add_done_callback(self.readers.discard)
+
+    def get_memory(self) -> int:
+        """Memory held by the worker in bytes (blocking).
+
+        The RSS, or the model file size while the worker has not loaded its
+        model yet (or the RSS is unknown).
+        """
+        return max(get_rss(self.proc.pid) or 0, get_file_size(self.model_path) or 0)
 
     def get_speaker_id(self, speaker: str) -> Optional[int]:
         """Get speaker by name or id."""
@@ -58,6 +259,59 @@ def _is_multispeaker(config: Dict[str, Any]) -> bool:
     return config.get("num_speakers", 1) > 1
 
 
+def read_and_remove_wav(wav_path: str) -> AudioData:
+    """Read audio and format of a WAV file written by piper, then delete it."""
+    with wave.open(wav_path, "rb") as wav_file:
+        audio = wav_file.readframes(wav_file.getnframes())
+        rate = wav_file.getframerate()
+        width = wav_file.getsampwidth()
+        channels = wav_file.getnchannels()
+
+    os.unlink(wav_path)
+    return audio, rate, width, channels
+
+
+def _wav_parent_dir() -> Optional[str]:
+    """Directory in memory (tmpfs) for WAV files, if there is one."""
+    if os.path.isdir(_SHM_DIR) and os.access(_SHM_DIR, os.W_OK):
+        return _SHM_DIR
+
+    return None
+
+
+class DeliveryOrder:
+    """Lets requests deliver their audio in the order they were sent."""
+
+    def __init__(self) -> None:
+        self._last = _set_event()
+
+    def take(self) -> Tuple[asyncio.Event, asyncio.Event]:
+        """Event of the previous request and the one to set after delivering."""
+        previous, self._last = self._last, asyncio.Event()
+        return previous, self._last
+
+
+async def stop_process(piper_proc: PiperProcess) -> None:
+    """Stop a worker and remove its WAV directory."""
+    proc = piper_proc.proc
+    if proc.returncode is None:
+        try:
+            # Piper exits at the end of its input
+            if proc.stdin is not None:
+                proc.stdin.close()
+
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=_EXIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                proc.terminate()
+                await proc.wait()
+        except Exception:
+            _LOGGER.exception("Unexpected error stopping piper process")
+
+    if piper_proc.wav_dir is not None:
+        piper_proc.wav_dir.cleanup()
+
+
 # -----------------------------------------------------------------------------
 
 
@@ -69,46 +323,73 @@ class PiperProcessManager:
         self.args = args
         self.processes: Dict[str, PiperProcess] = {}
         self.processes_lock = asyncio.Lock()
-
-    async def get_process(self, voice_name: Optional[str] = None) -> PiperProcess:
-        """Get a running Piper process or start a new one if necessary."""
-        voice_speaker: Optional[str] = None
+        self.voice_settings: Dict[str, VoiceSettings] = {}
+
+        # Requests served by a running process (hits) or that started one
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        """Workers stopped to stay within --max-tts-memory."""
+        self.idle_unloads = 0
+        """Workers stopped after --voice-idle-timeout."""
+        self._idle_task: "Optional[asyncio.Task[None]]" = None
+
+        # Synthesize requests from arrival to completion (including waiting)
+        self.is_stopping = False
+        self.num_pending = 0
+        self._no_pending = _set_event()
+
+        # Shared by all voices, so audio plays in the order it was requested
+        self.delivery_order = DeliveryOrder()
+
+        # Replaced workers that finish their requests in the background
+        self._tasks: "Set[asyncio.Task[None]]" = set()
+
+    def resolve_voice_name(self, voice_name: Optional[str] = None) -> str:
+        """Voice key for a name or alias (None: default voice)."""
         if voice_name is None:
-            # Default voice
             voice_name = self.args.voice
 
-        if voice_name == self.args.voice:
-            # Default speaker
-            voice_speaker = self.args.speaker
-
         assert voice_name is not None
-
-        # Resolve alias
         voice_info = self.voices_info.get(voice_name, {})
-        voice_name = voice_info.get("key", voice_name)
-        assert voice_name is not None
+        return voice_info.get("key", voice_name)
+
+    @asynccontextmanager
+    async def pending_request(self) -> AsyncIterator[None]:
+        """Count a synthesize request until it is done, so stop() can wait."""
+        self.num_pending += 1
+        self._no_pending.clear()
+        try:
+            yield
+        finally:
+            self.num_pending -= 1
+            if self.num_pending == 0:
+                self._no_pending.set()
+
+    async def get_process(self, voice_name: Optional[str] = None) -> PiperProcess:
+        """Get a running Piper process or start a new one if necessary."""
+        voice_name = self.resolve_voice_name(voice_name)
 
         piper_proc = self.processes.get(voice_name)
         if (piper_proc is None) or (piper_proc.proc.returncode is not None):
+            if self.is_stopping:
+                raise RuntimeError("Server is shutting down")
+
             # Remove if stopped
             self.processes.pop(voice_name, None)
+            self.misses += 1
 
             # Start new Piper process
             if self.args.max_piper_procs > 0:
                 # Restrict number of running processes
                 while len(self.processes) >= self.args.max_piper_procs:
-                    # Stop least recently used process
+                    # Stop least recently used process once its requests are done
                     lru_proc_name, lru_proc = sorted(
                         self.processes.items(), key=lambda kv: kv[1].last_used
                     )[0]
                     _LOGGER.debug("Stopping process for: %s", lru_proc_name)
                     self.processes.pop(lru_proc_name, None)
-                    if lru_proc.proc.returncode is None:
-                        try:
-                            lru_proc.proc.terminate()
-                            await lru_proc.proc.wait()
-                        except Exception:
-                            _LOGGER.exception("Unexpected error stopping piper process")
+                    self._retire(lru_proc, self.args.drain_timeout)
 
             _LOGGER.debug(
                 "Starting process for: %s (%s/%s)",
@@ -116,81 +397,310 @@ class PiperProcessManager:
                 len(self.processes) + 1,
                 self.args.max_piper_procs,
             )
+            piper_proc = await self._start_process(voice_name)
+            self.processes[voice_name] = piper_proc
+        else:
+            self.hits += 1
 
-            ensure_voice_exists(
-                voice_name,
-                self.args.data_dir,
-                self.args.download_dir,
-                self.voices_info,
+        # Update used
+        piper_proc.last_used = time.monotonic_ns()
+
+        return piper_proc
+
+    async def reload_voice(
+        self, voice_name: Optional[str] = None, **changes: Any
+    ) -> Optional[PiperProcess]:
+        """Replace a voice's worker without interrupting it (blue/green).
+
+        A new worker with the changed settings (e.g. a new model file) is
+        started and synthesizes a short warm-up text while the old one keeps
+        serving. New requests then go to the new worker, and the old one is
+        stopped once its requests in flight are done. A voice that is not
+        running only gets the new settings. If the new worker fails, the old
+        one is kept.
+        """
+        voice_name = self.resolve_voice_name(voice_name)
+        settings = replace(
+            self.voice_settings.get(voice_name, VoiceSettings()), **changes
+        )
+        if voice_name not in self.processes:
+            self.voice_settings[voice_name] = settings
+            return None
+
+        if self.is_stopping:
+            raise RuntimeError("Server is shutting down")
+
+        _LOGGER.debug("Replacing process for: %s (%s)", voice_name, settings)
+        new_proc = await self._start_process(voice_name, settings)
+        try:
+            await asyncio.wait_for(self._warm_up(new_proc), timeout=WARM_UP_TIMEOUT)
+        except BaseException:
+            await stop_process(new_proc)
+            raise
+
+        self.voice_settings[voice_name] = settings
+        old_proc = self.processes.get(voice_name)
+        self.processes[voice_name] = new_proc
+        new_proc.last_used = time.monotonic_ns()
+        if old_proc is not None:
+            self._retire(old_proc, self.args.drain_timeout)
+
+        return new_proc
+
+    async def reload_voices(self) -> None:
+        """Replace the workers of all running voices (e.g. after a model update)."""
+        for voice_name in list(self.processes):
+            try:
+                await self.reload_voice(voice_name)
+            except Exception:
+                _LOGGER.exception("Failed to reload voice: %s", voice_name)
+
+    def start_reload_voices(self) -> None:
+        """Replace the workers of all running voices in the background."""
+        self._add_task(self.reload_voices())
+
+    def start_idle_unloading(self, timeout: float) -> None:
+        """Stop workers of voices other than the default after timeout idle seconds."""
+        if self._idle_task is None:
+            self._idle_task = asyncio.create_task(self._unload_idle_voices(timeout))
+
+    def unload_idle_voices(self, timeout: float) -> None:
+        """Stop workers of non-default voices that were idle for timeout seconds."""
+        default_voice = self.resolve_voice_name()
+        idle_since = time.monotonic_ns() - int(timeout * 1e9)
+        for name, piper_proc in list(self.processes.items()):
+            if (
+                (name == default_voice)
+                or piper_proc.busy
+                or (piper_proc.last_used > idle_since)
+            ):
+                continue
+
+            _LOGGER.debug("Unloading idle voice: %s", name)
+            self.processes.pop(name, None)
+            self._retire(piper_proc, self.args.drain_timeout)
+            self.idle_unloads += 1
+
+    async def _unload_idle_voices(self, timeout: float) -> None:
+        while True:
+            # Unloaded at most a tenth of the timeout late
+            await asyncio.sleep(max(1.0, timeout / 10))
+            self.unload_idle_voices(timeout)
+
+    async def stop(self, timeout: float) -> None:
+        """Refuse new requests, finish pending ones and stop all workers.
+
+        Requests that already arrived (including those waiting for a worker)
+        get up to timeout seconds; workers still busy after that are stopped.
+        """
+        self.is_stopping = True
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+
+        deadline = time.monotonic() + timeout
+        try:
+            await asyncio.wait_for(self._no_pending.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            _LOGGER.warning(
+                "Stopping with %s request(s) not done after %s second(s)",
+                self.num_pending,
+                timeout,
             )
 
-            onnx_path, config_path = find_voice(voice_name, self.args.data_dir)
-            with open(config_path, "r", encoding="utf-8") as config_file:
-                config = json.load(config_file)
-
-            wav_dir = tempfile.TemporaryDirectory()
-            piper_args = [
-                "--model",
-                str(onnx_path),
-                "--config",
-                str(config_path),
-                "--output_dir",
-                str(wav_dir.name),
-                # NOTE: --json-input removed - not supported in piper-tts 1.4.1
-                # Use plain text on stdin instead
-            ]
-
-            if voice_speaker is not None:
-                if _is_multispeaker(config):
-                    speaker_id = _get_speaker_id(config, voice_speaker)
-                    if speaker_id is not None:
-                        piper_args.extend(["--speaker", str(speaker_id)])
-
-            if self.args.noise_scale:
-                piper_args.extend(["--noise-scale", str(self.args.noise_scale)])
-
-            if self.args.length_scale:
-                piper_args.extend(["--length-scale", str(self.args.length_scale)])
-
-            if self.args.noise_w:
-                piper_args.extend(["--noise-w", str(self.args.noise_w)])
+        for piper_proc in self.processes.values():
+            self._retire(piper_proc, max(0.0, deadline - time.monotonic()))
+
+        self.processes.clear()
+        while self._tasks:
+            await asyncio.wait(list(self._tasks))
+
+    def _retire(self, piper_proc: PiperProcess, timeout: float) -> None:
+        """Stop a worker in the background once its requests in flight are done."""
+        self._add_task(self._drain_and_stop(piper_proc, timeout))
+
+    async def _drain_and_stop(self, piper_proc: PiperProcess, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(piper_proc.drained.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            _LOGGER.warning(
+                "Stopping process for %s with %s request(s) in flight",
+                piper_proc.name,
+                piper_proc.in_flight,
+            )
+
+        await stop_process(piper_proc)
+        _LOGGER.debug("Stopped process for: %s", piper_proc.name)
+
+    def _add_task(self, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _make_room(self, voice_name: str, onnx_path: Path) -> None:
+        """Stop least recently used idle workers to stay within --max-tts-memory.
+
+        Running workers count with their RSS; the new worker is estimated by
+        its model file size. Workers with requests in flight are never
+        stopped, so the budget may be exceeded until they are done.
+        """
+        budget = int(self.args.max_tts_memory * 1024 * 1024)
+        if budget <= 0:
+            return
+
+        def _measure() -> Tuple[Dict[str, int], int]:
+            return (
+                {
+                    name: piper_proc.get_memory()
+                    for name, piper_proc in self.processes.items()
+                },
+                get_file_size(onnx_path) or 0,
+            )
+
+        usage, new_bytes = await asyncio.to_thread(_measure)
+        total = sum(usage.values()) + new_bytes
+        for name, piper_proc in sorted(
+            self.processes.items(), key=lambda kv: kv[1].last_used
+        ):
+            if total <= budget:
+                break
+
+            if (name == voice_name) or piper_proc.busy or (name not in usage):
+                continue
 
             _LOGGER.debug(
-                "Starting piper process: %s args=%s", self.args.piper, piper_args
+                "Stopping process for %s to free %s byte(s)", name, usage[name]
             )
-            piper_proc = PiperProcess(
-                name=voice_name,
-                proc=await asyncio.create_subprocess_exec(
-                    self.args.piper,
-                    *piper_args,
-                    stdin=asyncio.subprocess.PIPE,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,  # Need to read output path from stderr
-                ),
-                config=config,
-                wav_dir=wav_dir,
+            self.processes.pop(name, None)
+            self._retire(piper_proc, self.args.drain_timeout)
+            self.evictions += 1
+            total -= usage[name]
+
+        if total > budget:
+            _LOGGER.warning(
+                "Voice workers need %s MiB, over the budget of %s MiB",
+                total // (1024 * 1024),
+                budget // (1024 * 1024),
             )
-            self.processes[voice_name] = piper_proc
 
-        # Update used
-        piper_proc.last_used = time.monotonic_ns()
+    async def _warm_up(self, piper_proc: PiperProcess) -> None:
+        """Synthesize a short text, so the model is loaded before requests."""
+        assert piper_proc.proc.stdin is not None
+        audio = piper_proc.submit(WARM_UP_TEXT)
+        await piper_proc.proc.stdin.drain()
+        await audio
+
+    async def _start_process(
+        self, voice_name: str, settings: Optional[VoiceSettings] = None
+    ) -> PiperProcess:
+        if settings is None:
+            settings = self.voice_settings.get(voice_name, VoiceSettings())
+
+        # The Python worker sends audio in frames on stdout, so it never
+        # touches the filesystem. The piper command line writes WAV files,
+        # kept on tmpfs when there is one.
+        accepts_json = self.args.piper_worker == WORKER_PYTHON
+        output_frames = accepts_json
+
+        # Downloading and reading the voice blocks, so it runs in a thread
+        # to keep other connections (and stop events) responsive
+        onnx_path, config_path, config, wav_dir = await asyncio.to_thread(
+            self._prepare_voice, voice_name, settings.model, not output_frames
+        )
+        await self._make_room(voice_name, onnx_path)
+
+        piper_args = [
+            "--model",
+            str(onnx_path),
+            "--config",
+            str(config_path),
+            # NOTE: --json-input removed - not supported in piper-tts 1.4.1
+            # Use plain text on stdin instead
+        ]
+        if wav_dir is not None:
+            piper_args.extend(["--output_dir", str(wav_dir.name)])
+        else:
+            piper_args.append("--output-frames")
+
+        if accepts_json and (self.args.voice_threads > 1):
+            # Threads share the loaded model, unlike one process per thread
+            piper_args.extend(["--threads", str(self.args.voice_threads)])
+
+        voice_speaker = settings.speaker
+        if (voice_speaker is None) and (voice_name == self.resolve_voice_name()):
+            # Default speaker
+            voice_speaker = self.args.speaker
+
+        if voice_speaker is not None:
+            if _is_multispeaker(config):
+                speaker_id = _get_speaker_id(config, voice_speaker)
+                if speaker_id is not None:
+                    piper_args.extend(["--speaker", str(speaker_id)])
+
+        noise_scale = _first_set(settings.noise_scale, self.args.noise_scale)
+        if noise_scale:
+            piper_args.extend(["--noise-scale", str(noise_scale)])
+
+        length_scale = _first_set(settings.length_scale, self.args.length_scale)
+        if length_scale:
+            piper_args.extend(["--length-scale", str(length_scale)])
+
+        noise_w = _first_set(settings.noise_w, self.args.noise_w)
+        if noise_w:
+            piper_args.extend(["--noise-w", str(noise_w)])
+
+        if accepts_json:
+            # Same arguments as the piper command line
+            command = [sys.executable, "-m", "wyoming_piper.worker"]
+        else:
+            command = [self.args.piper]
+
+        _LOGGER.debug("Starting piper process: %s args=%s", command, piper_args)
+        piper_proc = PiperProcess(
+            name=voice_name,
+            proc=await asyncio.create_subprocess_exec(
+                *command,
+                *piper_args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,  # Output paths of the command line
+                # Not stopped along with the server's process group (e.g. Ctrl+C),
+                # so requests in flight can finish while the server drains
+                start_new_session=True,
+            ),
+            config=config,
+            wav_dir=wav_dir,
+            model_path=onnx_path,
+            accepts_json=accepts_json,
+            output_frames=output_frames,
+        )
+        piper_proc.start_readers()
 
         return piper_proc
 
-    # Aplay process
-    async def get_aplay_process(self, wavefile) -> PiperProcess:
-        # Use timeout to prevent aplay hanging indefinitely if PipeWire stalls.
-        # A TTS chunk should never exceed 30 seconds; if it does, kill aplay.
-        aplay_proc = AplayProcess(
-            proc=await asyncio.create_subprocess_exec(
-                "timeout", "30",
-                "aplay",
-                wavefile
+    def _prepare_voice(
+        self, voice_name: str, model: Optional[str] = None, wav_files: bool = True
+    ) -> Tuple[Path, Path, Dict[str, Any], Optional[tempfile.TemporaryDirectory]]:
+        """Download a voice if needed and load its config (blocking)."""
+        if model:
+            onnx_path, config_path = Path(model), Path(f"{model}.json")
+        else:
+            ensure_voice_exists(
+                voice_name,
+                self.args.data_dir,
+                self.args.download_dir,
+                self.voices_info,
             )
-        )
-        #self.processes[voice_name] = piper_proc
+            onnx_path, config_path = find_voice(voice_name, self.args.data_dir)
+
+        with open(config_path, "r", encoding="utf-8") as config_file:
+            config = json.load(config_file)
+
+        wav_dir: Optional[tempfile.TemporaryDirectory] = None
+        if wav_files:
+            wav_dir = tempfile.TemporaryDirectory(dir=_wav_parent_dir())
+
+        return onnx_path, config_path, config, wav_dir
 
-        # # Update used
-        # piper_proc.last_used = time.monotonic_ns()
 
-        return aplay_proc
\ No newline at end of file
+def _first_set(*values: Optional[float]) -> Optional[float]:
+    return next((value for value in values if value is not None), None)
@@ -0,0 +1,143 @@
+"""On-demand CPU profiling of the running server."""
+
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+
+
+@dataclass
+class ProfileResult:
+    """Data of a finished profile, not yet written to disk."""
+
+    path: Path
+    profile: Optional[cProfile.Profile] = None
+    stacks: Dict[str, int] = field(default_factory=dict)
+
+    def save(self) -> Path:
+        """Write the profile (blocking).
+
+        cProfile output is a pstats file (snakeviz, `python -m pstats`).
+        Sampled output is collapsed stacks, one "frame;frame;frame count" line
+        per stack (flamegraph.pl, speedscope, inferno).
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.profile is not None:
+            self.profile.dump_stats(str(self.path))
+        else:
+            with open(self.path, "w", encoding="utf-8") as stacks_file:
+                for stack, count in sorted(self.stacks.items()):
+                    print(stack, count, file=stacks_file)
+
+        _LOGGER.info("Wrote profile: %s", self.path)
+        return self.path
+
+
+class Profiler:
+    """Profiles the event loop thread between start() and stop().
+
+    "sample" records the loop thread's stack from a background thread every
+    interval, which is cheap enough for production. "cprofile" traces every
+    call on the loop thread; it is exact but slows the server down.
+    """
+
+    def __init__(self, output_dir: Union[str, Path], interval: float = 0.005) -> None:
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.mode: Optional[str] = None
+
+        self._profile: Optional[cProfile.Profile] = None
+        self._stacks: "Counter[str]" = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._started = ""
+
+    @property
+    def is_running(self) -> bool:
+        """True while profiling."""
+        return self.mode is not None
+
+    def start(self, mode: str = "sample", interval: Optional[float] = None) -> None:
+        """Start profiling the calling (event loop) thread."""
+        if self.is_running:
+            _LOGGER.warning("Profiler is already running (%s)", self.mode)
+            return
+
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+
+        self.mode = mode
+        self._started = time.strftime("%Y%m%d-%H%M%S")
+        if mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._stacks = Counter()
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._sample,
+                args=(threading.get_ident(), interval or self.interval),
+                name="profiler",
+                daemon=True,
+            )
+            self._thread.start()
+
+        _LOGGER.info("Started profiler (%s)", mode)
+
+    def stop(self) -> Optional[ProfileResult]:
+        """Stop profiling; must be called on the thread that started it.
+
+        The result is returned unsaved so it can be written off the event loop.
+        """
+        if self.mode is None:
+            _LOGGER.warning("Profiler is not running")
+            return None
+
+        name = f"profile_{self._started}_{os.getpid()}"
+        if self._profile is not None:
+            self._profile.disable()
+            result = ProfileResult(
+                path=self.output_dir / f"{name}.prof", profile=self._profile
+            )
+            self._profile = None
+        else:
+            self._stopped.set()
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+
+            result = ProfileResult(
+                path=self.output_dir / f"{name}.folded", stacks=dict(self._stacks)
+            )
+
+        _LOGGER.info("Stopped profiler (%s)", self.mode)
+        self.mode = None
+        return result
+
+    def _sample(self, thread_id: int, interval: float) -> None:
+        while not self._stopped.wait(interval):
+            frame = sys._current_frames().get(  # pylint: disable=protected-access
+                thread_id
+            )
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                    f":{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+
+            if frames:
+                # Outermost frame first
+                self._stacks[";".join(reversed(frames))] += 1
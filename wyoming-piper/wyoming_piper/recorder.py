@@ -0,0 +1,145 @@
+"""Recording of incoming Wyoming traffic for replay benchmarks."""
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO, Union
+
+_LOGGER = logging.getLogger(__name__)
+
+# Actions of recorded lines
+OPEN = "open"
+EVENT = "event"
+CLOSE = "close"
+
+
+@dataclass
+class RecordedAction:
+    """One line of a recording."""
+
+    time: float
+    """Seconds since the recording started."""
+
+    connection: int
+    action: str
+    """open, event or close"""
+
+    type: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    payload_length: int = 0
+    """Size of the event payload (payloads themselves are not recorded)."""
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Line of the recording."""
+        line: Dict[str, Any] = {
+            "time": round(self.time, 6),
+            "connection": self.connection,
+            "action": self.action,
+        }
+        if self.action == EVENT:
+            line["type"] = self.type
+            line["data"] = self.data
+            if self.payload_length:
+                line["payload_length"] = self.payload_length
+
+        return line
+
+    @staticmethod
+    def from_dict(line: Dict[str, Any]) -> "RecordedAction":
+        """Parse a line of a recording."""
+        return RecordedAction(
+            time=float(line["time"]),
+            connection=int(line["connection"]),
+            action=line["action"],
+            type=line.get("type"),
+            data=line.get("data") or {},
+            payload_length=line.get("payload_length", 0),
+        )
+
+
+class TrafficRecorder:
+    """Appends incoming events to a JSON lines file with relative timestamps.
+
+    Lines are written by a single worker thread, so recording never blocks the
+    event loop and lines keep the order of the events.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.started = time.monotonic()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recorder")
+        self._file: Optional[TextIO] = open(  # pylint: disable=consider-using-with
+            self.path, "w", encoding="utf-8"
+        )
+        self._closed = False
+        _LOGGER.info("Recording traffic to %s", self.path)
+
+    def open_connection(self, connection_id: int) -> None:
+        """Record a new client connection."""
+        self._record(RecordedAction(self._now(), connection_id, OPEN))
+
+    def close_connection(self, connection_id: int) -> None:
+        """Record a closed client connection."""
+        self._record(RecordedAction(self._now(), connection_id, CLOSE))
+
+    def event(
+        self,
+        connection_id: int,
+        event_type: str,
+        data: Optional[Dict[str, Any]],
+        payload_length: int = 0,
+    ) -> None:
+        """Record an incoming event."""
+        self._record(
+            RecordedAction(
+                self._now(),
+                connection_id,
+                EVENT,
+                type=event_type,
+                data=dict(data or {}),
+                payload_length=payload_length,
+            )
+        )
+
+    def close(self) -> None:
+        """Write pending lines and close the file (blocking)."""
+        self._closed = True
+        self.executor.shutdown(wait=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _now(self) -> float:
+        return time.monotonic() - self.started
+
+    def _record(self, action: RecordedAction) -> None:
+        if self._closed:
+            return
+
+        self.executor.submit(self._write, json.dumps(action.to_dict()))
+
+    def _write(self, line: str) -> None:
+        if self._file is None:
+            return
+
+        try:
+            print(line, file=self._file, flush=True)
+        except OSError:
+            _LOGGER.exception("Failed to record traffic")
+
+
+def load_recording(path: Union[str, Path]) -> List[RecordedAction]:
+    """Read a recording, ordered by time."""
+    actions: List[RecordedAction] = []
+    with open(path, "r", encoding="utf-8") as recording_file:
+        for line in recording_file:
+            line = line.strip()
+            if line:
+                actions.append(RecordedAction.from_dict(json.loads(line)))
+
+    actions.sort(key=lambda action: action.time)
+    return actions
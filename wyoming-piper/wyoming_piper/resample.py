@@ -0,0 +1,140 @@
+"""Rate and channel conversion of 16-bit audio streams."""
+
+import math
+from typing import Optional
+
+import numpy as np
+
+
+class AudioConverter:
+    """Converts a stream of 16-bit chunks to another rate and channel count.
+
+    Resampling is band-limited: every output frame is a Kaiser-windowed sinc
+    over the nearest input frames, with the cutoff just below the lower
+    Nyquist frequency, like ffmpeg's default resampler. Downsampling does not
+    fold energy above the new Nyquist frequency back into the band.
+
+    The filter looks a few frames ahead, so the last output frames of the
+    input seen so far are held back until the next chunk or flush(). Input
+    frames are kept across chunks, so the output has no seams and matches
+    converting the whole stream in one go.
+    """
+
+    # Input frames on each side of an output frame, and the window shape
+    HALF_TAPS = 16
+    CUTOFF = 0.97
+    KAISER_BETA = 9.0
+
+    def __init__(
+        self,
+        in_rate: int,
+        in_channels: int,
+        out_rate: Optional[int] = None,
+        out_channels: Optional[int] = None,
+    ) -> None:
+        self.in_rate = in_rate
+        self.in_channels = in_channels
+        self.out_rate = out_rate or in_rate
+        self.out_channels = out_channels or in_channels
+
+        # Output frame n sits at input position n * down / up
+        common = math.gcd(self.in_rate, self.out_rate)
+        self._up = self.out_rate // common
+        self._down = self.in_rate // common
+        self._filters = self._make_filters() if self.out_rate != self.in_rate else None
+
+        self._in_frames = 0
+        self._out_frames = 0
+
+        # Input frames from _buffer_start on (silence before the stream)
+        self._buffer = np.zeros((self.HALF_TAPS, self.out_channels), np.float32)
+        self._buffer_start = -self.HALF_TAPS
+
+    @property
+    def is_passthrough(self) -> bool:
+        """True if the audio does not need to be changed."""
+        return (self.in_rate, self.in_channels) == (self.out_rate, self.out_channels)
+
+    def convert(self, audio: bytes) -> bytes:
+        """Convert the next chunk of the stream."""
+        if self.is_passthrough:
+            return audio
+
+        frames = np.frombuffer(audio, dtype=np.int16).astype(np.float32)
+        frames = frames.reshape(-1, self.in_channels)
+
+        if self.out_channels != self.in_channels:
+            # Mix down, then copy to every output channel
+            mono = frames.mean(axis=1, keepdims=True)
+            frames = np.repeat(mono, self.out_channels, axis=1)
+
+        if self.out_rate != self.in_rate:
+            frames = self._resample(frames)
+
+        return _to_int16(frames)
+
+    def flush(self) -> bytes:
+        """Output frames held back at the end of the stream."""
+        if self._filters is None:
+            return b""
+
+        return _to_int16(self._resample(None))
+
+    def _make_filters(self) -> np.ndarray:
+        """One filter per output phase, over 2 * HALF_TAPS input frames."""
+        cutoff = self.CUTOFF * min(1.0, self.out_rate / self.in_rate)
+        offsets = np.arange(-self.HALF_TAPS + 1, self.HALF_TAPS + 1)
+        phases = np.arange(self._up) / self._up
+        distance = offsets[np.newaxis, :] - phases[:, np.newaxis]
+        window = np.i0(
+            self.KAISER_BETA
+            * np.sqrt(np.clip(1.0 - (distance / self.HALF_TAPS) ** 2, 0.0, None))
+        ) / np.i0(self.KAISER_BETA)
+        filters = cutoff * np.sinc(cutoff * distance) * window
+
+        # Unity gain at DC for every phase
+        return (filters / filters.sum(axis=1, keepdims=True)).astype(np.float32)
+
+    def _resample(self, frames: Optional[np.ndarray]) -> np.ndarray:
+        assert self._filters is not None
+        if frames is None:
+            # End of the stream: every remaining output frame, with silence
+            # after the last input frame
+            end_frame = -(-self._in_frames * self._up // self._down)
+            frames = np.zeros((self.HALF_TAPS, self.out_channels), np.float32)
+        else:
+            self._in_frames += len(frames)
+
+            # Output frames whose filter only needs input seen so far
+            num_centers = self._in_frames - self.HALF_TAPS
+            end_frame = max(0, (num_centers * self._up - 1) // self._down + 1)
+
+        self._buffer = np.concatenate((self._buffer, frames))
+        outputs = np.arange(self._out_frames, end_frame)
+        self._out_frames = max(self._out_frames, end_frame)
+        if len(outputs) == 0:
+            return np.zeros((0, self.out_channels), np.float32)
+
+        centers = (outputs * self._down) // self._up
+        phases = (outputs * self._down) % self._up
+        indices = (
+            centers[:, np.newaxis]
+            - self._buffer_start
+            + np.arange(-self.HALF_TAPS + 1, self.HALF_TAPS + 1)
+        )
+        resampled = np.einsum(
+            "ntc,nt->nc", self._buffer[indices], self._filters[phases]
+        )
+
+        # Keep the input the next output frame still needs
+        next_center = (self._out_frames * self._down) // self._up
+        keep_from = next_center - self.HALF_TAPS + 1 - self._buffer_start
+        if keep_from > 0:
+            self._buffer = self._buffer[keep_from:]
+            self._buffer_start += keep_from
+
+        return resampled
+
+
+def _to_int16(frames: np.ndarray) -> bytes:
+    return np.clip(np.rint(frames), -32768, 32767).astype(np.int16).tobytes()
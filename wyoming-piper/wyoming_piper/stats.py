@@ -0,0 +1,159 @@
+"""Live server statistics for the stats event."""
+
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+import numpy as np
+
+from .monitor import LoopLagMonitor
+from .playback import AudioPlayer
+from .process import PiperProcessManager
+
+ConnectionStatsGetter = Callable[[], Dict[str, Any]]
+
+
+def hit_ratio(hits: int, misses: int) -> Optional[float]:
+    """Fraction of lookups that were hits (None before the first lookup)."""
+    total = hits + misses
+    return (hits / total) if total > 0 else None
+
+
+class LatencyWindow:
+    """Latencies of the most recent requests."""
+
+    def __init__(self, size: int = 1000) -> None:
+        self.values: Deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        """Record the latency of one request."""
+        self.values.append(seconds)
+        self.count += 1
+
+    def percentiles(self) -> Dict[str, Any]:
+        """Percentiles in milliseconds over the window."""
+        result: Dict[str, Any] = {"count": self.count, "window": len(self.values)}
+        if not self.values:
+            return result
+
+        values_ms = np.array(self.values) * 1000
+        p50, p90, p99 = np.percentile(values_ms, [50, 90, 99])
+        result.update(
+            {
+                "p50_ms": round(float(p50), 3),
+                "p90_ms": round(float(p90), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(values_ms.max()), 3),
+            }
+        )
+        return result
+
+
+class ServerStats:
+    """Collects a JSON snapshot of the running server's state."""
+
+    def __init__(
+        self,
+        process_manager: PiperProcessManager,
+        player: AudioPlayer,
+        loop_monitor: Optional[LoopLagMonitor] = None,
+        window: int = 1000,
+    ) -> None:
+        self.process_manager = process_manager
+        self.player = player
+        self.loop_monitor = loop_monitor
+        self.started = time.monotonic()
+
+        self.synthesize_latency = LatencyWindow(window)
+        """From synthesize event to audio handed to its sinks."""
+
+        self.lock_wait = LatencyWindow(window)
+        """Time a synthesize request waited for the piper processes."""
+
+        self.connections: Dict[int, ConnectionStatsGetter] = {}
+        self._next_connection_id = 0
+
+    def add_connection(self, get_stats: ConnectionStatsGetter) -> int:
+        """Register a client connection; returns its id."""
+        self._next_connection_id += 1
+        self.connections[self._next_connection_id] = get_stats
+        return self._next_connection_id
+
+    def remove_connection(self, connection_id: int) -> None:
+        """Forget a closed client connection."""
+        self.connections.pop(connection_id, None)
+
+    def snapshot(self, stop_requested: bool) -> Dict[str, Any]:
+        """Current state of the server."""
+        now = time.monotonic()
+        manager = self.process_manager
+        player = self.player
+        history = player.history
+
+        voices = {
+            voice_name: {
+                "pid": piper_proc.proc.pid,
+                "running": piper_proc.proc.returncode is None,
+                "busy": piper_proc.busy,
+                "in_flight": piper_proc.in_flight,
+                "requests": piper_proc.num_requests,
+                "idle_s": round(now - (piper_proc.last_used / 1e9), 3),
+            }
+            for voice_name, piper_proc in manager.processes.items()
+        }
+
+        caches: Dict[str, Any] = {
+            "voice_workers": {
+                "hits": manager.hits,
+                "misses": manager.misses,
+                "hit_ratio": hit_ratio(manager.hits, manager.misses),
+                "evictions": manager.evictions,
+                "idle_unloads": manager.idle_unloads,
+            }
+        }
+        if history is not None:
+            caches["history"] = {
+                "responses": len(history.responses),
+                "bytes": history.num_bytes,
+                "hits": history.hits,
+                "misses": history.misses,
+                "hit_ratio": hit_ratio(history.hits, history.misses),
+            }
+
+        snapshot: Dict[str, Any] = {
+            "uptime_s": round(now - self.started, 3),
+            "voices": voices,
+            "connections": {
+                str(connection_id): get_stats()
+                for connection_id, get_stats in self.connections.items()
+            },
+            "playback": {
+                "response_id": player.response_id,
+                "stop_requested": stop_requested,
+                "paused": player.is_paused,
+                "rate": player.playback_rate,
+                "speaking": player.is_speaking,
+                "queue_segments": len(player.queue),
+                "queue_bytes": player.queued_bytes,
+                "subscribers": len(player.subscribers),
+                "remote_sinks": {
+                    name: sink.queue.qsize()
+                    for name, sink in player.remote_sinks.items()
+                },
+            },
+            "caches": caches,
+            "latency": {
+                "synthesize": self.synthesize_latency.percentiles(),
+                "lock_wait": self.lock_wait.percentiles(),
+            },
+        }
+
+        if self.loop_monitor is not None:
+            snapshot["event_loop"] = {
+                "stalls": self.loop_monitor.stalls,
+                "max_lag_ms": round(self.loop_monitor.max_lag * 1000, 3),
+                "last_culprit": self.loop_monitor.last_culprit,
+            }
+
+        return snapshot
@@ -0,0 +1,334 @@
+"""Piper worker that takes synthesis parameters with every request.
+
+Drop-in replacement for the piper command line: it takes the same model,
+speaker and scale arguments and reports "Wrote <path>" on stderr for every
+WAV file. Each stdin line is plain text or a JSON object:
+
+    {"text": "...", "speaker_id": 3, "length_scale": 0.9,
+     "noise_scale": 0.667, "noise_w": 0.8}
+
+Parameters missing from a request fall back to the command line, so speaker
+and speaking rate can change per request with the same loaded model.
+
+With --output-frames, no files are written: the audio of each request is
+sent on stdout as one frame (see write_frame), so it stays in memory from
+synthesis to playback.
+
+With --threads N, up to N requests are synthesized at the same time by the
+one loaded model (an ONNX Runtime session can run on several threads), so
+they share its weights instead of each worker process loading a copy.
+Results are still reported in request order.
+
+Run with: python -m wyoming_piper.worker --model ... --output_dir ...
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from functools import partial
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+
+_LOGGER = logging.getLogger("wyoming_piper.worker")
+
+# Start of the stderr line for a failed request
+ERROR_PREFIX = "Synthesis failed: "
+
+# Frame header: status, sample rate, width, channels, payload length.
+# The payload is 16-bit PCM, or the UTF-8 error message if status is not OK.
+FRAME_HEADER = struct.Struct(">BIBBI")
+FRAME_OK = 0
+FRAME_ERROR = 1
+
+_T = TypeVar("_T")
+
+
+@dataclass
+class Frame:
+    """Audio (or error) of one request in --output-frames mode."""
+
+    status: int
+    rate: int
+    width: int
+    channels: int
+    payload: bytes
+
+
+def write_frame(stream: BinaryIO, frame: Frame) -> None:
+    """Write a frame and flush it."""
+    stream.write(
+        FRAME_HEADER.pack(
+            frame.status, frame.rate, frame.width, frame.channels, len(frame.payload)
+        )
+    )
+    stream.write(frame.payload)
+    stream.flush()
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Frame]:
+    """Read the next frame (None at the end of the stream or a cut-off frame)."""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+
+    status, rate, width, channels, length = FRAME_HEADER.unpack(header)
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        # Worker exited in the middle of a frame
+        return None
+
+    return Frame(status, rate, width, channels, payload)
+
+
+@dataclass(frozen=True)
+class SynthesisParams:
+    """Per-request synthesis parameters (None: model default)."""
+
+    speaker_id: Optional[int] = None
+    length_scale: Optional[float] = None
+    noise_scale: Optional[float] = None
+    noise_w: Optional[float] = None
+
+    def to_request(self, text: str) -> Dict[str, Any]:
+        """JSON request line for the worker (without unset parameters)."""
+        request: Dict[str, Any] = {"text": text}
+        for key, value in self.__dict__.items():
+            if value is not None:
+                request[key] = value
+
+        return request
+
+
+def parse_request(line: str, defaults: SynthesisParams) -> Tuple[str, SynthesisParams]:
+    """Text and parameters of a request line.
+
+    Raises ValueError or TypeError for a parameter of the wrong type.
+    """
+    line = line.strip()
+    if not line.startswith("{"):
+        return line, defaults
+
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError:
+        # Text that happens to start with a brace
+        return line, defaults
+
+    params = replace(
+        defaults,
+        speaker_id=_get(request, "speaker_id", int, defaults.speaker_id),
+        length_scale=_get(request, "length_scale", float, defaults.length_scale),
+        noise_scale=_get(request, "noise_scale", float, defaults.noise_scale),
+        noise_w=_get(request, "noise_w", float, defaults.noise_w),
+    )
+    return str(request.get("text", "")).strip(), params
+
+
+def _get(
+    request: Dict[str, Any],
+    key: str,
+    convert: Callable[[Any], _T],
+    default: Optional[_T],
+) -> Optional[_T]:
+    value = request.get(key)
+    return default if value is None else convert(value)
+
+
+def run_in_order(
+    jobs: Iterable[Callable[[], _T]],
+    output: Callable[[_T], None],
+    threads: int = 1,
+) -> None:
+    """Run jobs on up to `threads` threads and output their results in order.
+
+    Results are output as soon as they and all earlier ones are done, not when
+    the next job arrives. Jobs must not raise.
+    """
+    if threads <= 1:
+        for job in jobs:
+            output(job())
+
+        return
+
+    finished: "queue.Queue[Optional[Future]]" = queue.Queue()
+
+    def output_finished() -> None:
+        while True:
+            future = finished.get()
+            if future is None:
+                break
+
+            output(future.result())
+
+    writer = threading.Thread(target=output_finished, daemon=True)
+    writer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for job in jobs:
+                finished.put(executor.submit(job))
+    finally:
+        finished.put(None)
+        writer.join()
+
+
+def lock_phonemizer(voice: Any) -> None:
+    """Let one thread at a time phonemize (espeak-ng has global state)."""
+    phonemize = voice.phonemize
+    lock = threading.Lock()
+
+    def locked_phonemize(text: str) -> Any:
+        with lock:
+            return phonemize(text)
+
+    voice.phonemize = locked_phonemize
+
+
+def main() -> None:
+    """Synthesize stdin requests until stdin is closed."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-m", "--model", required=True, help="Path to .onnx model")
+    parser.add_argument("-c", "--config", help="Path to model config")
+    parser.add_argument("-d", "--output_dir", "--output-dir", help="WAV directory")
+    parser.add_argument(
+        "--output-frames",
+        action="store_true",
+        help="Send audio on stdout in frames instead of writing WAV files",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="Requests synthesized at the same time with the loaded model",
+    )
+    parser.add_argument("-s", "--speaker", type=int, help="Default speaker id")
+    parser.add_argument("--length-scale", "--length_scale", type=float)
+    parser.add_argument("--noise-scale", "--noise_scale", type=float)
+    parser.add_argument("--noise-w", "--noise_w", "--noise-w-scale", type=float)
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+    if (not args.output_frames) and (not args.output_dir):
+        parser.error("--output_dir or --output-frames is required")
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
+
+    # pylint: disable=import-outside-toplevel
+    from piper import PiperVoice, SynthesisConfig
+
+    voice = PiperVoice.load(args.model, config_path=args.config)
+    if args.threads > 1:
+        lock_phonemizer(voice)
+
+    frames: Optional[BinaryIO] = None
+    output_dir = Path()
+    if args.output_frames:
+        # Frames get a private copy of stdout; anything a library prints goes
+        # to stderr instead of corrupting them
+        frames = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    else:
+        output_dir = Path(args.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    defaults = SynthesisParams(
+        speaker_id=args.speaker,
+        length_scale=args.length_scale,
+        noise_scale=args.noise_scale,
+        noise_w=args.noise_w,
+    )
+
+    def synthesize(text: str, params: SynthesisParams) -> Any:
+        syn_config = SynthesisConfig(
+            speaker_id=params.speaker_id,
+            length_scale=params.length_scale,
+            noise_scale=params.noise_scale,
+            noise_w_scale=params.noise_w,
+        )
+        if frames is not None:
+            return _synthesize_frame(voice, text, syn_config)
+
+        return _synthesize_wav(voice, text, syn_config, output_dir)
+
+    def output(result: Any) -> None:
+        if frames is not None:
+            write_frame(frames, result)
+        else:
+            print(result, file=sys.stderr, flush=True)
+
+    def fail(err: Exception) -> Any:
+        if frames is not None:
+            return _error_frame(err)
+
+        return f"{ERROR_PREFIX}{err!r}"
+
+    def jobs() -> Iterable[Callable[[], Any]]:
+        for line in sys.stdin:
+            try:
+                text, params = parse_request(line, defaults)
+            except (TypeError, ValueError) as err:
+                # Only this request fails; its result keeps its place
+                yield partial(fail, err)
+                continue
+
+            if text:
+                yield partial(synthesize, text, params)
+
+    run_in_order(jobs(), output, args.threads)
+
+
+def _synthesize_wav(voice: Any, text: str, syn_config: Any, output_dir: Path) -> str:
+    """Synthesize a request into a WAV file and return its stderr line."""
+    # Unique across threads
+    wav_path = output_dir / f"{time.monotonic_ns()}-{threading.get_ident()}.wav"
+    try:
+        with wave.open(str(wav_path), "wb") as wav_file:
+            voice.synthesize_wav(text, wav_file, syn_config=syn_config)
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        # One line, so the server fails this request and keeps the worker
+        wav_path.unlink(missing_ok=True)
+        return f"{ERROR_PREFIX}{err!r}"
+
+    # Same completion line as the piper command line
+    return f"Wrote {wav_path}"
+
+
+def _synthesize_frame(voice: Any, text: str, syn_config: Any) -> Frame:
+    """Synthesize all sentences of a request into one frame."""
+    try:
+        chunks = list(voice.synthesize(text, syn_config=syn_config))
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        return _error_frame(err)
+
+    rate = voice.config.sample_rate
+    width, channels = 2, 1
+    if chunks:
+        rate = chunks[0].sample_rate
+        width = chunks[0].sample_width
+        channels = chunks[0].sample_channels
+
+    return Frame(
+        FRAME_OK,
+        rate,
+        width,
+        channels,
+        b"".join(chunk.audio_int16_bytes for chunk in chunks),
+    )
+
+
+def _error_frame(err: Exception) -> Frame:
+    return Frame(FRAME_ERROR, 0, 0, 0, f"{ERROR_PREFIX}{err!r}".encode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()